@@ -0,0 +1,288 @@
+import numpy as np
+from solver import calculate_k, calculate_y, rta_wcrt
+from taskset import TaskSet, as_taskset
+
+
+EXACT = 2 ** 52  # values below which the float quotients keep their ceilings
+
+
+def ceilings(r, periods):
+    """
+    ceil(r / T) of several values (rows) and periods (columns). With float
+    periods, for values below EXACT, as the float division is much faster than
+    the integer one: its error is below 1 / T while r / T is a whole number or
+    at least 1 / T away from one
+    """
+    if periods.dtype.kind == "f":
+        return np.ceil(r[:, None] / periods)
+    return -(-r[:, None] // periods)
+
+
+def fixed_points(c, t, d, rows, seeds):
+    """
+    Least fixed points of R_i = C_i + sum_{j < i} ceil(R_i / T_j) C_j of several
+    tasks of a rts in priority order, iterated in lockstep. Every seed must be
+    a lower bound of the WCRT of its task, so the tasks do not depend on each other.
+    The higher priority tasks are grouped by period, with their summed C, unless
+    their periods are mostly different.
+    :param c: wcet array
+    :param t: period array
+    :param d: deadline array
+    :param rows: indices of the tasks
+    :param seeds: lower bound of the WCRT of every task
+    :return: wcrt array (the first value beyond the deadline for the tasks that miss it) and met deadlines array
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    wcrt = np.asarray(seeds, dtype=np.int64).copy()
+    if rows.size == 0:
+        return wcrt, np.ones(0, dtype=bool)
+    first, cols = int(rows.min()), int(rows.max())
+    # float columns below EXACT, see ceilings
+    dtype = float if max(int(wcrt.max()), int(d[rows].max())) < EXACT else np.int64
+    periods, group = np.unique(t[:cols], return_inverse=True)
+    # C of every period summed over the tasks above each row
+    if periods.size * 4 > cols * 3:
+        # mostly different periods: the C of every task above each row, with its own period
+        periods = t[:cols]
+        hp = np.where(np.arange(cols) < rows[:, None], c[:cols].astype(dtype), 0)
+    elif rows.size * cols < (cols - first + 1) * periods.size:
+        # a few rows: summed on their own
+        hp = np.array([np.bincount(group[:row], weights=c[:row], minlength=periods.size) for row in rows],
+                      dtype=dtype)
+    else:
+        # the ones above the first row, plus the prefix sums of the rows between them
+        block = np.zeros((cols - first + 1, periods.size), dtype=dtype)
+        block[0] = np.bincount(group[:first], weights=c[:first], minlength=periods.size)
+        block[np.arange(1, cols - first + 1), group[first:]] = c[first:cols]
+        hp = np.cumsum(block, axis=0)[rows - first]
+    periods = periods.astype(dtype)
+
+    pending = np.arange(rows.size)
+    r, ci, di = wcrt.copy(), c[rows], d[rows]
+    while pending.size:
+        w = ci + np.einsum("ij,ij->i", ceilings(r, periods), hp).astype(np.int64)
+        wcrt[pending] = w
+        left = (w != r) & (w <= di)
+        if not left.all():
+            pending, hp, ci, di = pending[left], hp[left], ci[left], di[left]
+            w = w[left]
+        r = w
+    return wcrt, wcrt <= d[rows]
+
+
+NEVER = np.iinfo(np.int64).max  # next release of the tasks without higher priority tasks
+BLOCK = 256  # rows of the next_releases matrices
+
+
+def next_releases(t, wcrt, rows):
+    """
+    Earliest release of a higher priority task at or after the WCRT of each of
+    several tasks, up to which the interference on them does not change
+    :param t: period array
+    :param wcrt: wcrt array of the tasks
+    :param rows: indices of the tasks
+    :return: release array, NEVER for the first task
+    """
+    rows = np.asarray(rows, dtype=np.int64)
+    releases = np.full(rows.size, NEVER, dtype=np.int64)
+    for start in range(0, rows.size, BLOCK):
+        block, r = rows[start:start + BLOCK], wcrt[start:start + BLOCK]
+        periods, first = np.unique(t[:int(block.max())], return_index=True)
+        if periods.size == 0:
+            continue
+        if int(r.max()) < EXACT:
+            periods = periods.astype(float)
+        release = (ceilings(r, periods) * periods).astype(np.int64)
+        release[first[None, :] >= block[:, None]] = NEVER
+        releases[start:start + BLOCK] = release.min(axis=1)
+    return releases
+
+
+class Analyzer:
+    """
+    Admission control of a rts in priority order under fixed priorities. The
+    WCRT of every task is kept, and each change only analyses the tasks whose
+    WCRT can change (the changed one and the lower priority ones) seeded with
+    lower bounds of their new WCRT. When the change only adds interference,
+    the new WCRT of a lower priority task is at least R + the added
+    interference at R, and it is that seed when no other higher priority task
+    is released before it, so only the tasks whose fixed point moves beyond
+    their next release (also kept) are iterated. Changes that make the rts
+    unschedulable are rejected and leave it as it was.
+    """
+
+    def __init__(self, rts=()):
+        """
+        :param rts: schedulable TaskSet or list of task dicts in priority order
+        """
+        rts = as_taskset(rts)
+        c, t, d = rts.columns()
+        self.c, self.t, self.d = (np.array(column, dtype=np.int64) for column in (c, t, d))
+        self.nro = list(rts.nro)
+        schedulable, wcrt = rta_wcrt(rts) if len(rts) else (True, [])
+        if not schedulable:
+            raise ValueError("The rts is not schedulable")
+        self.wcrt = np.array(wcrt, dtype=np.int64)
+        self.releases = next_releases(self.t, self.wcrt, np.arange(len(self.c)))
+        self._k = None
+
+    def __len__(self):
+        return len(self.nro)
+
+    @property
+    def tasks(self):
+        """ Current rts as a TaskSet """
+        return TaskSet(self.c.tolist(), self.t.tolist(), self.d.tolist(), self.nro)
+
+    @property
+    def k(self):
+        """ K of every task (calculate_k), kept until the next change """
+        if self._k is None:
+            self._k = calculate_k(self.tasks)
+        return self._k
+
+    @property
+    def y(self):
+        """ Promotion times of every task (calculate_y) """
+        return calculate_y(self.tasks, wcrt=self.wcrt.tolist())
+
+    def index(self, nro):
+        """
+        Priority level of a task number
+        :raises KeyError: when the task is not in the rts
+        """
+        try:
+            return self.nro.index(nro)
+        except ValueError:
+            raise KeyError(nro) from None
+
+    def rm_position(self, t):
+        """ Priority level of a new task with period t, after the tasks with periods up to t """
+        return int(np.count_nonzero(self.t <= t))
+
+    def _seeds(self, c, t, rows):
+        """
+        Lower bounds of the WCRT of tasks whatever their previous WCRT: C_i plus
+        the C of every higher priority task, and C_i / (1 - U) (rounded down
+        with some margin for the float errors). In RM order, the tighter least
+        fixed point of x = C_i + sum_{j < i} max(C_j, x U_j), as ceil(x / T_j) C_j
+        is at least both: it is beyond the first periods T_k where the sum
+        exceeds T_k, and there the tasks up to k add x U_j and the others C_j
+        """
+        sum_c = np.concatenate([[0], np.cumsum(c)])
+        u = np.concatenate([[0.0], np.cumsum(c / t)])
+        slack = 1.0 - u[rows]
+        u_bound = np.where(slack > 1e-4, c[rows] / np.maximum(slack, 1e-4) * (1 - 1e-4), 0).astype(np.int64)
+        seeds = np.maximum(c[rows] + sum_c[rows], u_bound)
+        last = int(rows.max(initial=0))
+        if last == 0 or u[last] >= 1 - 1e-4 or np.any(t[1:last] < t[:last - 1]):
+            return seeds
+        # the sum of row i at T_k exceeds T_k while C_i + the C above i exceeds T_k (1 - U up to k) + the C up
+        # to k, which grows with k
+        excess = t[:last] * (1.0 - u[1:last + 1]) + sum_c[1:last + 1]
+        k = np.minimum(np.searchsorted(excess, c[rows] + sum_c[rows]), rows)
+        x = (c[rows] + sum_c[rows] - sum_c[k]) / (1.0 - u[k])
+        return np.maximum(seeds, (x * (1 - 1e-9)).astype(np.int64))
+
+    def _apply(self, c, t, d, nro, level, seeds, grown=None):
+        """
+        Analyse the tasks from level down with the given lower bounds of their
+        WCRT and keep the new rts if they all meet their deadlines
+        :param grown: (C, T) of the task at level before the change ((0, 1) for a new task), and the WCRT and
+                      next releases of the tasks below it, when the change only adds interference on them
+        :return: whether the change was admitted
+        """
+        rows = np.arange(level, len(c))
+        seeds = np.maximum(seeds, self._seeds(c, t, rows))
+        if 0 < level < len(c):
+            # R_i >= R_{i-1} + C_i, the rta_wcrt seed
+            seeds[0] = max(seeds[0], self.wcrt[level - 1] + c[level])
+        wcrt = seeds.copy()
+        releases = np.empty_like(seeds)
+        pending = np.ones(rows.size, dtype=bool)
+        if grown is not None and rows.size > 1:
+            old_c, old_t, old_wcrt, old_releases = grown
+            # W(R) with the new task at level, the old interference of the others being R - C_i - old ceilings
+            jobs = -(-old_wcrt // t[level])
+            seed = old_wcrt - -(-old_wcrt // old_t) * old_c + jobs * c[level]
+            if np.any(seed > d[level + 1:]):
+                return False
+            # seed is a fixed point while no higher priority task is released and the task at level has the
+            # same ceiling
+            fixed = (seed <= old_releases) & (-(-seed // t[level]) == jobs)
+            wcrt[1:] = np.maximum(seeds[1:], seed)
+            pending[1:] = ~fixed | (wcrt[1:] != seed)
+            releases[1:] = np.minimum(old_releases, jobs * t[level])
+        if pending.any():
+            wcrt[pending], met = fixed_points(c, t, d, rows[pending], wcrt[pending])
+            if not met.all():
+                return False
+            releases[pending] = next_releases(t, wcrt[pending], rows[pending])
+        self.c, self.t, self.d, self.nro = c, t, d, nro
+        self.wcrt = np.concatenate([self.wcrt[:level], wcrt])
+        self.releases = np.concatenate([self.releases[:level], releases])
+        self._k = None
+        return True
+
+    def add_task(self, c, t, d=None, level=None, nro=None):
+        """
+        Admit a new task if the rts stays schedulable
+        :param level: priority level of the task (RM by default), the tasks from this level down go one level lower
+        :param nro: task number, the next one by default
+        :return: task number, None when the task is rejected
+        """
+        if d is None:
+            d = t
+        if level is None:
+            level = self.rm_position(t)
+        if nro is None:
+            nro = max(self.nro, default=0) + 1
+        admitted = self._apply(np.insert(self.c, level, c), np.insert(self.t, level, t), np.insert(self.d, level, d),
+                               self.nro[:level] + [nro] + self.nro[level:], level,
+                               np.zeros(len(self.c) + 1 - level, dtype=np.int64),
+                               grown=(0, 1, self.wcrt[level:], self.releases[level:]))
+        return nro if admitted else None
+
+    def remove_task(self, nro):
+        """
+        Remove a task, which keeps the rts schedulable
+        :raises KeyError: when the task is not in the rts
+        """
+        level = self.index(nro)
+        c, t, d = np.delete(self.c, level), np.delete(self.t, level), np.delete(self.d, level)
+        if not self._apply(c, t, d, self.nro[:level] + self.nro[level + 1:], level,
+                           np.zeros(len(c) - level, dtype=np.int64)):
+            raise ValueError("Removing task {0:} made the rts unschedulable".format(nro))
+
+    def update_task(self, nro, c=None, t=None, d=None):
+        """
+        Change the parameters of a task, keeping its priority level, if the rts stays schedulable
+        :return: whether the change was admitted
+        :raises KeyError: when the task is not in the rts
+        """
+        level = self.index(nro)
+        new_c = self.c.copy()
+        new_t = self.t.copy()
+        new_d = self.d.copy()
+        if c is not None:
+            new_c[level] = c
+        if t is not None:
+            new_t[level] = t
+        if d is not None:
+            new_d[level] = d
+        if new_c[level] == self.c[level] and new_t[level] == self.t[level]:
+            # only the deadline changed
+            if self.wcrt[level] > new_d[level]:
+                return False
+            self.d = new_d
+            self._k = None
+            return True
+
+        seeds = np.zeros(len(new_c) - level, dtype=np.int64)
+        grown = None
+        if new_c[level] >= self.c[level] and new_t[level] <= self.t[level]:
+            # the interference on the lower priority tasks can only grow
+            grown = (self.c[level], self.t[level], self.wcrt[level + 1:], self.releases[level + 1:])
+        if new_c[level] >= self.c[level]:
+            seeds[0] = self.wcrt[level] + new_c[level] - self.c[level]
+        return self._apply(new_c, new_t, new_d, list(self.nro), level, seeds, grown)
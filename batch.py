@@ -0,0 +1,69 @@
+import numpy as np
+from taskset import as_taskset
+
+
+def to_arrays(rts_list):
+    """
+    Pack a list of equal-size rts into (sets x tasks) int64 arrays
+    :param rts_list: list of rts (TaskSet or lists of task dicts)
+    :return: C, T and D arrays
+    """
+    rts_list = [as_taskset(rts) for rts in rts_list]
+    c = np.array([rts.c for rts in rts_list], dtype=np.int64)
+    t = np.array([rts.t for rts in rts_list], dtype=np.int64)
+    d = np.array([rts.d for rts in rts_list], dtype=np.int64)
+    return c, t, d
+
+
+def rta_wcrt_batch(c, t, d):
+    """
+    Evaluate the RTA fixed point of a whole batch of equal-size rts in lockstep.
+    Every row of the (sets x tasks) arrays is a rts in priority order. Rows that
+    converged or failed are masked out of the following iterations.
+    :param c: wcet array
+    :param t: period array
+    :param d: deadline array
+    :return: schedulable boolean array (sets) and wcrt array (sets x tasks)
+    """
+    c, t, d = np.asarray(c, dtype=np.int64), np.asarray(t, dtype=np.int64), np.asarray(d, dtype=np.int64)
+    if (t <= 0).any():
+        raise ValueError("Task periods must be positive")
+    nsets, ntasks = c.shape
+    wcrt = np.zeros((nsets, ntasks), dtype=np.int64)
+    schedulable = np.ones(nsets, dtype=bool)
+    wcrt[:, 0] = c[:, 0]  # task 0 wcet
+
+    for i in range(1, ntasks):
+        rows = np.flatnonzero(schedulable)
+        if rows.size == 0:
+            break
+        r = wcrt[rows, i-1] + c[rows, i]
+        while rows.size:
+            w = c[rows, i] + (-(-r[:, None] // t[rows, :i]) * c[rows, :i]).sum(axis=1)
+            done = w == r
+            wcrt[rows[done], i] = r[done]
+            failed = ~done & (w > d[rows, i])
+            wcrt[rows[failed], i] = w[failed]
+            schedulable[rows[failed]] = False
+            pending = ~(done | failed)
+            rows, r = rows[pending], w[pending]
+
+    return schedulable, wcrt
+
+
+def rta_wcrt_many(rts_list):
+    """
+    Evaluate rta_wcrt over a list of rts of any size, batching equal-size rts
+    :param rts_list: list of rts
+    :return: list of [schedulable, wcrt], in the same order as rts_list
+    """
+    by_size = {}
+    for idx, rts in enumerate(rts_list):
+        by_size.setdefault(len(rts), []).append(idx)
+
+    results = [None] * len(rts_list)
+    for idxs in by_size.values():
+        schedulable, wcrt = rta_wcrt_batch(*to_arrays([rts_list[idx] for idx in idxs]))
+        for idx, sched, r in zip(idxs, schedulable.tolist(), wcrt.tolist()):
+            results[idx] = [sched, r]
+    return results
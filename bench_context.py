@@ -0,0 +1,105 @@
+import argparse
+from time import perf_counter
+from tabulate import tabulate
+import solver
+from taskset import TaskSet
+
+
+class CountingPeriod(int):
+    """ Period that counts the ceiling divisions (t // period) done with it """
+
+    def __new__(cls, value):
+        period = super().__new__(cls, value)
+        period.count = 0
+        return period
+
+    def __rfloordiv__(self, other):
+        self.count += 1
+        return int(other) // int(self)
+
+
+class CountingTaskSet(TaskSet):
+    """ TaskSet whose analysis columns carry CountingPeriod periods, so the benchmarks count the ceilings """
+    __slots__ = ("periods",)
+
+    def __init__(self, c, t, d=None, nro=None):
+        super().__init__(c, t, d, nro)
+        self.periods = [CountingPeriod(tp) for tp in t]
+
+    def columns(self):
+        c, _, d = super().columns()
+        return c, self.periods, d
+
+    @property
+    def ceilings(self):
+        """ Ceilings evaluated so far by the analyses of the set """
+        return sum([period.count for period in self.periods])
+
+
+def without_context(rts):
+    """ The analyses as solver.main invoked them before AnalysisContext """
+    rm_schedulable = solver.rta_wcrt(rts)[0]
+    liu_bound_result = solver.liu_bound(rts)
+    bini_bound_result = solver.bini_bound(rts)
+    return [
+        ("h", solver.lcm(rts)),
+        ("uf", solver.uf(rts)),
+        ("liu", liu_bound_result),
+        ("bini", bini_bound_result),
+        ("wcrt", solver.wcrt(rts)),
+        ("edf", solver.edf_qpa(rts)),
+        ("free", solver.first_free_slot(rts) if rm_schedulable else "No planificable"),
+        ("k", solver.calculate_k(rts)),
+        ("y", solver.calculate_y(rts)),
+        ("rr", solver.round_robin(rts)),
+        ("ps (bound)", solver.calculate_ps_bound(rts) if liu_bound_result[1] else "No aplica"),
+        ("ds (bound)", solver.calculate_ds_bound(rts) if bini_bound_result[1] else "No aplica"),
+        ("ds (k)", solver.calculate_ds_k(rts))
+    ]
+
+
+def with_context(rts):
+    return solver.AnalysisContext(rts).results()
+
+
+def measure(method, rts_list):
+    ceilings = sum([rts.ceilings for rts in rts_list])
+    start = perf_counter()
+    results = [method(rts) for rts in rts_list]
+    elapsed = perf_counter() - start
+    return results, sum([rts.ceilings for rts in rts_list]) - ceilings, elapsed
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Ceiling evaluations saved by solver.AnalysisContext.")
+    parser.add_argument("--sets", type=int, default=1000, help="Number of RTS to generate.")
+    parser.add_argument("--ntask", type=int, default=8)
+    parser.add_argument("--uf", type=float, default=0.8)
+    parser.add_argument("--mint", type=int, default=10)
+    parser.add_argument("--maxt", type=int, default=1000)
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    param = {"ntask": args.ntask, "uf": args.uf, "mint": args.mint, "maxt": args.maxt}
+    rts_list = []
+    for _ in range(args.sets):
+        rts = solver.generate_rts(param)
+        rts_list.append(CountingTaskSet(rts.c, rts.t, rts.d))
+
+    before, before_ceils, before_time = measure(without_context, rts_list)
+    after, after_ceils, after_time = measure(with_context, rts_list)
+    if before != after:
+        raise AssertionError("AnalysisContext changed the results")
+
+    print(tabulate([
+        ("without context", before_ceils / args.sets, before_time / args.sets * 1e6),
+        ("with context", after_ceils / args.sets, after_time / args.sets * 1e6),
+        ("saved", (before_ceils - after_ceils) / args.sets, (before_time - after_time) / args.sets * 1e6),
+    ], headers=["", "ceilings/set", "us/set"], floatfmt=".1f"))
+
+
+if __name__ == '__main__':
+    main()
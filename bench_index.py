@@ -0,0 +1,107 @@
+import argparse
+import json
+from math import ceil
+from time import perf_counter
+import numpy as np
+from tabulate import tabulate
+import solver
+from generator import uunifast
+from ranges import mix_range
+from taskset import TaskSet
+
+# periods of an aggregated ECU task list, in microseconds
+ECU_PERIODS = [1000, 2000, 5000, 10000, 20000, 50000, 100000, 200000, 1000000]
+
+
+def ecu_rts(n, u, periods, rng):
+    """ rts of n tasks sharing the given periods, in RM order """
+    t = np.sort(rng.choice(periods, n))
+    c = [max(1, ceil(ui * ti)) for ui, ti in zip(uunifast(1, n, u, rng)[0], t)]
+    return TaskSet(c, t.tolist())
+
+
+def flat_rta_wcrt(rts):
+    """ rta_wcrt summing the interference of every higher priority task """
+    c, t, d = rts.columns()
+    wcrt = [c[0]] + [0] * (len(c) - 1)
+    for i in range(1, len(c)):
+        schedulable, wcrt[i] = solver._rta_task(c[i], d[i], list(zip(c[:i], t[:i])), wcrt[i-1] + c[i])
+        if not schedulable:
+            return [False, wcrt]
+    return [True, wcrt]
+
+
+def flat_first_free_slot(rts):
+    """ first_free_slot summing the workload of every higher priority task """
+    c, tp, _ = rts.columns()
+    free = []
+    for i in range(len(c)):
+        hp = list(zip(c[:i + 1], tp[:i + 1]))
+        t = 0
+        while True:
+            w = 1 + sum([-(-t // tj) * cj for cj, tj in hp])
+            if t == w:
+                break
+            t = w
+        free.append(t)
+    return free
+
+
+def flat_calculate_k(rts):
+    """ calculate_k summing the workload of every higher priority task """
+    c, tp, d = rts.columns()
+    ks = [tp[0] - c[0]]
+    for i in range(1, len(c)):
+        def workload(t, ci=c[i], hp=list(zip(c[:i], tp[:i]))):
+            return ci + sum([-(-t // tj) * cj for cj, tj in hp])
+        ks.append(solver._max_k(workload, d[i], d[i] - c[i]))
+    return ks
+
+
+ANALYSES = {"rta": (flat_rta_wcrt, solver.rta_wcrt), "free": (flat_first_free_slot, solver.first_free_slot),
+            "k": (flat_calculate_k, solver.calculate_k)}
+
+
+def measure(method, rts):
+    start = perf_counter()
+    result = method(rts)
+    return result, perf_counter() - start
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Scaling of the period-bucketed interference index of solver.py.")
+    parser.add_argument("--n", type=str, default="100,500,1000,2000,5000", help="Task counts (e.g. 100,1000).")
+    parser.add_argument("--uf", type=float, default=0.7)
+    parser.add_argument("--analyses", type=str, nargs="*", choices=ANALYSES, default=["rta", "free"],
+                        help="Analyses to compare (k is slow with the flat sums at large n).")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, help="Write the results to this json file.")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    rng = np.random.default_rng(args.seed)
+
+    records = []
+    for n in mix_range(args.n):
+        rts = ecu_rts(n, args.uf, ECU_PERIODS, rng)
+        for name in args.analyses:
+            flat, indexed = ANALYSES[name]
+            flat_result, flat_time = measure(flat, rts)
+            indexed_result, indexed_time = measure(indexed, rts)
+            if flat_result != indexed_result:
+                raise AssertionError("{0:} differs with the index (n={1:})".format(name, n))
+            records.append({"analysis": name, "n": n, "periods": len(set(rts.t)), "flat ms": flat_time * 1e3,
+                            "indexed ms": indexed_time * 1e3, "speedup": flat_time / indexed_time})
+
+    print(tabulate([record.values() for record in records], headers=list(records[0]), floatfmt=".2f"))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(records, fh, indent=1)
+
+
+if __name__ == '__main__':
+    main()
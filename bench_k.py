@@ -0,0 +1,74 @@
+import argparse
+import json
+from time import perf_counter
+from tabulate import tabulate
+import solver
+from bench_context import CountingTaskSet
+from generator import generate
+from ranges import float_range, mix_range
+
+ENGINES = {"linear": solver.calculate_k_linear, "search": solver.calculate_k}
+
+
+def measure(engine, corpus):
+    """
+    Run a K engine over a corpus
+    :return: wall time, ceilings and the K of every rts
+    """
+    start = perf_counter()
+    ks = [engine(rts) for rts in corpus]
+    elapsed = perf_counter() - start
+
+    # count on a second run, so the counters do not distort the timing
+    ceils = 0
+    for rts in corpus:
+        counting = CountingTaskSet(rts.c, rts.t, rts.d)
+        engine(counting)
+        ceils += counting.ceilings
+    return elapsed, ceils, ks
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Benchmark the K engines of solver.py on sets with large deadlines.")
+    parser.add_argument("--n", type=str, default="4,8", help="Task counts (e.g. 4-8 or 4,8,16).")
+    parser.add_argument("--uf", type=str, default="0.3,0.6", help="Utilizations (e.g. 0.3:0.6:0.1).")
+    parser.add_argument("--min-t", type=int, default=100)
+    parser.add_argument("--max-t", type=str, default="1000,10000,100000", help="Maximum periods (and deadlines).")
+    parser.add_argument("--sets", type=int, default=50, help="RTS per configuration.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, help="Write the results to this json file.")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+
+    records = []
+    for n in mix_range(args.n):
+        for u in float_range(args.uf):
+            for max_t in mix_range(args.max_t):
+                corpus, _ = generate(args.sets, n, u, args.min_t, max_t, args.seed)
+                results = {name: measure(engine, corpus) for name, engine in ENGINES.items()}
+                reference = results["linear"]
+                for name, (elapsed, ceils, ks) in results.items():
+                    if ks != reference[2]:
+                        raise AssertionError("{0:} K differs from linear (n={1:}, uf={2:}, max-t={3:})".format(
+                            name, n, u, max_t))
+                    records.append({
+                        "engine": name, "n": n, "uf": u, "max-t": max_t, "sets": len(corpus),
+                        "mean k": sum(map(sum, ks)) / (len(corpus) * n),
+                        "us per set": elapsed / len(corpus) * 1e6,
+                        "ceilings per task": ceils / (len(corpus) * n),
+                        "speedup": reference[0] / elapsed,
+                    })
+
+    print(tabulate([record.values() for record in records], headers=list(records[0]), floatfmt=".2f"))
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(records, fh, indent=1)
+
+
+if __name__ == '__main__':
+    main()
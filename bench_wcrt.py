@@ -0,0 +1,152 @@
+import argparse
+import csv
+import importlib.util
+import json
+import os
+from time import perf_counter
+from tabulate import tabulate
+import solver
+from bench_context import CountingTaskSet
+from generator import generate
+from instrument import Counters
+from ranges import float_range, mix_range
+
+
+def load_solver_tex():
+    """ Import solver-tex.py, whose file name is not a valid module name """
+    spec = importlib.util.spec_from_file_location("solver_tex", os.path.join(os.path.dirname(__file__), "solver-tex.py"))
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def solver_input(rts, counting=False):
+    """ The rts as the engines take it, a CountingTaskSet to count its ceilings """
+    return CountingTaskSet(rts.c, rts.t, rts.d) if counting else rts
+
+
+# the engine counts its iterations in the Counters it is given
+COUNTED = "counted"
+# engine the iterations saved are counted against
+BASELINE = "rta"
+
+
+def reported_iterations(result):
+    """ Iterations reported by the solver-tex RTA2/RTA3 engines (while loops per task) """
+    return sum(result[5])
+
+
+def engines():
+    """
+    WCRT engines under benchmark
+    :return: name -> (input adapter, engine, iterations counter, COUNTED or None when it can not be known)
+    """
+    tex = load_solver_tex()
+    # solver-tex.py renders joseph and rta from the traces of the solver.py engines
+    return {
+        "joseph": (solver_input, solver.joseph_wcrt, COUNTED),
+        "rta": (solver_input, solver.rta_wcrt, COUNTED),
+        "rta2": (solver_input, solver.rta2_wcrt, COUNTED),
+        "rta3": (solver_input, solver.rta3_wcrt, COUNTED),
+        "accel": (solver_input, solver.accelerated_wcrt, COUNTED),
+        "rta-ub": (solver_input, solver.bounded_wcrt, COUNTED),
+        "tex-rta2": (solver_input, tex.rta2_wcrt, reported_iterations),
+        "tex-rta3": (solver_input, tex.rta3_wcrt, reported_iterations),
+        "tex-rta3-trace": (solver_input, lambda rts: tex.rta3_wcrt(rts, []), reported_iterations),
+    }
+
+
+def measure(adapter, engine, count_iterations, corpus):
+    """
+    Run an engine over a corpus
+    :return: wall time, ceilings, iterations and schedulable sets
+    """
+    inputs = [adapter(rts) for rts in corpus]
+    start = perf_counter()
+    verdicts = [engine(rts)[0] for rts in inputs]
+    elapsed = perf_counter() - start
+
+    # count on a second run, so the counters do not distort the timing
+    ceils, iterations = 0, 0
+    for rts in corpus:
+        counting = adapter(rts, counting=True)
+        if count_iterations == COUNTED:
+            counters = Counters()
+            engine(counting, counters=counters)
+            iterations += counters.iterations
+        else:
+            result = engine(counting)
+            if count_iterations:
+                iterations += count_iterations(result)
+        ceils += counting.ceilings
+    return elapsed, ceils, iterations if count_iterations else None, sum(verdicts)
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Benchmark the WCRT engines of solver.py and solver-tex.py.")
+    parser.add_argument("--n", type=str, default="4,8,16", help="Task counts (e.g. 4-8 or 4,8,16).")
+    parser.add_argument("--uf", type=str, default="0.6:0.9:0.1", help="Utilizations (e.g. 0.5:0.9:0.1).")
+    parser.add_argument("--ratio", type=str, default="10,100,1000", help="Period ratios max-t / min-t.")
+    parser.add_argument("--min-t", type=int, default=10)
+    parser.add_argument("--sets", type=int, default=200, help="RTS per configuration.")
+    parser.add_argument("--engines", type=str, nargs="*", help="Engines to run (all by default).")
+    parser.add_argument("--all-sets", action="store_true", default=False,
+                        help="Include RTS that are not RM schedulable.")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--json", type=str, help="Write the results to this json file.")
+    parser.add_argument("--csv", type=str, help="Write the results to this csv file.")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    available = engines()
+    selected = args.engines or list(available)
+
+    records = []
+    for n in mix_range(args.n):
+        for u in float_range(args.uf):
+            for ratio in mix_range(args.ratio):
+                corpus, _ = generate(args.sets, n, u, args.min_t, args.min_t * ratio, args.seed,
+                                     schedulable=not args.all_sets)
+                # the iterations saved are always counted against rta, run even when it is not selected
+                for name in selected + ([BASELINE] if BASELINE not in selected else []):
+                    elapsed, ceils, iterations, schedulable = measure(*available[name], corpus)
+                    records.append({
+                        "engine": name, "n": n, "uf": u, "ratio": ratio, "sets": len(corpus),
+                        "schedulable": schedulable,
+                        "us per set": elapsed / len(corpus) * 1e6,
+                        "ceilings per task": ceils / (len(corpus) * n),
+                        "iterations per task": iterations / (len(corpus) * n) if iterations is not None else None,
+                    })
+
+    def same_config(engine, record):
+        return next(r for r in records if r["engine"] == engine and
+                    (r["n"], r["uf"], r["ratio"]) == (record["n"], record["uf"], record["ratio"]))
+
+    rows = []
+    for record in records:
+        if record["engine"] not in selected:
+            continue
+        reference, baseline = same_config(selected[0], record), same_config(BASELINE, record)
+        saved = None
+        if record["iterations per task"] is not None:
+            saved = baseline["iterations per task"] - record["iterations per task"]
+        rows.append(list(record.values()) + [reference["us per set"] / record["us per set"], saved])
+    print(tabulate(rows, headers=list(records[0]) + ["speedup vs " + selected[0],
+                                                     "iterations saved vs " + BASELINE], floatfmt=".2f"))
+    records = [record for record in records if record["engine"] in selected]
+
+    if args.json:
+        with open(args.json, "w") as fh:
+            json.dump(records, fh, indent=1)
+    if args.csv:
+        with open(args.csv, "w", newline="") as fh:
+            writer = csv.DictWriter(fh, fieldnames=list(records[0]))
+            writer.writeheader()
+            writer.writerows(records)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,122 @@
+"""
+Persistent cache of analysis results (sqlite3).
+
+Results are keyed by the SHA-256 of the (C, T, D, nro) tuples of a rts in
+priority order, the analysis name and its version, and stored pickled. The
+total size of the stored results is kept up to date by triggers, and the least
+recently used entries are evicted once it exceeds the size bound.
+"""
+import hashlib
+import os
+import pickle
+import sqlite3
+import time
+from taskset import as_taskset
+
+DEFAULT_MAX_BYTES = 256 << 20
+FLUSH_EVERY = 256
+
+
+def default_path() -> str:
+    """ Cache file under $XDG_CACHE_HOME (~/.cache by default) """
+    base = os.environ.get("XDG_CACHE_HOME") or os.path.join(os.path.expanduser("~"), ".cache")
+    return os.path.join(base, "rts-basic-methods", "results.sqlite")
+
+
+def rts_key(rts, analysis: str, version) -> bytes:
+    """
+    Canonical key of the results of an analysis over a rts
+    :param rts: TaskSet or list of task dicts
+    :param analysis: analysis name, including whatever options change its results
+    :param version: analysis version, to be bumped when its results change
+    :return: SHA-256 digest
+    """
+    rts = as_taskset(rts)
+    c, t, d = rts.columns()
+    # the task numbers are part of some results (e.g. the opa priority order)
+    return hashlib.sha256(repr((analysis, version, tuple(zip(c, t, d, rts.nro)))).encode()).digest()
+
+
+class ResultCache:
+    """ Size-bounded LRU store of pickled results, shared by every process using the same file """
+
+    def __init__(self, path: str = None, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.path = path or default_path()
+        self.max_bytes = max_bytes
+        self.hits = self.misses = self.evictions = 0
+        self.pending = 0
+        directory = os.path.dirname(os.path.abspath(self.path))
+        os.makedirs(directory, exist_ok=True)
+        self.db = sqlite3.connect(self.path, timeout=60)
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute("CREATE TABLE IF NOT EXISTS results "
+                        "(key BLOB PRIMARY KEY, value BLOB NOT NULL, size INTEGER NOT NULL, used INTEGER NOT NULL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        # running total of the sizes of the stored results
+        self.db.execute("CREATE TABLE IF NOT EXISTS total (bytes INTEGER NOT NULL)")
+        self.db.execute("INSERT INTO total SELECT (SELECT COALESCE(SUM(size), 0) FROM results) "
+                        "WHERE NOT EXISTS (SELECT 1 FROM total)")
+        self.db.execute("CREATE TRIGGER IF NOT EXISTS results_insert AFTER INSERT ON results "
+                        "BEGIN UPDATE total SET bytes = bytes + NEW.size; END")
+        self.db.execute("CREATE TRIGGER IF NOT EXISTS results_update AFTER UPDATE OF size ON results "
+                        "BEGIN UPDATE total SET bytes = bytes + NEW.size - OLD.size; END")
+        self.db.execute("CREATE TRIGGER IF NOT EXISTS results_delete AFTER DELETE ON results "
+                        "BEGIN UPDATE total SET bytes = bytes - OLD.size; END")
+        self.db.commit()
+
+    def get(self, key: bytes, default=None):
+        """ Cached result of a key, default when it is not cached """
+        row = self.db.execute("SELECT value FROM results WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return default
+        self.hits += 1
+        self.db.execute("UPDATE results SET used = ? WHERE key = ?", (time.time_ns(), key))
+        self._written()
+        return pickle.loads(row[0])
+
+    def put(self, key: bytes, value) -> None:
+        """ Store the result of a key """
+        data = pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL)
+        # an upsert rather than INSERT OR REPLACE, whose deletions do not fire the triggers
+        self.db.execute("INSERT INTO results (key, value, size, used) VALUES (?, ?, ?, ?) ON CONFLICT (key) "
+                        "DO UPDATE SET value = excluded.value, size = excluded.size, used = excluded.used",
+                        (key, data, len(data), time.time_ns()))
+        self._written()
+
+    def _written(self):
+        self.pending += 1
+        if self.pending >= FLUSH_EVERY:
+            self.flush()
+
+    def flush(self) -> None:
+        """ Evict the least recently used results beyond the size bound and commit """
+        excess = self.db.execute("SELECT bytes FROM total").fetchone()[0] - self.max_bytes
+        if excess > 0:
+            evicted = []
+            for key, size in self.db.execute("SELECT key, size FROM results ORDER BY used"):
+                evicted.append((key,))
+                excess -= size
+                if excess <= 0:
+                    break
+            self.db.executemany("DELETE FROM results WHERE key = ?", evicted)
+            self.evictions += len(evicted)
+        self.db.commit()
+        self.pending = 0
+
+    def close(self) -> None:
+        self.flush()
+        self.db.close()
+
+    def stats(self) -> dict:
+        return {"hits": self.hits, "misses": self.misses, "evictions": self.evictions}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def __repr__(self):
+        return "ResultCache({0:}: {1:} hits, {2:} misses, {3:} evictions)".format(
+            self.path, self.hits, self.misses, self.evictions)
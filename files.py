@@ -1,14 +1,49 @@
 from typing import TextIO
+from array import array
+from bisect import bisect_left
 import xml.etree.cElementTree as et
+import io
+import json
+import mmap
+import os
+import re
 import sys
+from rtsb import get_from_rtsb
+from taskset import TaskSet
 
-def get_from_xml(file: TextIO, rts_id_list: list) -> dict:
+INDEX_VERSION = 2
+INDEX_SUFFIX = ".idx"
+CHUNK_SIZE = 1 << 20
+
+
+class RtsFormatError(ValueError):
+    """ An element of a rts file that is not a rts """
+
+
+def xml_rts(elem) -> dict:
+    """
+    Build a rts from a parsed <S> element
+    :param elem: S element
+    :return: rts
+    """
+    tasks = []
+    for task_elem in elem.iter('i'):
+        task = {k: int(float(v)) for k, v in task_elem.attrib.items()}
+        tasks.append(task)
+    return {"id": int(float(elem.get("count"))), "ptasks": TaskSet.from_dicts(tasks)}
+
+
+def get_from_xml(file: TextIO, rts_id_list: list = None) -> dict:
     """
     Retrieve the specified rts from a xml file
     :param file: file object handle
-    :param rts_id: rts id
+    :param rts_id_list: rts ids (S count attribute), None for all the rts in the file
     :return: rts
     """
+    if rts_id_list is not None:
+        yield from get_indexed(file, '.xml', rts_id_list)
+        return
+
     # get an iterable
     context = et.iterparse(file.name, events=('start', 'end',))
     # turn it into a iterator
@@ -16,46 +51,23 @@ def get_from_xml(file: TextIO, rts_id_list: list) -> dict:
     # get the root element
     event, root = next(context)
 
-    current_id, rts_found = 0, False
-
-    for rts_id in rts_id_list:
-        rts = {"id": rts_id, "ptasks": []}
-
-        # read the xml, parse task-sets and simulate it
-        for event, elem in context:
-            if elem.tag == 'S':
-                if event == 'start':
-                    current_id = int(float(elem.get("count")))
-                    if rts_id == current_id:
-                        rts_found = True
-                if event == 'end':
-                    if rts_found:
-                        break
-                    elem.clear()
-
-            if rts_found:
-                if elem.tag == 'i':
-                    if event == 'start':
-                        task = elem.attrib
-                        for k, v in task.items():
-                            task[k] = int(float(v))
-                        rts["ptasks"].append(task)
-
+    for event, elem in context:
+        if elem.tag == 'S' and event == 'end':
+            yield xml_rts(elem)
             root.clear()
-
-        yield rts
     del context
 
 
-def get_from_json(file: TextIO, ids: list) -> dict:
+def json_rts(id: int, tasks) -> dict:
     """
-    Retrieve the specified rts from a json file
-    :param file: file object handle
-    :param ids: list of rts ids
-    :return: list of rts
+    Build a rts from a decoded json array element
+    :param id: rts id
+    :param tasks: list of tasks, or object with periodic and aperiodic lists
+    :return: rts
+    :raises RtsFormatError: when the element is neither
     """
 
-    def get_tasks(ptasks: list) -> list:
+    def get_tasks(ptasks: list) -> TaskSet:
         result = []
         for nro, task in enumerate(ptasks, 1):
             if "nro" not in task:
@@ -67,7 +79,7 @@ def get_from_json(file: TextIO, ids: list) -> dict:
             if "D" not in task:
                 task["D"] = task.pop("d", task["T"])
             result.append(task)
-        return result
+        return TaskSet.from_dicts(result)
 
     def get_atasks(tasks: list) -> list:
         result = []
@@ -81,72 +93,435 @@ def get_from_json(file: TextIO, ids: list) -> dict:
             result.append(task)
         return result
 
-    import json
-    rts_in_file = json.load(file)
-    rts_list = []
+    if type(tasks) is not list and "periodic" not in tasks:
+        raise RtsFormatError("Element {0:} is not a rts (a task list or an object with a periodic list): {1:}".format(
+            id, json.dumps(tasks)))
 
-    for id, tasks in [(id, rts_in_file[id]) for id in ids]:
-        rts = {"id": id, "ptasks": [], "atasks": [], "stasks": []}
-        if type(tasks) is list:
-            rts["ptasks"] = get_tasks(tasks)
-        else:
-            rts["ptasks"] = get_tasks(tasks["periodic"])
+    rts = {"id": id, "ptasks": [], "atasks": [], "stasks": []}
+    if type(tasks) is list:
+        rts["ptasks"] = get_tasks(tasks)
+    else:
+        rts["ptasks"] = get_tasks(tasks["periodic"])
+
+    if "aperiodic" in tasks:
+        rts["atasks"] = get_atasks(tasks["aperiodic"])
+
+    return rts
 
-        if "aperiodic" in tasks:
-            rts["atasks"] = get_atasks(tasks["aperiodic"])
 
-        rts_list.append(rts)
+def iter_json_array(file: TextIO, chunk_size: int = CHUNK_SIZE, spans: bool = False):
+    """
+    Decode the elements of a top-level json array one at a time, in constant memory
+    :param file: file object handle
+    :param chunk_size: number of characters read at a time
+    :param spans: also yield the character offsets where every element starts and ends
+    :return: decoded elements, or (element, start, end) tuples with spans
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof, base = "", 0, False, 0
 
+    def next_char():
+        """ Skip whitespace, reading more of the file when needed """
+        nonlocal buf, pos, eof, base
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\n\r":
+                pos += 1
+            if pos < len(buf) or eof:
+                return buf[pos] if pos < len(buf) else ""
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buf, pos, base = buf[pos:] + chunk, 0, base + pos
+
+    if next_char() != "[":
+        raise ValueError("The json document is not an array")
+    pos += 1
+    if next_char() == "]":
+        return
+
+    while True:
+        next_char()
+        try:
+            element, end = decoder.raw_decode(buf, pos)
+            complete = end < len(buf) or eof
+        except json.JSONDecodeError:
+            if eof:
+                raise
+            complete = False
+        if not complete:
+            # the element continues past the buffer: slide the window and read more
+            chunk = file.read(chunk_size)
+            eof = not chunk
+            buf, pos, base = buf[pos:] + chunk, 0, base + pos
+            continue
+
+        yield (element, base + pos, base + end) if spans else element
+        pos = end
+        separator = next_char()
+        pos += 1
+        if separator == "]":
+            return
+        if separator != ",":
+            raise ValueError("Expected ',' or ']' after a json array element")
+
+
+def get_from_json(file: TextIO, ids: list = None, on_error=None) -> dict:
+    """
+    Retrieve the specified rts from a json file
+    :param file: file object handle
+    :param ids: list of rts ids, None for all the rts in the file
+    :param on_error: optional callback taking the RtsFormatError of an element that is not a rts, which is then
+                     skipped instead of ending the iteration
+    :return: list of rts
+    """
+    if ids is not None:
+        yield from get_indexed(file, '.json', ids)
+        return
+
+    for id, tasks in enumerate(iter_json_array(file)):
+        try:
+            rts = json_rts(id, tasks)
+        except RtsFormatError as e:
+            if on_error is None:
+                raise
+            on_error(e)
+            continue
         yield rts
 
 
-def get_from_txt(file: TextIO) -> dict:
-    param_keys = ["C", "T", "D"]
+def txt_rts(id: int, lines) -> dict:
+    """
+    Build a rts from the task lines of a txt block
+    :param id: rts id
+    :param lines: "C T [D]" lines
+    :return: rts
+    """
+    c, t, d = [], [], []
+    for line in lines:
+        params = line.split()
+        c.append(int(params[0]))
+        t.append(int(params[1]))
+        d.append(int(params[2]) if len(params) > 2 else t[-1])
+    return {"id": id, "ptasks": TaskSet(c, t, d)}
 
-    rts = {"id": 0, "tasks": []}
+
+def get_from_txt(file: TextIO, ids: list = None) -> dict:
+    """
+    Retrieve the specified rts from a txt file. Every rts is a line with the
+    number of tasks followed by one "C T D" line per task. Rts ids start at 1.
+    :param file: file object handle
+    :param ids: list of rts ids, None for all the rts in the file
+    :return: rts
+    """
+    if ids is not None:
+        yield from get_indexed(file, '.txt', ids)
+        return
 
     flag = False
 
     rts_counter = 0
 
-    for line in file.readlines():
+    for line in file:
         if not flag:
             number_of_tasks = int(line)
             flag = True
             rts_counter += 1
-            rts["id"] = rts_counter
-            rts["ptasks"] = []
-            task_counter = 0
+            lines = []
         else:
-            task = {}
             number_of_tasks -= 1
-            task_counter += 1
-            params = line.split()
-            
-            for k, v in zip(param_keys, params):
-                task[k] = int(v)
-            task["nro"] = task_counter
-            rts["ptasks"].append(task)
+            lines.append(line)
 
             if number_of_tasks == 0:
                 flag = False
 
+                yield txt_rts(rts_counter, lines)
+
+
+def scan_xml(fh) -> tuple:
+    """
+    Streaming pass over a xml file locating every <S> element
+    :param fh: binary file handle
+    :return: (id, offset, length) tuples
+    """
+    start_re = re.compile(rb"<S[\s>/][^>]*>")
+    end_re = re.compile(rb"</S\s*>")
+    count_re = re.compile(rb"""count\s*=\s*["']([^"']*)["']""")
+
+    buf, base, start, rts_id = b"", 0, None, None
+    while True:
+        chunk = fh.read(CHUNK_SIZE)
+        buf += chunk
+        pos = 0
+        while True:
+            if start is None:
+                m = start_re.search(buf, pos)
+                if not m:
+                    break
+                start, rts_id = base + m.start(), int(float(count_re.search(m.group()).group(1)))
+                if m.group().endswith(b"/>"):
+                    # self-closing <S .../>: the element ends with its start tag
+                    yield rts_id, start, base + m.end() - start
+                    start = None
+            else:
+                m = end_re.search(buf, pos)
+                if not m:
+                    break
+                yield rts_id, start, base + m.end() - start
+                start = None
+            pos = m.end()
+        if not chunk:
+            break
+        # keep only the tail that may hold a tag split between chunks
+        cut = buf.rfind(b"<", pos)
+        cut = len(buf) if cut < 0 else cut
+        base, buf = base + cut, buf[cut:]
+
+
+def scan_json(fh) -> tuple:
+    """
+    Streaming pass over a json file locating every element of the top-level array.
+    The bytes are decoded as latin-1, one character per byte, so the offsets of
+    the decoder are byte offsets whatever the encoding of the strings.
+    :param fh: binary file handle
+    :return: (id, offset, length) tuples
+    """
+    text = io.TextIOWrapper(fh, encoding="latin-1", newline="")
+    try:
+        for rts_id, (_, start, end) in enumerate(iter_json_array(text, spans=True)):
+            yield rts_id, start, end - start
+    finally:
+        text.detach()
+
+
+def scan_txt(fh) -> tuple:
+    """
+    Streaming pass over a txt file locating every rts block
+    :param fh: binary file handle
+    :return: (id, offset, length) tuples
+    """
+    offset, rts_id = 0, 0
+    while line := fh.readline():
+        if not line.strip():
+            offset += len(line)
+            continue
+        rts_id += 1
+        length = len(line)
+        for _ in range(int(line)):
+            length += len(fh.readline())
+        yield rts_id, offset, length
+        offset += length
+
+
+SCANNERS = {'.xml': scan_xml, '.json': scan_json, '.txt': scan_txt}
+
+
+class Index:
+    """
+    Sidecar index of a rts file: the ids, offsets and lengths of every rts as
+    int64 columns, memory mapped from the sidecar when loaded from it. Ids are
+    located by position when they are consecutive (txt and json), by bisection
+    when they are sorted, and through a dict otherwise (xml count attributes).
+    """
+
+    def __init__(self, ids, offsets, lengths, layout, buffer=None):
+        self.ids, self.offsets, self.lengths = ids, offsets, lengths
+        self.layout = layout
+        self.buffer = buffer
+        self.positions = None
+
+    @staticmethod
+    def layout_of(ids) -> str:
+        """ "dense" for consecutive ids, "sorted" for increasing ones, "unsorted" otherwise """
+        if all(b == a + 1 for a, b in zip(ids, ids[1:])):
+            return "dense"
+        if all(b > a for a, b in zip(ids, ids[1:])):
+            return "sorted"
+        return "unsorted"
+
+    def __len__(self):
+        return len(self.ids)
+
+    def position(self, rts_id: int) -> int:
+        """ Position of a rts id in the columns, -1 when it is not indexed """
+        if self.layout == "dense":
+            pos = rts_id - self.ids[0] if len(self.ids) else -1
+            return pos if 0 <= pos < len(self.ids) else -1
+        if self.layout == "sorted":
+            pos = bisect_left(self.ids, rts_id)
+            return pos if pos < len(self.ids) and self.ids[pos] == rts_id else -1
+        if self.positions is None:
+            self.positions = {}
+            for pos, value in enumerate(self.ids):
+                self.positions.setdefault(value, pos)
+        return self.positions.get(rts_id, -1)
+
+    def locate(self, rts_id: int) -> tuple:
+        """
+        :return: (offset, length) of a rts id
+        :raises KeyError: when the id is not indexed
+        """
+        pos = self.position(rts_id)
+        if pos < 0:
+            raise KeyError(rts_id)
+        return self.offsets[pos], self.lengths[pos]
+
+    def close(self):
+        """ Release the memory map of the sidecar """
+        for column in (self.ids, self.offsets, self.lengths):
+            if isinstance(column, memoryview):
+                column.release()
+        self.ids = self.offsets = self.lengths = None
+        if self.buffer is not None:
+            self.buffer.close()
+            self.buffer = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def map_index(index_path: str, header: dict):
+    """
+    Memory map the columns of a sidecar index
+    :param index_path: sidecar path
+    :param header: expected header fields
+    :return: Index, None when the sidecar is missing, stale or malformed
+    """
+    try:
+        with open(index_path, "rb") as fh:
+            buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+    except (OSError, ValueError):
+        return None
+    try:
+        start = buffer.find(b"\n") + 1
+        stored = json.loads(buffer[:start])
+        count = stored["count"]
+        if {k: stored.get(k) for k in header} != header or len(buffer) != start + 3 * 8 * count:
+            buffer.close()
+            return None
+    except (ValueError, KeyError, TypeError):
+        buffer.close()
+        return None
+    view = memoryview(buffer)
+    columns = [view[start + 8 * count * k:start + 8 * count * (k + 1)].cast("q") for k in range(3)]
+    view.release()
+    return Index(*columns, stored["layout"], buffer)
+
+
+def load_index(path: str, file_type: str) -> Index:
+    """
+    Load the sidecar index of a rts file, building it with a streaming pass when
+    it is missing or does not match the file size and mtime.
+    The sidecar holds a json header line, padded to 8 bytes, followed by the
+    ids, offsets and lengths of every rts as int64 arrays, which are memory
+    mapped so loading does not depend on the number of rts.
+    :param path: rts file path
+    :param file_type: file extension
+    :return: Index of the file, to be closed after use
+    """
+    stat = os.stat(path)
+    header = {"version": INDEX_VERSION, "format": file_type, "size": stat.st_size, "mtime": stat.st_mtime_ns}
+    index_path = path + INDEX_SUFFIX
+
+    index = map_index(index_path, header)
+    if index is not None:
+        return index
+
+    columns = [array("q") for _ in range(3)]
+    with open(path, "rb") as fh:
+        for entry in SCANNERS[file_type](fh):
+            for column, value in zip(columns, entry):
+                column.append(value)
+
+    header["count"] = len(columns[0])
+    header["layout"] = Index.layout_of(columns[0])
+    line = json.dumps(header).encode()
+    line += b" " * (-(len(line) + 1) % 8) + b"\n"
+    try:
+        with open(index_path, "wb") as fh:
+            fh.write(line)
+            for column in columns:
+                column.tofile(fh)
+    except OSError as e:
+        print("Could not write index {0:}: {1:}".format(index_path, e), file=sys.stderr)
+    return Index(*columns, header["layout"])
+
+
+def get_indexed(file: TextIO, file_type: str, ids: list) -> dict:
+    """
+    Retrieve the specified rts seeking straight to them through the sidecar index.
+    Streams that are not regular files are filtered sequentially instead.
+    :param file: file object handle
+    :param file_type: file extension
+    :param ids: list of rts ids, in any order
+    :return: rts, in the order of ids (file order for streams)
+    :raises IndexError: when an id is not in the file
+    """
+    if not os.path.isfile(file.name):
+        wanted = set(ids)
+        for rts in get_from_file(file, None, file_type):
+            if rts["id"] in wanted:
+                wanted.discard(rts["id"])
                 yield rts
+        if wanted:
+            raise IndexError("rts {0:} not found in {1:}".format(min(wanted), file.name))
+        return
+
+    with load_index(file.name, file_type) as index, open(file.name, "rb") as fh:
+        for rts_id in ids:
+            try:
+                offset, length = index.locate(rts_id)
+            except KeyError:
+                raise IndexError("rts {0:} not found in {1:}".format(rts_id, file.name)) from None
+            fh.seek(offset)
+            data = fh.read(length)
+            if file_type == '.xml':
+                yield xml_rts(et.fromstring(data))
+            elif file_type == '.json':
+                yield json_rts(rts_id, json.loads(data))
+            else:
+                yield txt_rts(rts_id, data.decode().splitlines()[1:])
+
+
+def default_ids(file: TextIO, file_type: str = None) -> list:
+    """
+    Rts read from a file when no ids are given: the first one of json and xml
+    files, as solver always did (id 0 of json, the first count attribute of
+    xml, taken from the index), every rts of the other formats, whose ids
+    start at 1, and of streams
+    :param file: an object file
+    :param file_type: file extension, taken from the file name by default
+    :return: list of rts ids, None for all the rts in the file
+    """
+    if file_type is None:
+        file_type = os.path.splitext(file.name)[1]
+    if file_type not in ('.json', '.xml') or not os.path.isfile(file.name):
+        return None
+    if file_type == '.json':
+        return [0]
+    with load_index(file.name, file_type) as index:
+        return [index.ids[0]] if len(index) else []
 
 
-def get_from_file(file: TextIO, ids: list = []) -> dict:
+def get_from_file(file: TextIO, ids: list = None, file_type: str = None, on_error=None) -> dict:
     """
     Retrieve the specified rts from file.
     :param file: an object file
-    :param ids: list of rts ids
+    :param ids: list of rts ids, None for all the rts in the file
+    :param file_type: file extension, taken from the file name by default
+    :param on_error: optional callback taking the RtsFormatError of a json element that is not a rts, which is
+                     then skipped
     :return: a list with the specified rts
     """
-    import os
-    file_type = os.path.splitext(file.name)[1]
+    if file_type is None:
+        file_type = os.path.splitext(file.name)[1]
     if file_type == '.xml':
         return get_from_xml(file, ids)
     if file_type == '.json':
-        return get_from_json(file, ids)
+        return get_from_json(file, ids, on_error)
     if file_type == '.txt':
-        return get_from_txt(file)
-    return get_from_txt(file)
+        return get_from_txt(file, ids)
+    if file_type == '.rtsb':
+        return get_from_rtsb(file, ids)
+    return get_from_txt(file, ids)
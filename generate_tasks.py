@@ -1,34 +1,171 @@
 import argparse
+import os
 import sys
-from simso.core import Model
-from simso.configuration import Configuration
-from simso.generator.task_generator import UUniFastDiscard, gen_periods_uniform, gen_tasksets
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
+from time import perf_counter
+import numpy as np
+from batch import rta_wcrt_batch
+from generator import draw
+from ranges import float_range, mix_range
+from rtsb import RtsbWriter
+
+
+def generate_shard(shard):
+    """
+    Generate one shard of rts. Every shard has its own random stream, derived
+    from the seed and the shard position, so the output does not depend on
+    how shards are spread among workers.
+    :param shard: (n, uf, number of rts, seed, spawn key, params dict)
+    :return: C and T (sets x n) arrays
+    """
+    n, u, nsets, seed, key, params = shard
+    rng = np.random.default_rng(np.random.SeedSequence(seed, spawn_key=key))
+    cs, ts, count = [], [], 0
+    while count < nsets:
+        c, t = draw(nsets - count, n, u, params["min_t"], params["max_t"], rng, params["utilizations"],
+                    params["periods"], rounding="round")
+        if params["schedulable"]:
+            keep = rta_wcrt_batch(c, t, t)[0]
+            c, t = c[keep], t[keep]
+        cs.append(c)
+        ts.append(t)
+        count += len(c)
+    return np.concatenate(cs), np.concatenate(ts)
+
+
+def generate_parallel(shards, jobs, max_pending):
+    """
+    Generate shards in a pool of processes, in input order
+    :param shards: iterable of generate_shard arguments
+    :param jobs: number of worker processes
+    :param max_pending: maximum number of shards submitted and not yet reported
+    :return: generate_shard results
+    """
+    shards = iter(shards)
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        pending = deque(executor.submit(generate_shard, shard) for shard in islice(shards, max_pending))
+        while pending:
+            result = pending.popleft().result()
+            # the next shard is only submitted once a result is handed to the writer
+            for shard in islice(shards, 1):
+                pending.append(executor.submit(generate_shard, shard))
+            yield result
+
+
+class TxtWriter:
+    """ rts blocks: number of tasks followed by one "C T D" line per task """
+
+    def __init__(self, fh):
+        self.fh = fh
+
+    def write(self, c, t):
+        lines = []
+        for row_c, row_t in zip(c.tolist(), t.tolist()):
+            lines.append(str(len(row_c)))
+            lines.extend(f"{ci} {ti} {ti}" for ci, ti in zip(row_c, row_t))
+        self.fh.write("\n".join(lines) + "\n")
+
+    def close(self):
+        if self.fh is not sys.stdout:
+            self.fh.close()
+
+
+class JsonWriter:
+    """ Top-level json array with one list of {"c", "t", "d"} tasks per rts """
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.separator = "[\n"
+
+    def write(self, c, t):
+        for row_c, row_t in zip(c.tolist(), t.tolist()):
+            tasks = ", ".join(f'{{"c": {ci}, "t": {ti}, "d": {ti}}}' for ci, ti in zip(row_c, row_t))
+            self.fh.write(f"{self.separator}  [{tasks}]")
+            self.separator = ",\n"
+
+    def close(self):
+        self.fh.write("[]\n" if self.separator == "[\n" else "\n]\n")
+        if self.fh is not sys.stdout:
+            self.fh.close()
+
+
+class BinaryWriter:
+    """ rtsb file, rts ids start at 1 as in the txt format """
+
+    def __init__(self, path):
+        self.writer = RtsbWriter(path)
+        self.next_id = 1
+
+    def write(self, c, t):
+        self.writer.write_batch(self.next_id, c, t, t)
+        self.next_id += len(c)
+
+    def close(self):
+        self.writer.close()
+
+
+def open_writer(path):
+    """ Writer for the output file, chosen by its extension (stdout is written as txt) """
+    file_type = os.path.splitext(path)[1] if path else '.txt'
+    if file_type == '.rtsb':
+        return BinaryWriter(path)
+    fh = open(path, "w", buffering=1 << 20) if path else sys.stdout
+    return JsonWriter(fh) if file_type == '.json' else TxtWriter(fh)
+
 
 def getargs():
-    parser = argparse.ArgumentParser()
-    parser.add_argument("--n", type=int, default=3)
+    parser = argparse.ArgumentParser(description="Generate random RTS.")
+    parser.add_argument("--n", type=str, default="3", help="Number of tasks, or a range of them (e.g. 3-10 or 4,8,16).")
     parser.add_argument("--min-t", type=int, default=5)
     parser.add_argument("--max-t", type=int, default=50)
-    parser.add_argument("--set", type=int, default=1)
-    parser.add_argument("--max-uf", type=float, default=.75)
+    parser.add_argument("--set", type=int, default=1, help="Number of RTS for each (n, max-uf) combination.")
+    parser.add_argument("--max-uf", type=str, default=".75",
+                        help="Utilization factor, or a range of them (e.g. 0.5:0.9:0.1 or 0.6,0.8).")
+    parser.add_argument("--utilizations", choices=["uunifast", "uunifast-discard", "randfixedsum"],
+                        default="uunifast-discard")
+    parser.add_argument("--periods", choices=["uniform", "loguniform"], default="uniform")
+    parser.add_argument("--schedulable", action="store_true", default=False, help="Keep only RTS schedulable by RM.")
+    parser.add_argument("--seed", type=int, help="Seed. The output only depends on the seed and --shard-size, not on --jobs.")
+    parser.add_argument("--output", type=str, help="Output file (.txt, .json or .rtsb). Defaults to txt on stdout.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--max-pending", type=int, help="Maximum number of shards in flight (default: 2 * jobs).")
+    parser.add_argument("--shard-size", type=int, default=10000, help="Number of RTS generated per work unit.")
+    parser.add_argument("--progress", action="store_true", default=False, help="Report progress on stderr.")
     return parser.parse_args()
 
-args = getargs()
 
-u_list = UUniFastDiscard(args.n, args.max_uf, args.set)
+def main():
+    args = getargs()
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    params = {"min_t": args.min_t, "max_t": args.max_t, "utilizations": args.utilizations, "periods": args.periods,
+              "schedulable": args.schedulable}
+
+    shards = []
+    for config, (n, u) in enumerate((n, u) for n in mix_range(args.n) for u in float_range(args.max_uf)):
+        for shard, first in enumerate(range(0, args.set, args.shard_size)):
+            shards.append((n, u, min(args.shard_size, args.set - first), seed, (config, shard), params))
+    total = sum(shard[2] for shard in shards)
 
-t_list_unsorted = gen_periods_uniform(args.n, args.set, args.min_t, args.max_t, True)
+    writer = open_writer(args.output)
+    done, start = 0, perf_counter()
+    if args.jobs > 1:
+        results = generate_parallel(shards, args.jobs, args.max_pending or 2 * args.jobs)
+    else:
+        results = map(generate_shard, shards)
+    for c, t in results:
+        writer.write(c, t)
+        done += len(c)
+        if args.progress:
+            elapsed = perf_counter() - start
+            print(f"\r{done}/{total} rts, {done / elapsed:.0f} rts/s", end="", file=sys.stderr)
+    writer.close()
 
-t_list = []
-for periods in t_list_unsorted:
-    t_list.append(sorted(periods))
+    if args.progress:
+        elapsed = perf_counter() - start
+        print(f"\r{done} rts in {elapsed:.2f} s, {done / elapsed:.0f} rts/s (seed {seed})", file=sys.stderr)
 
-gen_task_sets = gen_tasksets(u_list, t_list)
 
-for task_set in gen_task_sets:
-    print(len(task_set))
-    for task in task_set:
-        c = round(task[0])
-        if c == 0:
-            c = 1
-        print(f"{c} {int(task[1])} {int(task[1])}")
+if __name__ == '__main__':
+    main()
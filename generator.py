@@ -0,0 +1,177 @@
+import argparse
+from time import perf_counter
+import numpy as np
+from tabulate import tabulate
+from batch import rta_wcrt_batch
+from taskset import TaskSet
+
+
+def uunifast(nsets, n, u, rng):
+    """
+    UUniFast utilizations (Bini & Buttazzo)
+    :return: (nsets x n) array, every row adds up to u
+    """
+    utilizations = np.empty((nsets, n))
+    sum_u = np.full(nsets, float(u))
+    for i in range(1, n):
+        next_sum_u = sum_u * rng.random(nsets) ** (1.0 / (n - i))
+        utilizations[:, i - 1] = sum_u - next_sum_u
+        sum_u = next_sum_u
+    utilizations[:, n - 1] = sum_u
+    return utilizations
+
+
+def uunifast_discard(nsets, n, u, rng):
+    """
+    UUniFast-Discard utilizations (Davis & Burns): UUniFast rows with a task
+    utilization above 1 are discarded and drawn again
+    :return: (nsets x n) array, every row adds up to u
+    """
+    if u > n:
+        raise ValueError("Utilization {0:} is not reachable with {1:} tasks".format(u, n))
+    rows = np.empty((0, n))
+    while len(rows) < nsets:
+        candidates = uunifast(2 * (nsets - len(rows)), n, u, rng)
+        rows = np.concatenate([rows, candidates[(candidates <= 1).all(axis=1)]])
+    return rows[:nsets]
+
+
+def randfixedsum(nsets, n, u, rng):
+    """
+    RandFixedSum utilizations (Stafford, Emberson et al.): uniformly distributed
+    over the points of [0, 1]^n that add up to u
+    :return: (nsets x n) array, every row adds up to u
+    """
+    if u > n:
+        raise ValueError("Utilization {0:} is not reachable with {1:} tasks".format(u, n))
+    if n == 1:
+        return np.full((nsets, 1), float(u))
+
+    # transition probabilities between the simplices that make up the polytope
+    k = min(int(u), n - 1)
+    s1 = u - np.arange(k, k - n, -1.0)
+    s2 = np.arange(k + n, k, -1.0) - u
+    tiny, huge = np.finfo(float).tiny, np.finfo(float).max
+    w = np.zeros((n, n + 1))
+    w[0, 1] = huge
+    t = np.zeros((n - 1, n))
+    for i in range(2, n + 1):
+        tmp1 = w[i - 2, 1:i + 1] * s1[:i] / i
+        tmp2 = w[i - 2, :i] * s2[n - i:n] / i
+        w[i - 1, 1:i + 1] = tmp1 + tmp2
+        tmp3 = w[i - 1, 1:i + 1] + tiny
+        tmp4 = s2[n - i:n] > s1[:i]
+        t[i - 2, :i] = (tmp2 / tmp3) * tmp4 + (1 - tmp1 / tmp3) * ~tmp4
+
+    x = np.zeros((n, nsets))
+    rt = rng.random((n - 1, nsets))  # simplex type
+    rs = rng.random((n - 1, nsets))  # position in the simplex
+    s = np.full(nsets, float(u))
+    j = np.full(nsets, k + 1)
+    sm = np.zeros(nsets)
+    pr = np.ones(nsets)
+    for i in range(n - 1, 0, -1):
+        e = rt[n - i - 1] <= t[i - 1, j - 1]
+        sx = rs[n - i - 1] ** (1.0 / i)
+        sm = sm + (1.0 - sx) * pr * s / (i + 1)
+        pr = sx * pr
+        x[n - i - 1] = sm + pr * e
+        s = s - e
+        j = j - e
+    x[n - 1] = sm + pr * s
+
+    # the coordinates come out in a fixed order: shuffle every row
+    x = x.T
+    return np.take_along_axis(x, np.argsort(rng.random((nsets, n)), axis=1), axis=1)
+
+
+def periods_uniform(nsets, n, tmin, tmax, rng):
+    """ Integer periods drawn uniformly from [tmin, tmax] """
+    return rng.integers(tmin, tmax, size=(nsets, n), endpoint=True)
+
+
+def periods_loguniform(nsets, n, tmin, tmax, rng):
+    """ Integer periods drawn log-uniformly from [tmin, tmax] """
+    periods = np.exp(rng.uniform(np.log(tmin), np.log(tmax + 1), size=(nsets, n)))
+    return np.clip(np.floor(periods), tmin, tmax).astype(np.int64)
+
+
+UTILIZATIONS = {"uunifast": uunifast, "uunifast-discard": uunifast_discard, "randfixedsum": randfixedsum}
+PERIODS = {"uniform": periods_uniform, "loguniform": periods_loguniform}
+
+
+def draw(nsets, n, u, tmin, tmax, rng, utilizations="randfixedsum", periods="uniform", rounding="ceil"):
+    """
+    Draw candidate rts, sorted by period (RM priority order) with implicit deadlines
+    :param rounding: ceil or round the wcet of every task (never below 1)
+    :return: C and T (nsets x n) int64 arrays
+    """
+    t = np.sort(PERIODS[periods](nsets, n, tmin, tmax, rng), axis=1)
+    c = UTILIZATIONS[utilizations](nsets, n, u, rng) * t
+    c = np.ceil(c) if rounding == "ceil" else np.rint(c)
+    return np.maximum(c, 1).astype(np.int64), t
+
+
+def generate(nsets, n, u, tmin, tmax, rng=None, utilizations="randfixedsum", periods="uniform",
+             rounding="ceil", schedulable=True, batch=1024):
+    """
+    Generate rts, filtering batches of candidates with the batch RTA engine
+    :param nsets: number of rts to generate
+    :param n: number of tasks per rts
+    :param u: utilization factor of every rts (before rounding)
+    :param tmin: minimum period
+    :param tmax: maximum period
+    :param rng: numpy Generator (or seed)
+    :param schedulable: keep only rts schedulable by RM
+    :param batch: number of candidates drawn per NumPy call
+    :return: list of TaskSet and generation statistics (None rates for no sets)
+    """
+    rng = np.random.default_rng(rng)
+    accepted, draws, start = [], 0, perf_counter()
+    while len(accepted) < nsets:
+        c, t = draw(batch, n, u, tmin, tmax, rng, utilizations, periods, rounding)
+        keep = np.flatnonzero(rta_wcrt_batch(c, t, t)[0]) if schedulable else np.arange(batch)
+        keep = keep[:nsets - len(accepted)]
+        # candidates past the last one needed do not count as draws
+        draws += batch if len(accepted) + len(keep) < nsets else int(keep[-1]) + 1
+        accepted.extend(TaskSet(row_c, row_t) for row_c, row_t in zip(c[keep].tolist(), t[keep].tolist()))
+
+    elapsed = perf_counter() - start
+    if not accepted:
+        # no sets requested, so nothing was drawn
+        return accepted, {"sets": 0, "draws": 0, "acceptance rate": None, "draws per set": None,
+                          "sets per second": None}
+    stats = {
+        "sets": len(accepted),
+        "draws": draws,
+        "acceptance rate": len(accepted) / draws,
+        "draws per set": draws / len(accepted),
+        "sets per second": len(accepted) / elapsed,
+    }
+    return accepted, stats
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Generate RM schedulable RTS and report the generator throughput.")
+    parser.add_argument("--sets", type=int, default=1000)
+    parser.add_argument("--n", type=int, default=8)
+    parser.add_argument("--uf", type=float, default=0.8)
+    parser.add_argument("--min-t", type=int, default=10)
+    parser.add_argument("--max-t", type=int, default=1000)
+    parser.add_argument("--utilizations", choices=UTILIZATIONS.keys(), default="randfixedsum")
+    parser.add_argument("--periods", choices=PERIODS.keys(), default="uniform")
+    parser.add_argument("--batch", type=int, default=1024)
+    parser.add_argument("--seed", type=int)
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    _, stats = generate(args.sets, args.n, args.uf, args.min_t, args.max_t, args.seed, args.utilizations,
+                        args.periods, batch=args.batch)
+    print(tabulate(stats.items(), floatfmt=".3f"))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,82 @@
+from array import array
+from contextlib import contextmanager
+from time import perf_counter_ns
+import numpy as np
+
+PERCENTILES = [50, 90, 99]
+METRICS = ["iterations", "ceilings", "us"]
+
+
+class Counters:
+    """
+    Work done by one analysis call. The analyses take it as an optional
+    argument and only count when it is given.
+    """
+    __slots__ = ("iterations", "ceilings")
+
+    def __init__(self):
+        self.iterations = 0  # fixed point iterations
+        self.ceilings = 0  # ceiling (interference term) evaluations
+
+
+class Stats:
+    """ Per-analysis samples (iterations, ceilings and microseconds of every call) over an input stream """
+
+    def __init__(self):
+        self.samples = {}
+
+    def record(self, name, counters, ns):
+        """ Add the sample of one call of an analysis """
+        iterations, ceilings, us = self.samples.setdefault(name, (array("q"), array("q"), array("d")))
+        iterations.append(counters.iterations)
+        ceilings.append(counters.ceilings)
+        us.append(ns / 1000)
+
+    @contextmanager
+    def measure(self, name):
+        """ Time the block and record it with the counters it yields """
+        counters = Counters()
+        start = perf_counter_ns()
+        yield counters
+        self.record(name, counters, perf_counter_ns() - start)
+
+    def merge(self, other):
+        """ Add the samples of another Stats (e.g. from a worker process) """
+        for name, columns in other.samples.items():
+            for mine, theirs in zip(self.samples.setdefault(name, (array("q"), array("q"), array("d"))), columns):
+                mine.extend(theirs)
+
+    def summary(self):
+        """
+        Totals and percentiles of every analysis
+        :return: {analysis: {"calls": n, metric: {"total", "mean", "p50", "p90", "p99", "max"}}}
+        """
+        summary = {}
+        for name, columns in self.samples.items():
+            summary[name] = {"calls": len(columns[0])}
+            for metric, column in zip(METRICS, columns):
+                values = np.frombuffer(column, dtype=np.int64 if column.typecode == "q" else np.float64)
+                entry = {"total": values.sum().item(), "mean": values.mean().item()}
+                for p, value in zip(PERCENTILES, np.percentile(values, PERCENTILES)):
+                    entry["p{0:}".format(p)] = value.item()
+                entry["max"] = values.max().item()
+                summary[name][metric] = entry
+        return summary
+
+    def rows(self):
+        """ Table rows of the summary: analysis, calls and the total, p50, p99 and max of every metric """
+        rows = []
+        for name, entry in self.summary().items():
+            row = [name, entry["calls"]]
+            for metric in METRICS:
+                row.extend([entry[metric][key] for key in ("total", "p50", "p99", "max")])
+            rows.append(row)
+        return rows
+
+    @staticmethod
+    def headers():
+        headers = ["analysis", "calls"]
+        for metric in METRICS:
+            headers.extend(["{0:} {1:}".format(metric, key) for key in ("total", "p50", "p99", "max")])
+        return headers
+
@@ -0,0 +1,133 @@
+import csv
+import io
+import json
+from abc import ABC, abstractmethod
+from taskset import WcrtBound
+
+FORMATS = ["text", "table", "jsonl", "csv"]
+BLOCK = 1024  # records written at once
+
+
+def _pairs(value):
+    """ (capacity, period) pairs, None when the bound does not apply """
+    return None if isinstance(value, str) else [[float(capacity), period] for capacity, period in value]
+
+
+def _wcrt(value):
+    rta = list(value["rta"][1])
+    return {"joseph_schedulable": value["joseph"][0], "joseph_wcrt": list(value["joseph"][1]),
+            "rta_schedulable": value["rta"][0], "rta_wcrt": [int(r) for r in rta],
+            # tasks whose rta_wcrt is an upper bound (WcrtBound of the rta-ub engine)
+            "rta_bounded": [i for i, r in enumerate(rta) if isinstance(r, WcrtBound)]}
+
+
+def _free(value):
+    """ free slots, with the reason they are not computed (No planificable, No aplica) or ok """
+    if isinstance(value, str):
+        return {"free": None, "free_status": value}
+    return {"free": list(value), "free_status": "ok"}
+
+
+# typed fields of every entry of AnalysisContext.results
+FIELDS = {
+    "opa": lambda value: {"opa_feasible": value[0], "opa_order": value[1], "opa_evaluations": value[2]},
+    "h": lambda value: {"h": value},
+    "uf": lambda value: {"uf": value},
+    "liu": lambda value: {"liu_bound": value[0], "liu_schedulable": value[1]},
+    "bini": lambda value: {"bini_bound": value[0], "bini_schedulable": value[1]},
+    "wcrt": _wcrt,
+    "edf": lambda value: {"edf_schedulable": value},
+    "free": _free,
+    "k": lambda value: {"k": list(value)},
+    "y": lambda value: {"y": list(value)},
+    "rr": lambda value: {"rr_schedulable": value[0], "rr_min_d": value[1], "rr_sum_c": value[2]},
+    "ps (bound)": lambda value: {"ps": _pairs(value)},
+    "ds (bound)": lambda value: {"ds": _pairs(value)},
+    "ds (k)": lambda value: {"ds_k": _pairs(value)},
+}
+
+
+def record(rts, results, tasks=False):
+    """
+    Flat record of the results of a rts
+    :param rts: rts dict
+    :param results: (name, result) pairs of AnalysisContext.results
+    :param tasks: include the (C, T, D) of every task
+    :return: dict of typed fields
+    """
+    row = {"id": rts["id"]}
+    if tasks:
+        row["tasks"] = [[task["C"], task["T"], task.get("D", task["T"])] for task in rts["ptasks"]]
+    for key, value in results:
+        row.update(FIELDS[key](value))
+    return row
+
+
+class RecordWriter(ABC):
+    """ Write records to a text file in blocks of BLOCK records """
+
+    def __init__(self, fh, block=BLOCK):
+        self.fh = fh
+        self.block = block
+        self.buffer = []
+
+    @abstractmethod
+    def encode(self, row):
+        """ Text of a record """
+
+    def write(self, row):
+        self.buffer.append(self.encode(row))
+        if len(self.buffer) >= self.block:
+            self.flush()
+
+    def flush(self):
+        if self.buffer:
+            self.fh.write("".join(self.buffer))
+            self.buffer.clear()
+        self.fh.flush()
+
+    def close(self):
+        self.flush()
+
+
+class JsonlWriter(RecordWriter):
+    """ One json object per line """
+
+    def encode(self, row):
+        return json.dumps(row, separators=(",", ":")) + "\n"
+
+
+class CsvWriter(RecordWriter):
+    """
+    One csv row per record, with the fields of the first record as header.
+    Lists are json encoded, booleans are true and false as in json, and the
+    results that do not apply (None) are NOT_APPLICABLE.
+    """
+    NOT_APPLICABLE = "n/a"
+
+    def __init__(self, fh, block=BLOCK):
+        super().__init__(fh, block)
+        self.line = io.StringIO()
+        self.writer = None
+
+    def value(self, value):
+        """ Text of a field """
+        if value is None:
+            return self.NOT_APPLICABLE
+        if isinstance(value, (bool, list)):
+            return json.dumps(value, separators=(",", ":"))
+        return value
+
+    def encode(self, row):
+        row = {key: self.value(value) for key, value in row.items()}
+        if self.writer is None:
+            self.writer = csv.DictWriter(self.line, fieldnames=list(row), lineterminator="\n")
+            self.writer.writeheader()
+        self.writer.writerow(row)
+        text = self.line.getvalue()
+        self.line.seek(0)
+        self.line.truncate()
+        return text
+
+
+WRITERS = {"jsonl": JsonlWriter, "csv": CsvWriter}
@@ -0,0 +1,27 @@
+"""
+Parsers of the ranges given on the command line, e.g. --rts 0,3-5 or --uf 0.5:0.9:0.1.
+"""
+
+
+def mix_range(s):
+    """ Parse "3", "3,5" or "3-6" into a list of ints """
+    r = []
+    for i in s.split(','):
+        if '-' not in i:
+            r.append(int(i))
+        else:
+            l, h = map(int, i.split('-'))
+            r += range(l, h+1)
+    return r
+
+
+def float_range(s):
+    """ Parse "0.7", "0.5,0.8" or "0.5:0.9:0.1" (start:stop:step, stop included) into a list of floats """
+    r = []
+    for i in s.split(','):
+        if ':' not in i:
+            r.append(float(i))
+        else:
+            start, stop, step = map(float, i.split(':'))
+            r += [round(start + k * step, 10) for k in range(int(round((stop - start) / step)) + 1)]
+    return r
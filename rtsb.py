@@ -0,0 +1,247 @@
+"""
+Binary task-set container (.rtsb).
+
+Layout, every field little-endian:
+
+    header   magic "RTSB", version (uint32), number of rts (uint64), table offset (uint64),
+             first id (int64), flags (uint64)
+    data     for every rts, its C, T and D columns as packed int64
+    table    number of rts + 1 task offsets (int64, prefix sums of the rts sizes),
+             followed by the id of every rts (int64)
+
+The table goes after the data so rts can be written as they are produced.
+Readers mmap the file and wrap the columns of each rts without copying them,
+but for big-endian hosts, which byte-swap copies of what they read and write.
+"""
+import argparse
+import mmap
+import os
+import struct
+import sys
+from array import array
+from taskset import TaskSet
+
+MAGIC = b"RTSB"
+VERSION = 1
+HEADER = struct.Struct("<4sIQQqQ")
+SEQUENTIAL_IDS = 1  # flag: rts ids are first id, first id + 1, ...
+SWAP = sys.byteorder != "little"  # int64 arrays are byte-swapped from and to the file
+
+
+def little_endian(values: array) -> array:
+    """ The int64 array as stored in the file, a byte-swapped copy on big-endian hosts """
+    if SWAP:
+        values = array("q", values)
+        values.byteswap()
+    return values
+
+
+def native(data) -> array:
+    """ Copy of int64 data of the file in host byte order """
+    values = array("q", bytes(data))
+    if SWAP:
+        values.byteswap()
+    return values
+
+
+class RtsbWriter:
+    """ Write rts into a .rtsb file, one at a time """
+
+    def __init__(self, path: str):
+        self.fh = open(path, "wb")
+        self.fh.write(HEADER.pack(MAGIC, VERSION, 0, 0, 0, 0))
+        self.offsets = array("q", [0])
+        self.ids = array("q")
+        self.sequential = True
+
+    def write(self, rts_id: int, rts) -> None:
+        """
+        Append a rts
+        :param rts_id: rts id
+        :param rts: TaskSet or list of task dicts
+        """
+        c, t, d = rts.columns() if isinstance(rts, TaskSet) else TaskSet.from_dicts(rts).columns()
+        if self.ids and rts_id != self.ids[-1] + 1:
+            self.sequential = False
+        self.ids.append(rts_id)
+        self.offsets.append(self.offsets[-1] + len(c))
+        little_endian(array("q", c + t + d)).tofile(self.fh)
+
+    def write_batch(self, first_id: int, c, t, d) -> None:
+        """
+        Append a batch of equal-size rts with consecutive ids
+        :param first_id: id of the first rts
+        :param c: (sets x tasks) wcet array
+        :param t: (sets x tasks) period array
+        :param d: (sets x tasks) deadline array
+        """
+        import numpy as np
+        nsets, n = c.shape
+        if nsets == 0:
+            return
+        if self.ids and first_id != self.ids[-1] + 1:
+            self.sequential = False
+        self.ids.extend(range(first_id, first_id + nsets))
+        self.offsets.extend(range(self.offsets[-1] + n, self.offsets[-1] + n * nsets + 1, n))
+        np.stack([c, t, d], axis=1).astype("<i8").tofile(self.fh)
+
+    def close(self) -> None:
+        table_offset = self.fh.tell()
+        little_endian(self.offsets).tofile(self.fh)
+        little_endian(self.ids).tofile(self.fh)
+        self.fh.seek(0)
+        self.fh.write(HEADER.pack(MAGIC, VERSION, len(self.ids), table_offset, self.ids[0] if self.ids else 0,
+                                  SEQUENTIAL_IDS if self.sequential else 0))
+        self.fh.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class RtsbReader:
+    """ Random access to the rts of a .rtsb file through mmap, without parsing nor copying """
+
+    def __init__(self, path: str):
+        with open(path, "rb") as fh:
+            self.buffer = mmap.mmap(fh.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.count, self.table_offset, self.first_id, flags = HEADER.unpack_from(self.buffer)
+        if magic != MAGIC or version != VERSION:
+            self.buffer.close()
+            raise ValueError("{0:} is not a rtsb v{1:} file".format(path, VERSION))
+        self.view = memoryview(self.buffer)
+        table = self.view[self.table_offset:self.table_offset + 8 * (2 * self.count + 1)]
+        table = native(table) if SWAP else table.cast("q")
+        self.offsets = table[:self.count + 1]
+        self.ids = table[self.count + 1:2 * self.count + 1]
+        self.sequential = bool(flags & SEQUENTIAL_IDS)
+        self._positions = None
+
+    def __len__(self):
+        return self.count
+
+    def position(self, rts_id: int) -> int:
+        """ Position in the file of the rts with the given id """
+        if self.sequential:
+            position = rts_id - self.first_id
+            if not 0 <= position < self.count:
+                raise IndexError("rts {0:} not found".format(rts_id))
+            return position
+        if self._positions is None:
+            self._positions = {rts_id: position for position, rts_id in enumerate(self.ids)}
+        if rts_id not in self._positions:
+            raise IndexError("rts {0:} not found".format(rts_id))
+        return self._positions[rts_id]
+
+    def rts(self, position: int) -> dict:
+        """ Rts stored at the given position, its columns are views into the file """
+        start, end = self.offsets[position], self.offsets[position + 1]
+        data = self.view[HEADER.size + 24 * start:HEADER.size + 24 * end]
+        if SWAP:
+            data = native(data)
+        return {"id": self.ids[position], "ptasks": TaskSet.from_buffer(data, end - start)}
+
+    def arrays(self):
+        """
+        Zero-copy numpy views of the whole file, for batch consumers
+        :return: task offsets, ids and the packed C/T/D data
+        """
+        import numpy as np
+        table = np.frombuffer(self.view[self.table_offset:self.table_offset + 8 * (2 * self.count + 1)], dtype="<i8")
+        return (table[:self.count + 1], table[self.count + 1:],
+                np.frombuffer(self.view[HEADER.size:HEADER.size + 24 * self.offsets[-1]], dtype="<i8"))
+
+    def close(self) -> None:
+        """
+        Unmap the file. The rts read keep views into the mapping, so while any
+        of them is alive it is only released together with the last one.
+        """
+        if self.buffer is None:
+            return
+        for view in (self.offsets, self.ids, self.view):
+            if isinstance(view, memoryview):
+                view.release()
+        try:
+            self.buffer.close()
+        except BufferError:
+            pass
+        self.buffer = self.view = self.offsets = self.ids = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+def get_from_rtsb(file, ids: list = None) -> dict:
+    """
+    Retrieve the specified rts from a rtsb file
+    :param file: file object handle
+    :param ids: list of rts ids, None for all the rts in the file
+    :return: rts
+    """
+    with RtsbReader(file.name) as reader:
+        positions = range(len(reader)) if ids is None else (reader.position(rts_id) for rts_id in ids)
+        for position in positions:
+            yield reader.rts(position)
+
+
+def convert(src, dst: str) -> int:
+    """
+    Convert a xml, json or txt rts file into rtsb. Only the periodic tasks
+    are stored, so the aperiodic tasks of json rts are dropped with a warning,
+    and so are the json elements that are not rts. The file is written to a
+    temporary path renamed to dst once complete, so an error leaves no output.
+    :param src: source file object
+    :param dst: destination path
+    :return: number of rts written
+    """
+    from files import get_from_file
+
+    def skip(error):
+        print("{0:}: {1:}: skipped".format(src.name, error), file=sys.stderr)
+
+    count = dropped = 0
+    partial = dst + ".part"
+    writer = RtsbWriter(partial)
+    try:
+        for rts in get_from_file(src, on_error=skip):
+            writer.write(rts["id"], rts["ptasks"])
+            count += 1
+            if rts.get("atasks"):
+                dropped += 1
+        writer.close()
+    except BaseException:
+        writer.fh.close()
+        os.remove(partial)
+        raise
+    os.replace(partial, dst)
+    if dropped:
+        print("{0:} rts of {1:} have aperiodic tasks, which rtsb does not store: they were dropped".format(
+            dropped, src.name), file=sys.stderr)
+    return count
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Convert a xml, json or txt RTS file into the rtsb binary format.")
+    parser.add_argument("file", type=argparse.FileType('r'), help="File with RTS.")
+    parser.add_argument("output", type=str, help="Output rtsb file.")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    with args.file as file:
+        try:
+            count = convert(file, args.output)
+        except (ValueError, IndexError) as e:
+            sys.exit("{0:}: {1:}".format(file.name, e))
+    print("{0:} rts written to {1:}".format(count, args.output))
+
+
+if __name__ == '__main__':
+    main()
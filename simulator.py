@@ -0,0 +1,174 @@
+import argparse
+import heapq
+import sys
+import numpy as np
+from tabulate import tabulate
+from files import RtsFormatError, get_from_file
+from solver import END, lcm, rta_wcrt, rts_ids
+from taskset import TaskSet, as_taskset
+
+POLICIES = ["fp", "rm", "dm", "edf"]
+MAX_JOBS = 10 ** 7  # four int64 columns of 80 MB each
+
+
+def priorities(rts, policy):
+    """
+    Fixed priority of every task, 0 being the highest
+    :param policy: fp (the given order), rm (shorter period first), dm (shorter deadline first) or edf (ties)
+    :return: list of priorities
+    """
+    c, t, d = as_taskset(rts).columns()
+    if policy == "rm":
+        order = sorted(range(len(c)), key=lambda i: t[i])
+    elif policy == "dm":
+        order = sorted(range(len(c)), key=lambda i: d[i])
+    else:
+        order = range(len(c))
+    prio = [0] * len(c)
+    for rank, i in enumerate(order):
+        prio[i] = rank
+    return prio
+
+
+def simulate(rts, policy="rm", horizon=None, max_jobs=MAX_JOBS):
+    """
+    Event-driven simulation of the preemptive schedule of a rts on one processor,
+    from the critical instant (every task released at 0). Jobs are released
+    up to the horizon and the simulation goes on until all of them finish.
+    The time jumps from one release or completion to the next one.
+    :param rts: TaskSet or list of task dicts
+    :param policy: fp, rm, dm or edf
+    :param horizon: releases happen before this instant, the hyperperiod by default
+    :param max_jobs: maximum number of jobs released up to the horizon
+    :return: dict of per-job arrays: task, release, start, finish and response
+    :raises ValueError: when the horizon releases more than max_jobs jobs
+    """
+    c, t, d = as_taskset(rts).columns()
+    if horizon is None:
+        horizon = lcm(rts)
+    prio = priorities(rts, policy)
+    edf = policy == "edf"
+
+    counts = [-(-horizon // ti) for ti in t]
+    offsets = [0] * len(c)
+    for i in range(1, len(c)):
+        offsets[i] = offsets[i - 1] + counts[i - 1]
+    njobs = sum(counts)
+    if njobs > max_jobs:
+        raise ValueError("{0:} jobs up to {1:}, more than {2:}: use a shorter --horizon".format(
+            njobs, horizon, max_jobs))
+    release = np.empty(njobs, dtype=np.int64)
+    start = np.full(njobs, -1, dtype=np.int64)
+    finish = np.empty(njobs, dtype=np.int64)
+    remaining = np.empty(njobs, dtype=np.int64)
+
+    releases = [(0, i) for i in range(len(c)) if horizon > 0]
+    heapq.heapify(releases)
+    next_job = list(offsets)
+    ready = []
+    now = 0
+    while releases or ready:
+        while releases and releases[0][0] <= now:
+            r, i = heapq.heappop(releases)
+            job = next_job[i]
+            next_job[i] += 1
+            release[job], remaining[job] = r, c[i]
+            # older jobs of a task go first, their ids are lower
+            heapq.heappush(ready, (r + d[i], prio[i], job) if edf else (prio[i], job))
+            if r + t[i] < horizon:
+                heapq.heappush(releases, (r + t[i], i))
+        if not ready:
+            now = releases[0][0]
+            continue
+
+        job = ready[0][-1]
+        if start[job] < 0:
+            start[job] = now
+        end = now + int(remaining[job])
+        if not releases or end <= releases[0][0]:
+            heapq.heappop(ready)
+            finish[job] = now = end
+        else:
+            # preempted (or not) at the next release
+            remaining[job] -= releases[0][0] - now
+            now = releases[0][0]
+
+    task = np.repeat(np.arange(len(c), dtype=np.int32), counts)
+    return {"task": task, "release": release, "start": start, "finish": finish, "response": finish - release}
+
+
+def max_response(schedule, n):
+    """ Observed maximum response time of every task """
+    result = np.zeros(n, dtype=np.int64)
+    np.maximum.at(result, schedule["task"], schedule["response"])
+    return result
+
+
+def deadline_misses(schedule, rts):
+    """ Number of jobs of every task that finish after their absolute deadline """
+    d = np.asarray(as_taskset(rts).d, dtype=np.int64)
+    late = schedule["finish"] > schedule["release"] + d[schedule["task"]]
+    return np.bincount(schedule["task"], weights=late, minlength=len(d)).astype(np.int64)
+
+
+def fixed_priority_wcrt(rts, policy):
+    """ RTA WCRT of every task with the priorities of the policy, in the given task order """
+    rts = as_taskset(rts)
+    c, t, d = rts.columns()
+    order = sorted(range(len(c)), key=priorities(rts, policy).__getitem__)
+    trace = []
+    _, wcrt = rta_wcrt(TaskSet([c[i] for i in order], [t[i] for i in order], [d[i] for i in order]), trace)
+    # rta_wcrt stops at the first task that misses its deadline, the tasks analysed end in the trace
+    analysed = {event[1] for event in trace if event[0] == END}
+    result = [None] * len(c)
+    for rank, i in enumerate(order):
+        if rank in analysed:
+            result[i] = wcrt[rank]
+    return result
+
+
+def getargs():
+    """ Command line arguments """
+    parser = argparse.ArgumentParser(description="Simulate the RM/DM/EDF schedule of RTS from the critical instant.")
+    parser.add_argument("file", type=argparse.FileType('r'), help="File with RTS.")
+    parser.add_argument("--rts", type=str,
+                        help="RTS to simulate, e.g. 0,3-5, or all for every RTS in the file (by default the first one "
+                             "of json and xml files, every RTS of txt and rtsb files and of stdin)")
+    parser.add_argument("--policy", choices=POLICIES, default="rm",
+                        help="Scheduling policy, fp keeps the given task order as priority order.")
+    parser.add_argument("--horizon", type=int, help="Simulate the releases before this instant (hyperperiod by default).")
+    parser.add_argument("--npz", type=str, help="Save the per-job arrays of every rts to this npz file.")
+    return parser.parse_args()
+
+
+def main():
+    args = getargs()
+    arrays = {}
+
+    with args.file as file:
+        rts_list = get_from_file(file, rts_ids(file, args.rts))
+        try:
+            for rts in rts_list:
+                tasks = as_taskset(rts["ptasks"])
+                schedule = simulate(tasks, args.policy, args.horizon)
+                responses = max_response(schedule, len(tasks))
+                misses = deadline_misses(schedule, tasks)
+                wcrt = fixed_priority_wcrt(tasks, args.policy) if args.policy != "edf" else [None] * len(tasks)
+                jobs = np.bincount(schedule["task"], minlength=len(tasks))
+
+                print("RTS {0:}: {1:} jobs up to {2:}".format(rts["id"], len(schedule["task"]),
+                                                             args.horizon if args.horizon is not None else lcm(tasks)))
+                rows = [[task["nro"], task["C"], task["T"], task["D"], jobs[i], responses[i], misses[i], wcrt[i]]
+                        for i, task in enumerate(tasks)]
+                print(tabulate(rows, headers=["task", "C", "T", "D", "jobs", "max response", "misses", "wcrt (rta)"]))
+                if args.npz:
+                    arrays.update({"{0:}_{1:}".format(rts["id"], key): value for key, value in schedule.items()})
+        except (RtsFormatError, IndexError, ValueError) as e:
+            sys.exit("{0:}: {1:}".format(file.name, e))
+
+    if args.npz:
+        np.savez_compressed(args.npz, **arrays)
+
+
+if __name__ == '__main__':
+    main()
@@ -3,14 +3,30 @@ import math
 import argparse
 import json
 import os
+import random
+import shutil
+import subprocess
+import sys
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor, as_completed
+from contextlib import contextmanager
+from itertools import repeat
+from tempfile import SpooledTemporaryFile
+from time import perf_counter
+import numpy as np
 from pylatex import Document, Section, Subsection, Subsubsection, Command, Math, Package, Alignat
 from pylatex.basic import NewPage, LineBreak, NewLine
-from pylatex.utils import italic, NoEscape
+from pylatex.utils import italic, NoEscape, escape_latex
 from pylatex.base_classes import Environment, Container, Options
 from simso.generator import task_generator
 from functools import reduce
+from cache import DEFAULT_MAX_BYTES, ResultCache, default_path, rts_key
+from ranges import mix_range
+from solver import END, FIXED, ITER, MISS, TASK, joseph_wcrt, rta_wcrt, verdict
+from taskset import TaskSet, as_taskset
 
 actions = ["rts", "fu", "h", "liu", "bini", "joseph", "rta", "rta2", "rta3", "k", "free"]
+# characters pylatex removes from labels
+LABEL_INVALID = set("&%$#_{}~^\\\n\xa0[]\":;' ")
 
 
 class Dmath(Environment):
@@ -58,428 +74,582 @@ def bini_bound(rts):
     return [bound, bound <= 2.0]
 
 
-def joseph_wcrt(rts, doc):
-    """ Calcula el WCRT de cada tarea del str y evalua la planificabilidad """
-
+def tex_taskset(rts):
+    """ TaskSet of a list of {"c", "t", "d"} task dicts """
+    return TaskSet([task["c"] for task in rts], [task["t"] for task in rts],
+                   [task.get("d", task["t"]) for task in rts])
+
+
+def rta2_wcrt(rts, sink=None):
+    """
+    RTA actualizando t despues de cada tarea de mayor prioridad
+    :param sink: optional list where the iteration trace is appended, the
+    terms of every iteration are (A_j, t after task j, t before task j)
+    """
+    c, tp, d = as_taskset(rts).columns()
+    n = len(c)
+    wcrt = [0] * n
+    ceils = [0] * n
+    loops = [0] * n
+    for_loops = [0] * n
+    while_loops = [0] * n
+    a = list(c)
     schedulable = True
-    wcrt = [0] * len(rts)
-    wcrt[0] = rts[0]["c"]  # task 0 wcet
-    rts[0]["r"] = wcrt[0]
-
-    with doc.create(Subsubsection("Tarea 1", numbering=True)):
-        #doc.append(Math(data=["R_1=C_1={:d}".format(wcrt[0])], escape=False))
-        doc.append(Dmath(data=["R_1=C_1={:d}".format(wcrt[0])], options="compact"))
-
-    for i, task in enumerate(rts[1:], 1):
-        r, c, t, d = 0, task["c"], task["t"], task["d"]
-        iter = 0
-        cc = 0
-
-        with doc.create(Subsubsection("Tarea {0:}".format(i+1), numbering=True)):
-            #doc.append(Math(data=["t^0={0:}".format(r)], escape=False))
-            doc.append(Dmath(data=["t^0={0:}".format(r)], options="compact"))
-            while schedulable:
-                iter += 1
-                w = 0
-
-                for taskp in rts[:i]:
-                    cp, tp = taskp["c"], taskp["t"]
-                    w += math.ceil(float(r) / float(tp)) * cp
-                    cc += 1
-
-                w = c + w
-
-                # Latex
-                l2 = ["t^{0:}={1:}+".format(iter, c)]
-                l2.extend(['+'.join(map(str,
-                                        ["\\ceil*{{\\frac{{ {0:} }} {{ {1:} }} }} {2:}".format(r, task["t"], task["c"]) for task in rts[:i]]
-                                        ))])
-                l2.append("={:0}".format(w))
-                if w <= d:
-                    l2.append("=t^{0:} \Rightarrow R_{{ {1:} }}=t^{2:}={3:}".format(iter - 1, i + 1, iter, r) if r == w else "\\neq t^{0:}".format(iter - 1))
-                else:
-                    l2.append(">D_{0:}".format(i+1))
-                doc.append(Dmath(data=l2, options="compact"))
 
-                if r == w:
-                    break
-                r = w
-                if r > d:
-                    schedulable = False
+    t = c[0]
+    wcrt[0] = c[0]
+    if sink is not None:
+        sink.extend([(TASK, 0, c[0]), (END, 0, c[0], True)])
 
-            wcrt[i] = r
+    for idx in range(1, n):
+        t_mas = t + c[idx]
 
-            doc.append("Se necesitaron {0:} ciclos y {1:} calculos de techos.".format(iter, cc))
+        loops[idx] += 1
+        for_loops[idx] += 1
+        if sink is not None:
+            sink.append((TASK, idx, t_mas))
 
-            if not schedulable:
-                doc.append(NewLine())
-                doc.append("Sistema no planificable por RM/DM.")
-                break
+        while schedulable:
+            t = t_mas
 
-    return schedulable, wcrt
+            loops[idx] += 1
+            while_loops[idx] += 1
 
+            terms = []
+            for jdx in range(idx):
+                loops[idx] += 1
+                for_loops[idx] += 1
 
-def wcrt(rts):
-    """ Calcula el WCRT de cada tarea del str y evalua la planificabilidad """
-    wcrt = [0] * len(rts)
-    schedulable = True
-    wcrt[0] = rts[0]["c"]  # task 0 wcet
-    rts[0]["r"] = rts[0]["c"]
-    for i, task in enumerate(rts[1:], 1):
-        c, t, d = task["c"], task["t"], task["d"]
-        r = wcrt[i - 1] + c
-        while schedulable:
-            w = 0
-            for taskp in rts[:i]:
-                cp, tp = taskp["c"], taskp["t"]
-                w += math.ceil(float(r) / float(tp)) * cp
-            w = c + w
-            if r == w:
-                break
-            r = w
-            if r > d:
-                schedulable = False
-        wcrt[i] = r
-        task["r"] = r
-        if not schedulable:
-            break
-    return [schedulable, wcrt]
+                a_tmp = -(-t_mas // tp[jdx]) * c[jdx]
+                old_t_mas = t_mas
+                t_mas += (a_tmp - a[jdx])
+                ceils[idx] += 1
 
+                if t_mas > d[idx]:
+                    schedulable = False
+                    if sink is not None:
+                        terms.append((a[jdx], t_mas, old_t_mas))
+                    break
 
-def rta_wcrt(rts, doc):
-    """ Calcula el WCRT de cada tarea del str y evalua la planificabilidad """
-    wcrt = [0] * len(rts)
-    schedulable = True
-    wcrt[0] = rts[0]["c"]  # task 0 wcet
-    rts[0]["r"] = wcrt[0]
-
-    with doc.create(Subsubsection("Tarea 1", numbering=True)):
-        doc.append(Dmath(data=["R_1=C_1={:d}".format(wcrt[0])], options="compact"))
-
-    for i, task in enumerate(rts[1:], 1):
-        c, t, d = task["c"], task["t"], task["d"]
-        r = wcrt[i-1] + c
-        cc = 0
-        iter = 0
-        with doc.create(Subsubsection("Tarea {0:}".format(i+1), numbering=True)):
-            doc.append(Dmath(data=["t^0=R_{{ {0:} }}+C_{{ {1:} }}={2:}".format(i, i+1, r)], options="compact"))
-            while schedulable:
-                iter += 1
-                w = 0
-                for taskp in rts[:i]:
-                    cp, tp = taskp["c"], taskp["t"]
-                    w += math.ceil(float(r) / float(tp)) * cp
-                    cc += 1
-                w = c + w
-
-                # Latex
-                l2 = ["t^{0:}={1:}+".format(iter, c)]
-                l2.extend(['+'.join(map(str,
-                                        ["\\ceil*{{\\frac{{ {0:} }} {{ {1:} }} }} {2:}".format(r, task["t"], task["c"]) for task in rts[:i]]
-                                        ))])
-                l2.append("={:0}".format(w))
-                if w <= d:
-                    l2.append("=t^{0:} \Rightarrow R_{{ {1:} }}=t^{{ {2:} }}={3:}".format(iter - 1, i + 1, iter, r) if r == w else "\\neq t^{{ {0:} }}".format(iter - 1))
-                else:
-                    l2.append(">D_{{ {0:} }}".format(i+1))
-                doc.append(Dmath(data=l2, options="compact"))
+                a[jdx] = a_tmp
+                if sink is not None:
+                    terms.append((a_tmp, t_mas, old_t_mas))
 
-                if r == w:
-                    break
-                r = w
-                if r > d:
-                    schedulable = False
-            wcrt[i] = r
-            task["r"] = r
-            if not schedulable:
+            if sink is not None:
+                sink.append((ITER, idx, t, tuple(terms), t_mas, verdict(t, t_mas, d[idx])))
+            if t == t_mas:
                 break
 
-        doc.append("{0:} {1:} y {2:} {3:}.".format(iter, "iteraciones" if iter > 1 else "iteración", cc,
-                                                   "techos" if cc > 1 else "techo"))
-
-    return [schedulable, wcrt]
+        wcrt[idx] = t if schedulable else 0
+        if sink is not None:
+            sink.append((END, idx, wcrt[idx], schedulable))
 
+        if not schedulable:
+            break
 
-def rta2_wcrt(rts, doc):
-    wcrt = [0] * len(rts)
-    ceils = [0] * len(rts)
-    loops = [0] * len(rts)
-    for_loops = [0] * len(rts)
-    while_loops = [0] * len(rts)
-    a = [0] * len(rts)
-    schedulable = True
+    return [schedulable, wcrt, ceils, loops, for_loops, while_loops]
 
-    for idx, task in enumerate(rts):
-        a[idx] = task["c"]
 
-    t = rts[0]["c"]
-    wcrt[0] = rts[0]["c"]
+def rta3_wcrt(rts, sink=None):
+    """
+    RTA que ademas omite los techos de las tareas cuya proxima activacion B_j es posterior a t
+    :param sink: optional list where the iteration trace is appended, the
+    terms of every iteration are (A_j, B_j, t after task j, t before task j),
+    from the task of lowest priority up, with None as t before task j when
+    its ceiling was skipped
+    """
+    c, tp, d = as_taskset(rts).columns()
+    n = len(c)
+    wcrt = [0] * n
+    ceils = [0] * n
+    loops = [0] * n
+    for_loops = [0] * n
+    while_loops = [0] * n
+    a = list(c)
+    i = list(tp)
+    schedulable = True
 
-    with doc.create(Subsubsection("Tarea 1", numbering=True)):
-        doc.append(Dmath(data=["R_1=C_1={:d}".format(wcrt[0])], options="compact"))
+    t = c[0]
+    wcrt[0] = c[0]
+    if sink is not None:
+        sink.extend([(TASK, 0, c[0]), (END, 0, c[0], True)])
 
-    for idx, task in enumerate(rts[1:], 1):
-        t_mas = t + task["c"]
+    for idx in range(1, n):
+        t_mas = t + c[idx]
 
-        cc = 0
         loops[idx] += 1
         for_loops[idx] += 1
-        iter = 0
+        if sink is not None:
+            sink.append((TASK, idx, t_mas))
 
-        with doc.create(Subsubsection("Tarea {0:}".format(idx+1), numbering=True)):
-            doc.append(Dmath(data=["t^0=R_{{ {0:} }}+C_{{ {1:} }}={2:}".format(idx, idx+1, t_mas)], options="compact"))
+        while schedulable:
+            t = t_mas
 
-            while schedulable:
-                t = t_mas
-                iter += 1
+            loops[idx] += 1
+            while_loops[idx] += 1
 
+            terms = []
+            for jdx in range(idx - 1, -1, -1):
                 loops[idx] += 1
-                while_loops[idx] += 1
-
-                hist_t = []
-
-                for jdx, jtask in enumerate(rts[:idx]):
-                    loops[idx] += 1
-                    for_loops[idx] += 1
-
-                    tmp = math.ceil(t_mas / jtask["t"])
-                    a_tmp = tmp * jtask["c"]
-                    cc += 1
+                for_loops[idx] += 1
 
+                if t_mas > i[jdx]:
+                    tmp = -(-t_mas // tp[jdx])
+                    a_tmp = tmp * c[jdx]
                     old_t_mas = t_mas
                     t_mas += (a_tmp - a[jdx])
-                    hist_t.append((t_mas, old_t_mas))
                     ceils[idx] += 1
 
-                    if t_mas > task["d"]:
+                    if t_mas > d[idx]:
                         schedulable = False
+                        if sink is not None:
+                            terms.append((a[jdx], i[jdx], t_mas, old_t_mas))
                         break
 
                     a[jdx] = a_tmp
-
-                # Latex
-                l2 = ["t^{0:}={1:}+".format(iter, task["c"])]
-                iter_latex_elements = []
-                for task_id, hp_task, hist_t, task_a in zip(list(range(idx)), rts[:idx], hist_t, a[:idx]):
-                    stack_rel = "\\stackrel{{ \\substack{{ A_{0:}={1:}".format(task_id+1, task_a)
-                    if hist_t[0] != hist_t[1]:
-                        stack_rel += "\\\\[5pt] t={0:}+{1:}={2:}".format(hist_t[1], hist_t[0] - hist_t[1], hist_t[0])
-                    stack_rel += "\\\\[5pt] } }"
-                    iter_latex_elements.append("{0:} {{ \\ceil*{{\\frac{{ {1:} }} {{ {2:} }} }} {3:} }}".format(stack_rel, hist_t[1], hp_task["t"], hp_task["c"]))
-                l2.extend(['+'.join(map(str, iter_latex_elements))])
-
-                l2.append("={:0}".format(t_mas))
-                if t_mas <= task["d"]:
-                    l2.append("=t^{0:} \Rightarrow R_{{ {1:} }}=t^{{ {2:} }}={3:}".format(iter - 1, idx + 1, iter, t_mas) if t == t_mas else "\\neq t^{{ {0:} }}".format( iter - 1))
-                else:
-                    l2.append(">D_{{ {0:} }}".format(idx + 1))
-                doc.append(Dmath(data=l2, options="compact"))
-
-                if t == t_mas:
-                    break
-
-            wcrt[idx] = t
-
-            doc.append("Se necesitaron {0:} ciclos y {1:} calculos de techos.".format(iter, cc))
-
-            if not schedulable:
-                wcrt[idx] = 0
+                    i[jdx] = tmp * tp[jdx]
+                    if sink is not None:
+                        terms.append((a_tmp, i[jdx], t_mas, old_t_mas))
+                elif sink is not None:
+                    terms.append((a[jdx], i[jdx], t_mas, None))
+
+            if sink is not None:
+                sink.append((ITER, idx, t, tuple(terms), t_mas, verdict(t, t_mas, d[idx])))
+            if t == t_mas:
                 break
 
-    return [schedulable, wcrt, ceils, loops, for_loops, while_loops]
-
-
-def rta3_wcrt(rts, doc):
-    wcrt = [0] * len(rts)
-    ceils = [0] * len(rts)
-    loops = [0] * len(rts)
-    for_loops = [0] * len(rts)
-    while_loops = [0] * len(rts)
-    a = [0] * len(rts)
-    i = [0] * len(rts)
-    schedulable = True
-    flag = True
-
-    for idx, task in enumerate(rts):
-        a[idx] = task["c"]
-        i[idx] = task["t"]
-
-    t = rts[0]["c"]
-    wcrt[0] = rts[0]["c"]
-    rts[0]["r"] = rts[0]["c"]
-
-    ab_str = " \quad ".join(["A_{{ {:d} }}={:d},\,B_{{ {:d} }}={:d}".format(idx, task["c"], idx, task["t"]) for idx, task in enumerate(rts, 1)])
-    doc.append(Dmath(data=[ab_str], options="compact"))
-
-    with doc.create(Subsubsection("Tarea 1", numbering=True)):
-        doc.append(Dmath(data=["R_1=C_1={:d}".format(wcrt[0])], options="compact"))
-
-    for idx, task in enumerate(rts[1:], 1):
-        t_mas = t + task["c"]
-        iter = 0
-        cc = 0
-
-        loops[idx] += 1
-        for_loops[idx] += 1
-
-        with doc.create(Subsubsection("Tarea {0:}".format(idx+1), numbering=True)):
-            doc.append(Dmath(data=["t^0=R_{{ {0:} }}+C_{{ {1:} }}={2:}".format(idx, idx+1, t_mas)], options="compact"))
-
-            while schedulable:
-                t = t_mas
-                iter += 1
-
-                loops[idx] += 1
-                while_loops[idx] += 1
-
-                hist_t = []
-
-                for jdx, jtask in zip(range(len(rts[:idx]) - 1, -1, -1), reversed(rts[:idx])):
-                    loops[idx] += 1
-                    for_loops[idx] += 1
-
-                    if t_mas > i[jdx]:
-                        tmp = math.ceil(t_mas / jtask["t"])
-                        a_tmp = tmp * jtask["c"]
-                        cc += 1
-
-                        old_t_mas = t_mas
-                        t_mas += (a_tmp - a[jdx])
-                        hist_t.append((t_mas, old_t_mas))
-                        ceils[idx] += 1
-
-                        if t_mas > task["d"]:
-                            schedulable = False
-                            break
-
-                        a[jdx] = a_tmp
-                        i[jdx] = tmp * jtask["t"]
-                    else:
-                        hist_t.append((t_mas, t_mas))
-
-                # Latex
-                l2 = ["t^{0:}={1:}+".format(iter, task["c"])]
-                iter_latex_elements = []
-                for task_id, hp_task, hist_t, task_a, task_b in zip(list(range(idx, 0, -1)), reversed(rts[:idx]), hist_t, reversed(a[:idx]), reversed(i[:idx])):
-                    stack_rel = "\\stackrel{{ \\substack{{ A_{0:}={1:} \\\\[5pt] B_{0:}={2:}".format(task_id, task_a, task_b)
-                    if hist_t[0] != hist_t[1]:
-                        stack_rel += "\\\\[5pt] t={0:}+{1:}={2:}".format(hist_t[1], hist_t[0] - hist_t[1], hist_t[0])
-                        stack_rel += "\\\\[5pt] } }"
-                        iter_latex_elements.append(
-                            "{0:} {{ \\ceil*{{\\frac{{ {1:} }} {{ {2:} }} }} {3:} }}".format(stack_rel, hist_t[1], hp_task["t"],
-                                                                                             hp_task["c"]))
-                    else:
-                        stack_rel += "\\\\[5pt] } }"
-                        iter_latex_elements.append("{0:} {{ {1:} }}".format(stack_rel, task_a))
+        wcrt[idx] = t if schedulable else 0
+        if sink is not None:
+            sink.append((END, idx, wcrt[idx], schedulable))
 
-
-                l2.extend(['+'.join(map(str, iter_latex_elements))])
-
-                l2.append("={:0}".format(t_mas))
-                if t_mas <= task["d"]:
-                    l2.append("=t^{0:} \Rightarrow R_{{ {1:} }}=t^{{ {2:} }}={3:}".format(iter - 1, idx + 1, iter,
-                                                                                          t_mas) if t == t_mas else "\\neq t^{{ {0:} }}".format(
-                        iter - 1))
-                else:
-                    l2.append(">D_{{ {0:} }}".format(idx + 1))
-                doc.append(Dmath(data=l2, options="compact"))
-
-                if t == t_mas:
-                    break
-
-            wcrt[idx] = t
-
-            doc.append("Se necesitaron {0:} ciclos y {1:} calculos de techos.".format(iter, cc))
-
-            if not schedulable:
-                wcrt[idx] = 0
-                break
+        if not schedulable:
+            break
 
     return [schedulable, wcrt, ceils, loops, for_loops, while_loops]
 
 
-def first_free_slot(rts, doc):
-    """ Calcula primer instante que contiene un slot libre por subsistema """
-    free = [0] * len(rts)
-    for i, task in enumerate(rts, 0):
-        r = free[i-1] - 1 if i > 0 else task["c"]
-        with doc.create(Subsubsection("Tarea {0:}".format(i+1), numbering=True)):
-            data = ["t^0=F_{{ {0:} }}={1:}".format(i, r)] if i > 0 else ["t^0=C_1={{ {0:} }}".format(r)]
-            doc.append(Dmath(data=data, options="compact"))
-            iter = 0
-            while True:
-                iter += 1
-                l = ["1"]
-                l2 = ["t^{{ {0:} }}=".format(iter)]
-                w = 0
-                for taskp in rts[:i+1]:
-                    c, t = taskp["c"], taskp["t"]
-                    w += math.ceil(r / t) * c
-                    l.append("\\ceil*{\\frac{" + str(r) + '}{' + str(t) + "}} }} {:0}".format(c))
-                w = w + 1
-                l2.extend(['+'.join(map(str, l))])
-                l2.append("={:0}".format(w))
-                l2.append("=t^{{ {0:} }}".format(iter-1) if r == w else "\\neq t^{{ {0:} }}".format(iter-1))
-                doc.append(Dmath(data=l2, options="compact"))
-                if r == w:
-                    break
-                r = w
-
-            doc.append("Primera unidad libre en [{0:}-{1:}].".format(r-1, r))
+def first_free_slot(rts, sink=None):
+    """
+    Calcula primer instante que contiene un slot libre por subsistema
+    :param sink: optional list where the iteration trace is appended
+    """
+    c, tp, _ = as_taskset(rts).columns()
+    free = [0] * len(c)
+    hp = []
+    for i in range(len(c)):
+        hp.append((c[i], tp[i]))
+        r = free[i-1] - 1 if i > 0 else c[i]
+        if sink is not None:
+            sink.append((TASK, i, r))
+        while True:
+            w = 1 + sum([-(-r // tj) * cj for cj, tj in hp])
+            if sink is not None:
+                sink.append((ITER, i, r, tuple([-(-r // tj) for _, tj in hp]), w, verdict(r, w)))
+            if r == w:
+                break
+            r = w
         free[i] = r
+        if sink is not None:
+            sink.append((END, i, r, True))
     return free
 
 
-def calculate_k(rts, doc):
-    """ Calcula el K de cada tarea (maximo retraso en el instante critico) """
-    ks = [0] * len(rts)
-    ks[0] = rts[0]["d"] - rts[0]["c"]
-    rts[0]["k"] = rts[0]["d"] - rts[0]["c"]
+def calculate_k(rts, wcrt, sink=None):
+    """
+    Calcula el K de cada tarea (maximo retraso en el instante critico)
+    :param wcrt: WCRT of every task, where the iteration of each task starts
+    :param sink: optional list where the iteration trace is appended
+    """
+    c, tp, d = as_taskset(rts).columns()
+    ks = [0] * len(c)
+    ks[0] = d[0] - c[0]
+    if sink is not None:
+        sink.extend([(TASK, 0, wcrt[0]), (END, 0, ks[0], True)])
+
+    hp = []
+    for i in range(1, len(c)):
+        hp.append((c[i-1], tp[i-1]))
+        r = wcrt[i]  # start from the worst-case response time instante
+        k = 1
+        if sink is not None:
+            sink.append((TASK, i, r))
+        while True:
+            w = c[i] + sum([-(-r // tj) * cj for cj, tj in hp]) + k
+            if sink is not None:
+                sink.append((ITER, i, r, tuple([-(-r // tj) for _, tj in hp]), w, verdict(r, w, d[i])))
+            if r == w:
+                k = k + 1
+            r = w
+            if r > d[i]:
+                break
+        ks[i] = k - 1
+        if sink is not None:
+            sink.append((END, i, ks[i], True))
+    return ks
 
-    with doc.create(Subsubsection("Tarea 1", numbering=True)):
-        doc.append("El máximo retraso para la tarea 1 es ")
-        doc.append(Math(data=["K_1=D_1-C_1={0:}".format(rts[0]["k"])], escape=False, inline=True))
-        doc.append(".")
 
-    for i, task in enumerate(rts[1:], 1):
-        r = task["r"] # start from the worst-case response time instante
-        k = 1
-        c, t, d = task["c"], task["t"], task["d"]
-        with doc.create(Subsubsection("Tarea {0:}".format(i+1), numbering=True)):
-            iter = 0
-            doc.append("Con ")
-            doc.append(Math(data=["K_{{ {0:} }} = {1:}".format(i + 1, k)], escape=False, inline=True))
-            while True:
-                iter += 1
-                w = 0
-                l = ["{0:}".format(k)]
-                l2 = ["t^{{ {0:} }}=".format(iter)]
-                for taskp in rts[:i]:
-                    cp, tp = taskp["c"], taskp["t"]
-                    w += math.ceil(float(r) / float(tp)) * cp
-                    l.append("\\ceil*{\\frac{" + str(r) + '}{' + str(tp) + "}} }} {:0}".format(cp))
-                w = c + w + k
-                l2.extend(['+'.join(map(str, l))])
-                l2.append("={:0}".format(w))
-                if w <= d:
-                    l2.append("=t^{{ {0:} }}".format(iter-1) if r == w else "\\neq t^{{ {0:} }}".format(iter-1))
+def trace_rts(rts, actions):
+    """
+    Run the analyses of the requested actions recording their iteration traces
+    :param rts: list of task dicts
+    :param actions: requested actions
+    :return: trace of every traced action
+    """
+    ts = tex_taskset(rts)
+    traces = {}
+    for action, engine in [("joseph", joseph_wcrt), ("rta", rta_wcrt), ("rta2", rta2_wcrt), ("rta3", rta3_wcrt)]:
+        if action in actions:
+            engine(ts, traces.setdefault(action, []))
+    if "free" in actions and uf(rts) < 1:
+        first_free_slot(ts, traces.setdefault("free", []))
+    if "k" in actions:
+        calculate_k(ts, rta_wcrt(ts)[1], traces.setdefault("k", []))
+    return traces
+
+
+# version of the traces of trace_rts, bump it when they change to invalidate the cached ones
+TRACE_VERSION = 1
+TRACED = ["joseph", "rta", "rta2", "rta3", "free", "k"]
+
+
+def trace_all(rts_list, actions, cache=None):
+    """
+    Traces of every rts, looked up in the result cache before recording them
+    :param cache: ResultCache, or None to always record the traces
+    :return: list with the traces of every rts
+    """
+    if cache is None:
+        return [trace_rts(rts, actions) for rts in rts_list]
+    analysis = "tex:" + ",".join([action for action in TRACED if action in actions])
+    traces = []
+    for rts in rts_list:
+        key = rts_key(tex_taskset(rts), analysis, TRACE_VERSION)
+        rts_traces = cache.get(key)
+        if rts_traces is None:
+            rts_traces = trace_rts(rts, actions)
+            cache.put(key, rts_traces)
+        traces.append(rts_traces)
+    return traces
+
+
+def by_task(trace):
+    """
+    Split a trace by task
+    :return: (i, t0, iterations, end) for every task, where iterations are (number, t, terms, w, verdict)
+    """
+    for event in trace:
+        if event[0] == TASK:
+            _, i, t0 = event
+            iterations = []
+        elif event[0] == ITER:
+            iterations.append((len(iterations) + 1,) + event[2:])
+        else:
+            yield i, t0, iterations, event
+
+
+def iteration_latex(number, c, terms, w, result, i, t, fixed, neq, miss):
+    """ Dmath lines of one iteration: t^number=c+terms=w followed by its verdict """
+    l2 = ["t^{0:}={1:}+".format(number, c), '+'.join(terms), "={:0}".format(w)]
+    if result == MISS:
+        l2.append(miss.format(i + 1))
+    elif result == FIXED:
+        l2.append(fixed.format(number - 1, i + 1, number, t))
+    else:
+        l2.append(neq.format(number - 1))
+    return l2
+
+
+def render_wcrt(rts, trace, out, method):
+    """
+    Render the trace of joseph_wcrt or rta_wcrt
+    :param rts: analysed TaskSet
+    :param trace: iteration trace
+    :param out: renderer output
+    :param method: joseph or rta
+    """
+    c, tp, _ = as_taskset(rts).columns()
+    if method == "joseph":
+        fixed, neq, miss = "=t^{0:} \\Rightarrow R_{{ {1:} }}=t^{2:}={3:}", "\\neq t^{0:}", ">D_{0:}"
+    else:
+        fixed, neq, miss = ("=t^{0:} \\Rightarrow R_{{ {1:} }}=t^{{ {2:} }}={3:}", "\\neq t^{{ {0:} }}",
+                            ">D_{{ {0:} }}")
+    for i, t0, iterations, (_, _, _, schedulable) in by_task(trace):
+        cc = sum([len(terms) for _, _, terms, _, _ in iterations])
+        with out.subsubsection("Tarea {0:}".format(i + 1)):
+            if i == 0:
+                out.dmath(["R_1=C_1={:d}".format(t0)], "compact")
+                continue
+            if method == "joseph":
+                out.dmath(["t^0={0:}".format(t0)], "compact")
+            else:
+                out.dmath(["t^0=R_{{ {0:} }}+C_{{ {1:} }}={2:}".format(i, i + 1, t0)], "compact")
+            for number, t, terms, w, result in iterations:
+                ceils = ["\\ceil*{{\\frac{{ {0:} }} {{ {1:} }} }} {2:}".format(t, tp[j], c[j]) for j in range(i)]
+                out.dmath(iteration_latex(number, c[i], ceils, w, result, i, t, fixed, neq, miss), "compact")
+            if method == "joseph":
+                out.text("Se necesitaron {0:} ciclos y {1:} calculos de techos.".format(len(iterations), cc))
+                if not schedulable:
+                    out.newline()
+                    out.text("Sistema no planificable por RM/DM.")
+        if method == "rta" and schedulable:
+            out.text("{0:} {1:} y {2:} {3:}.".format(len(iterations), "iteraciones" if len(iterations) > 1 else "iteración",
+                                                     cc, "techos" if cc > 1 else "techo"))
+
+
+def render_joseph(rts, trace, out):
+    """ Render the trace of joseph_wcrt """
+    render_wcrt(rts, trace, out, "joseph")
+
+
+def render_rta(rts, trace, out):
+    """ Render the trace of rta_wcrt """
+    render_wcrt(rts, trace, out, "rta")
+
+
+def render_incremental(rts, trace, out, method):
+    """
+    Render the trace of rta2_wcrt or rta3_wcrt
+    :param method: rta2 or rta3
+    """
+    c, tp, _ = as_taskset(rts).columns()
+    fixed, neq, miss = "=t^{0:} \\Rightarrow R_{{ {1:} }}=t^{{ {2:} }}={3:}", "\\neq t^{{ {0:} }}", ">D_{{ {0:} }}"
+    if method == "rta3":
+        out.dmath([" \\quad ".join(["A_{{ {:d} }}={:d},\\,B_{{ {:d} }}={:d}".format(idx, ci, idx, ti)
+                                    for idx, (ci, ti) in enumerate(zip(c, tp), 1)])], "compact")
+    for idx, t0, iterations, _ in by_task(trace):
+        with out.subsubsection("Tarea {0:}".format(idx + 1)):
+            if idx == 0:
+                out.dmath(["R_1=C_1={:d}".format(t0)], "compact")
+                continue
+            out.dmath(["t^0=R_{{ {0:} }}+C_{{ {1:} }}={2:}".format(idx, idx + 1, t0)], "compact")
+            cc = 0
+            for number, t, terms, t_mas, result in iterations:
+                elements = []
+                if method == "rta2":
+                    for jdx, (task_a, new_t, old_t) in enumerate(terms):
+                        cc += 1
+                        stack_rel = "\\stackrel{{ \\substack{{ A_{0:}={1:}".format(jdx + 1, task_a)
+                        if new_t != old_t:
+                            stack_rel += "\\\\[5pt] t={0:}+{1:}={2:}".format(old_t, new_t - old_t, new_t)
+                        stack_rel += "\\\\[5pt] } }"
+                        elements.append("{0:} {{ \\ceil*{{\\frac{{ {1:} }} {{ {2:} }} }} {3:} }}".format(
+                            stack_rel, old_t, tp[jdx], c[jdx]))
                 else:
-                    l2.append(">D_{{ {0:} }}".format(i+1))
-                doc.append(Dmath(data=l2, options="compact"))
+                    for task_id, (task_a, task_b, new_t, old_t) in zip(range(idx, 0, -1), terms):
+                        stack_rel = "\\stackrel{{ \\substack{{ A_{0:}={1:} \\\\[5pt] B_{0:}={2:}".format(
+                            task_id, task_a, task_b)
+                        if old_t is not None:
+                            cc += 1
+                        if old_t is not None and new_t != old_t:
+                            stack_rel += "\\\\[5pt] t={0:}+{1:}={2:}".format(old_t, new_t - old_t, new_t)
+                            stack_rel += "\\\\[5pt] } }"
+                            elements.append("{0:} {{ \\ceil*{{\\frac{{ {1:} }} {{ {2:} }} }} {3:} }}".format(
+                                stack_rel, old_t, tp[task_id - 1], c[task_id - 1]))
+                        else:
+                            stack_rel += "\\\\[5pt] } }"
+                            elements.append("{0:} {{ {1:} }}".format(stack_rel, task_a))
+                out.dmath(iteration_latex(number, c[idx], elements, t_mas, result, idx, t_mas, fixed, neq, miss),
+                          "compact")
+            out.text("Se necesitaron {0:} ciclos y {1:} calculos de techos.".format(len(iterations), cc))
+
+
+def render_rta2(rts, trace, out):
+    """ Render the trace of rta2_wcrt """
+    render_incremental(rts, trace, out, "rta2")
+
+
+def render_rta3(rts, trace, out):
+    """ Render the trace of rta3_wcrt """
+    render_incremental(rts, trace, out, "rta3")
+
+
+def render_free(rts, trace, out):
+    """ Render the trace of first_free_slot """
+    c, tp, _ = as_taskset(rts).columns()
+    for i, r0, iterations, (_, _, r, _) in by_task(trace):
+        with out.subsubsection("Tarea {0:}".format(i + 1)):
+            out.dmath(["t^0=F_{{ {0:} }}={1:}".format(i, r0)] if i > 0 else ["t^0=C_1={{ {0:} }}".format(r0)], "compact")
+            for number, t, terms, w, result in iterations:
+                l = ["1"] + ["\\ceil*{\\frac{" + str(t) + '}{' + str(tp[j]) + "}} }} {:0}".format(c[j]) for j in range(i + 1)]
+                out.dmath(["t^{{ {0:} }}=".format(number), '+'.join(l), "={:0}".format(w),
+                           "=t^{{ {0:} }}".format(number - 1) if result == FIXED else "\\neq t^{{ {0:} }}".format(number - 1)],
+                          "compact")
+            out.text("Primera unidad libre en [{0:}-{1:}].".format(r - 1, r))
+
+
+def render_k(rts, trace, out):
+    """ Render the trace of calculate_k """
+    c, tp, _ = as_taskset(rts).columns()
+    for i, _, iterations, (_, _, ks, _) in by_task(trace):
+        with out.subsubsection("Tarea {0:}".format(i + 1)):
+            if i == 0:
+                out.text("El máximo retraso para la tarea 1 es ")
+                out.math(["K_1=D_1-C_1={0:}".format(ks)], inline=True)
+                out.text(".")
+                continue
+            k = 1
+            out.text("Con ")
+            out.math(["K_{{ {0:} }} = {1:}".format(i + 1, k)], inline=True)
+            for number, r, terms, w, result in iterations:
+                l = ["{0:}".format(k)] + ["\\ceil*{\\frac{" + str(r) + '}{' + str(tp[j]) + "}} }} {:0}".format(c[j])
+                                          for j in range(i)]
+                l2 = ["t^{{ {0:} }}=".format(number), '+'.join(l), "={:0}".format(w)]
+                if result == MISS:
+                    l2.append(">D_{{ {0:} }}".format(i + 1))
+                else:
+                    l2.append("=t^{{ {0:} }}".format(number - 1) if r == w else "\\neq t^{{ {0:} }}".format(number - 1))
+                out.dmath(l2, "compact")
                 if r == w:
-                    r = 1
                     k = k + 1
-                    doc.append("Con ")
-                    doc.append(Math(data=["K_{{ {0:} }} = {1:}".format(i + 1, k)], escape=False, inline=True))
-                r = w
-                if r > d:
-                    break
-            ks[i] = k - 1
-            task["k"] = k - 1
-            doc.append("El máximo retraso para la tarea {0:} es ".format(i+1))
-            doc.append(Math(data=["K_{{ {0:} }}={1:}".format(i+1, task["k"])], escape=False, inline=True))
-            doc.append(".")
-    return ks
+                    out.text("Con ")
+                    out.math(["K_{{ {0:} }} = {1:}".format(i + 1, k)], inline=True)
+            out.text("El máximo retraso para la tarea {0:} es ".format(i + 1))
+            out.math(["K_{{ {0:} }}={1:}".format(i + 1, ks)], inline=True)
+            out.text(".")
+
+
+RENDERERS = {"joseph": render_joseph, "rta": render_rta, "rta2": render_rta2, "rta3": render_rta3,
+             "free": render_free, "k": render_k}
+
+
+class PylatexOutput:
+    """ Renderer output that builds the pylatex document tree """
+
+    def __init__(self, doc):
+        self.containers = [doc]
+
+    @contextmanager
+    def container(self, item):
+        self.containers[-1].append(item)
+        self.containers.append(item)
+        try:
+            yield item
+        finally:
+            self.containers.pop()
+
+    def section(self, title):
+        return self.container(Section(title, numbering=True))
+
+    def subsection(self, title):
+        return self.container(Subsection(title, numbering=True))
+
+    def subsubsection(self, title):
+        return self.container(Subsubsection(title, numbering=True))
+
+    def dmath(self, data, options=None):
+        self.containers[-1].append(Dmath(data=data, options=options))
+
+    def math(self, data, inline=False):
+        self.containers[-1].append(Math(data=data, escape=False, inline=inline))
+
+    def text(self, text):
+        self.containers[-1].append(text)
+
+    def newline(self):
+        self.containers[-1].append(NewLine())
+
+
+class LatexStream:
+    """
+    Renderer output that writes the LaTeX straight to a file handle, with the
+    same layout pylatex gives to the document tree, without building it.
+    Trailing newlines are held back because pylatex strips them at the end of
+    every section. The body is spooled until the end of the document, as the
+    header lists the packages of the math written, in order of first use.
+    """
+    SECTIONS = {"section": "sec", "subsection": "subsec", "subsubsection": "ssubsec"}
+    SPOOL_SIZE = 1 << 24  # bytes of the body kept in memory
+
+    def __init__(self, fh):
+        self.fh = fh
+        self.out = fh
+        self.header = None
+        self.packages = []
+        self.pending = ""
+        # separator and whether the container is still empty, for every open container
+        self.containers = []
+
+    def write(self, text):
+        body = text.rstrip("\n")
+        if body:
+            self.fh.write(self.pending + body)
+            self.pending = text[len(body):]
+        else:
+            self.pending += text
+
+    def item(self, text):
+        """ Write an item of the innermost container """
+        container = self.containers[-1]
+        if not container[1]:
+            self.write(container[0])
+        container[1] = False
+        self.write(text)
+
+    @contextmanager
+    def container(self, latex_name, title):
+        label = "".join([ch for ch in title if 32 <= ord(ch) < 127 and ch not in LABEL_INVALID])
+        self.item("\\{0:}{{{1:}}}%\n\\label{{{2:}:{3:}}}%\n".format(latex_name, escape_latex(title),
+                                                                  self.SECTIONS[latex_name], label))
+        self.containers.append(["%\n", True])
+        try:
+            yield self
+        finally:
+            self.containers.pop()
+            # sections end their paragraph
+            self.pending = ""
+            self.write("\n\n")
+
+    def section(self, title):
+        return self.container("section", title)
+
+    def subsection(self, title):
+        return self.container("subsection", title)
+
+    def subsubsection(self, title):
+        return self.container("subsubsection", title)
+
+    def use(self, package):
+        """ Add a package to the header, the first time it is used """
+        if package not in self.packages:
+            self.packages.append(package)
+
+    def dmath(self, data, options=None):
+        self.use("breqn")
+        self.item("\\begin{{dmath*}}{0:}\n{1:}\n\\end{{dmath*}}".format(
+            "[{0:}]".format(options) if options else "", "\n".join(data)))
+
+    def math(self, data, inline=False):
+        self.use("amsmath")
+        self.item(("${0:}$" if inline else "\\[%\n{0:}%\n\\]").format(" ".join(data)))
+
+    def text(self, text):
+        self.item(escape_latex(text))
+
+    def newline(self):
+        self.item("\\newline")
+
+    def begin(self, packages, preamble):
+        """ Open the document, the preamble is written at the end """
+        self.header = (packages, preamble)
+        self.fh = SpooledTemporaryFile(max_size=self.SPOOL_SIZE, mode="w+", encoding="utf-8")
+        self.write("\\begin{document}")
+        self.containers.append(["%\n", False])
+        self.write("%\n\\normalsize")
+
+    def end(self):
+        """ Close the document """
+        self.containers.pop()
+        self.write("%\n\\end{document}")
+        self.fh.write(self.pending)
+        self.pending = ""
+
+        packages, preamble = self.header
+        packages = packages + [r'\usepackage{' + package + '}' for package in self.packages]
+        self.out.write("%\n".join(packages) + "%\n%\n" + "%\n".join(preamble) + "%\n%\n")
+        self.fh.seek(0)
+        shutil.copyfileobj(self.fh, self.out)
+        self.fh.close()
+        self.fh = self.out
 
 
 def generate_rts(param):
@@ -493,94 +663,107 @@ def generate_rts(param):
                 c, t = task
                 rts.append({"c": math.ceil(c), "t": int(t), "d": int(t)})
         rts = sorted(rts, key=lambda k: k['t'])
-        if wcrt(rts)[0]:
+        if rta_wcrt(tex_taskset(rts))[0]:
             return rts
 
 
-def mix_range(s):
-    r = []
-    for i in s.split(','):
-        if '-' not in i:
-            r.append(int(i))
-        else:
-            l, h = map(int, i.split('-'))
-            r += range(l, h+1)
-    return r
-
-
-def add_rts_to_pdf(key, rts, actions, doc):
+def add_rts_to_pdf(key, rts, actions, out, traces=None):
+    """
+    Add the analyses of a rts to the document
+    :param out: renderer output (PylatexOutput or LatexStream)
+    :param traces: traces recorded by trace_rts, recorded here when not given
+    """
     rts_uf = uf(rts)
+    ts = tex_taskset(rts)
+    if traces is None:
+        traces = trace_rts(rts, actions)
 
-    with doc.create(Section('STR ' + str(key), numbering=True)) as section:
+    with out.section('STR ' + str(key)):
         if "rts" in actions:
-            section.append(Dmath(data=["\Gamma("+str(len(rts))+")", '=', "\\left\\{",
-                              ",".join("({0:}, {1:}, {2:})".format(task["c"], task["t"], task["d"]) for task in rts),
-                              "\\right\\}"]))
+            out.dmath(["\\Gamma("+str(len(rts))+")", '=', "\\left\\{",
+                       ",".join("({0:}, {1:}, {2:})".format(task["c"], task["t"], task["d"]) for task in rts),
+                       "\\right\\}"])
         if "h" in actions:
-            section.append(Math(data=['H=', str(lcm(rts))]))
+            out.math(['H=', str(lcm(rts))])
 
         if "fu" in actions:
-            with section.create(Subsection("Factor de utilización", numbering=True)) as subsection:
-                a = ["FU", '=', '\sum_{i=1}^{'+str(len(rts))+'}\\frac{C_i}{T_i}', '=']
+            with out.subsection("Factor de utilización"):
+                a = ["FU", '=', '\\sum_{i=1}^{'+str(len(rts))+'}\\frac{C_i}{T_i}', '=']
                 s = []
                 for task in rts:
                     s.append("\\frac{" + str(task["c"]) + '}{' + str(task["t"]) + '}')
                 a.extend(['+'.join(map(str, s)), '=', "{:.3f}".format(uf(rts))])
-                subsection.append(Math(data=a, escape=False))
-                subsection.append("El FU del sistema es de {:.00%}.".format(uf(rts)))
+                out.math(a)
+                out.text("El FU del sistema es de {:.00%}.".format(uf(rts)))
 
         if "liu" in actions:
-            with section.create(Subsection('Cota de Liu', numbering=True)) as subsection:
+            with out.subsection('Cota de Liu'):
                 liu = liu_bound(rts)
                 a = ["n(2^{1/n}-1)".replace('n', str(len(rts))), '\\approx', "{:.3f}".format(liu[1])]
                 a.extend(["\\geq" if liu[2] else "\\ngeq", "{:.3f}".format(uf(rts))])
-                subsection.append(Math(data=a, escape=False))
-                subsection.append("Planificable por RM según cota de Liu." if liu[2] else "No se puede garantizar la planificabilidad en RM en base a la cota de Liu.")
-                subsection.append(Math(data=["FU = {0:.3f}".format(rts_uf), " \\leq 1" if rts_uf <= 1 else " > 1"], escape=False))
-                subsection.append("Planificable por EDF según cota de Liu." if rts_uf <= 1 else "No planificable por EDF en base a la cota de Liu.")
+                out.math(a)
+                out.text("Planificable por RM según cota de Liu." if liu[2] else "No se puede garantizar la planificabilidad en RM en base a la cota de Liu.")
+                out.math(["FU = {0:.3f}".format(rts_uf), " \\leq 1" if rts_uf <= 1 else " > 1"])
+                out.text("Planificable por EDF según cota de Liu." if rts_uf <= 1 else "No planificable por EDF en base a la cota de Liu.")
 
         if "bini" in actions:
-            with doc.create(Subsection('Cota de Bini', numbering=True)):
+            with out.subsection('Cota de Bini'):
                 bini = bini_bound(rts)
-                with doc.create(Dmath()):
-                    a = ["\prod_{i=1}^{n}".replace('n', str(len(rts))), "\\left(\\frac{C_i}{T_i}+1\\right)="]
-                    s = []
-                    for task in rts:
-                        s.append("\\left(\\frac{"+str(task["c"])+'}{'+str(task["t"])+'}+1\\right)')
-                    a.extend(['+'.join(map(str, s)), '\\approx', "{:.3f}".format(bini[0])])
-                    a.extend(["\leq" if bini[1] else "\\nleq", "2"])
-                    doc.append(" ".join(a))
-                doc.append("Planificable según cota de Bini." if bini[1] else "No se puede garantizar la planificabilidad en base a la cota de Bini.")
+                a = ["\\prod_{i=1}^{n}".replace('n', str(len(rts))), "\\left(\\frac{C_i}{T_i}+1\\right)="]
+                s = []
+                for task in rts:
+                    s.append("\\left(\\frac{"+str(task["c"])+'}{'+str(task["t"])+'}+1\\right)')
+                a.extend(['+'.join(map(str, s)), '\\approx', "{:.3f}".format(bini[0])])
+                a.extend(["\\leq" if bini[1] else "\\nleq", "2"])
+                out.dmath([" ".join(a)])
+                out.text("Planificable según cota de Bini." if bini[1] else "No se puede garantizar la planificabilidad en base a la cota de Bini.")
 
         if "joseph" in actions:
-            with doc.create(Subsection('Peores casos de tiempo de respuesta con Joseph', numbering=True)):
-                sched_joseph, _ = joseph_wcrt(rts, doc)
+            with out.subsection('Peores casos de tiempo de respuesta con Joseph'):
+                render_joseph(ts, traces["joseph"], out)
 
         if "rta" in actions:
-            with doc.create(Subsection('Peores casos de tiempo de respuesta con RTA', numbering=True)):
-                sched_rta, _ = rta_wcrt(rts, doc)
+            with out.subsection('Peores casos de tiempo de respuesta con RTA'):
+                render_rta(ts, traces["rta"], out)
 
         if "rta2" in actions:
-            with doc.create(Subsection('Peores casos de tiempo de respuesta con RTA2', numbering=True)):
-                rta2_wcrt(rts, doc)
+            with out.subsection('Peores casos de tiempo de respuesta con RTA2'):
+                render_rta2(ts, traces["rta2"], out)
 
         if "rta3" in actions:
-            with doc.create(Subsection('Peores casos de tiempo de respuesta con RTA3', numbering=True)):
-                rta3_wcrt(rts, doc)
+            with out.subsection('Peores casos de tiempo de respuesta con RTA3'):
+                render_rta3(ts, traces["rta3"], out)
 
         if "free" in actions:
-            with doc.create(Subsection('Primera unidad libre', numbering=True)):
+            with out.subsection('Primera unidad libre'):
                 if rts_uf < 1:
-                    first_free_slot(rts, doc)
+                    render_free(ts, traces["free"], out)
                 else:
-                    doc.append("Sistema {0:}.".format("saturado" if rts_uf == 1 else "sobresaturado"))
+                    out.text("Sistema {0:}.".format("saturado" if rts_uf == 1 else "sobresaturado"))
 
         if "k" in actions:
-            with doc.create(Subsection('Máximo retraso desde el instante crítico', numbering=True)):
-                calculate_k(rts, doc)
+            with out.subsection('Máximo retraso desde el instante crítico'):
+                render_k(ts, traces["k"], out)
+
 
+# Use \ceil to enclose expressions
+PREAMBLE = [r'\DeclarePairedDelimiter{\ceil}{\lceil}{\rceil}',
+            r'\DeclarePairedDelimiter{\floor}{\lceil}{\floor}',
+            r'\pagenumbering{gobble}']
 
-def generate_pdf(rts_list, actions, pdf_name, topic=0):
+# document class and packages of build_document, followed by the ones its content adds
+HEADER = [r'\documentclass[fleqn]{article}', r'\usepackage[T1]{fontenc}', r'\usepackage[utf8]{inputenc}',
+          r'\usepackage{lmodern}', r'\usepackage{textcomp}', r'\usepackage{lastpage}', r'\usepackage{geometry}',
+          r'\geometry{margin=1cm}', r'\usepackage[pdftex,pdfauthor=IF025,pdftitle=TP1]{hyperref}',
+          r'\usepackage{amssymb}', r'\usepackage{bookmark}', r'\usepackage{mathtools}']
+
+
+def build_document(rts_list, actions, traces=None):
+    """
+    Build the pylatex document with the analyses of every rts
+    :param traces: traces recorded by trace_rts for every rts, recorded when not given
+    :return: document
+    """
     geometry_options = {"margin": "1cm"}
 
     doc = Document(fontenc="T1", inputenc="utf8", geometry_options=geometry_options, document_options="fleqn")
@@ -591,17 +774,175 @@ def generate_pdf(rts_list, actions, pdf_name, topic=0):
                     Package('mathtools')]:
         doc.packages.append(package)
 
-    # Use \ceil to enclose expressions
-    doc.preamble.append(NoEscape(r'\DeclarePairedDelimiter{\ceil}{\lceil}{\rceil}'))
-    doc.preamble.append(NoEscape(r'\DeclarePairedDelimiter{\floor}{\lceil}{\floor}'))
-    doc.preamble.append(NoEscape(r'\pagenumbering{gobble}'))
-
-    for k, rts in zip(string.ascii_lowercase, rts_list):
-        add_rts_to_pdf(k, rts, actions, doc)
+    for command in PREAMBLE:
+        doc.preamble.append(NoEscape(command))
+
+    out = PylatexOutput(doc)
+    for k, rts, rts_traces in zip(string.ascii_lowercase, rts_list, traces or [None] * len(rts_list)):
+        add_rts_to_pdf(k, rts, actions, out, rts_traces)
+    return doc
+
+
+def stream_document(fh, rts_list, actions, traces=None):
+    """
+    Write the document of build_document straight to a file handle, one rts
+    at a time, without building the pylatex tree
+    :param fh: text file handle
+    :param rts_list: iterable of rts
+    :param traces: iterable with the traces of every rts, recorded when not given
+    """
+    out = LatexStream(fh)
+    out.begin(HEADER, PREAMBLE)
+    for k, rts, rts_traces in zip(string.ascii_lowercase, rts_list, traces or repeat(None)):
+        add_rts_to_pdf(k, rts, actions, out, rts_traces)
+    out.end()
+
+
+def write_tex(filepath, rts_list, actions, traces=None, backend="pylatex"):
+    """
+    Write the .tex source of the document
+    :param filepath: path without extension
+    :param backend: pylatex builds the document tree, stream writes it as it is rendered
+    """
+    if backend == "stream":
+        with open(filepath + ".tex", "w", encoding="utf-8", buffering=1 << 16) as fh:
+            stream_document(fh, rts_list, actions, traces)
+    else:
+        build_document(rts_list, actions, traces).generate_tex(filepath)
+
+
+def generate_pdf(rts_list, actions, pdf_name, topic=0, traces=None, backend="pylatex"):
+    if backend == "stream":
+        write_tex(pdf_name, rts_list, actions, traces, backend)
+        compile_tex(pdf_name)
+        return
+    doc = build_document(rts_list, actions, traces)
     doc.generate_pdf(filepath=pdf_name)
     print(doc.dumps())
 
 
+def topic_rts(rts_in_file, ids=None):
+    """
+    Task sets of a topic: the listed ones, with implicit deadlines where
+    missing, and a new schedulable rts for every generation params dict
+    :param rts_in_file: decoded json file
+    :param ids: positions of the rts to evaluate, all by default
+    :return: list of rts
+    """
+    rts_to_evaluate = []
+    for rts in [rts_in_file[i] for i in ids] if ids else rts_in_file:
+        if type(rts) is list:
+            for task in rts:
+                if "d" not in task:
+                    task["d"] = task["t"]
+        if type(rts) is dict:
+            rts = generate_rts(rts)
+        rts_to_evaluate.append(rts)
+    return rts_to_evaluate
+
+
+def seed_topic(seed, topic):
+    """ Seed the random generators used by simso with a stream derived from the seed and the topic """
+    state = np.random.SeedSequence(seed, spawn_key=(topic,)).generate_state(4)
+    np.random.seed(state)
+    random.seed(int.from_bytes(state.tobytes(), "little"))
+
+
+def build_topic(job):
+    """
+    Pipeline worker: analyse the rts of a topic and write its .tex source
+    :param job: (topic, decoded json file, rts ids, actions, output path without extension, seed, export traces,
+    LaTeX backend, (cache path, cache size) or None)
+    :return: topic, output path, elapsed seconds, the exported traces and the cache statistics
+    """
+    topic, rts_in_file, ids, actions, filepath, seed, export, backend, cache_args = job
+    start = perf_counter()
+    seed_topic(seed, topic)
+    rts_to_evaluate = topic_rts(rts_in_file, ids)
+    if cache_args is None:
+        traces, stats = trace_all(rts_to_evaluate, actions), {}
+    else:
+        with ResultCache(*cache_args) as cache:
+            traces = trace_all(rts_to_evaluate, actions, cache)
+        stats = cache.stats()
+    write_tex(filepath, rts_to_evaluate, actions, traces, backend)
+    exported = [{"topic": topic, "key": k, "rts": rts, "traces": rts_traces}
+                for k, rts, rts_traces in zip(string.ascii_lowercase, rts_to_evaluate, traces)] if export else []
+    return topic, filepath, perf_counter() - start, exported, stats
+
+
+LATEX_COMPILERS = [["latexmk", "--pdf"], ["pdflatex"]]
+LATEX_AUXILIARY = ["aux", "log", "out", "fls", "fdb_latexmk"]
+
+
+def compile_tex(filepath):
+    """
+    Compile a .tex source into a PDF like pylatex does (latexmk, or pdflatex
+    when it is not installed), removing the auxiliary files and the source
+    :param filepath: path without extension
+    :return: elapsed seconds
+    """
+    start = perf_counter()
+    filepath = os.path.abspath(filepath)
+    for compiler in LATEX_COMPILERS:
+        try:
+            subprocess.run(compiler + ["--interaction=nonstopmode", filepath + ".tex"], cwd=os.path.dirname(filepath),
+                           stdout=subprocess.PIPE, stderr=subprocess.STDOUT, check=True)
+        except FileNotFoundError:
+            continue
+        break
+    else:
+        raise RuntimeError("No LaTeX compiler was found (latexmk or pdflatex), {0:}.tex was kept".format(filepath))
+
+    for ext in LATEX_AUXILIARY + ["tex"]:
+        try:
+            os.remove(filepath + "." + ext)
+        except FileNotFoundError:
+            pass
+    return perf_counter() - start
+
+
+def pipeline(rts_in_file, args, base):
+    """
+    Build the .tex source of every topic in a process pool and compile each
+    source as soon as it is ready, with at most args.latex_jobs compilers
+    running at the same time. Per-topic timing is reported on stderr.
+    :return: exported traces, ordered by topic, the number of topics that failed to compile and the cache statistics
+    """
+    seed = args.seed if args.seed is not None else np.random.SeedSequence().entropy
+    cache_args = None if args.cache is None else (args.cache, args.cache_size << 20)
+    jobs = [(topic, rts_in_file, mix_range(args.rts) if args.rts else None, args.actions,
+             "{0:}-{1:}".format(base, topic), seed, bool(args.trace), args.backend, cache_args)
+            for topic in range(1, args.topics + 1)]
+
+    start = perf_counter()
+    exported, compiles, failed, stats = {}, {}, 0, {}
+    with ProcessPoolExecutor(max_workers=args.jobs) as builders, \
+            ThreadPoolExecutor(max_workers=args.latex_jobs) as compilers:
+        for future in as_completed([builders.submit(build_topic, job) for job in jobs]):
+            topic, filepath, tex_time, exported[topic], topic_stats = future.result()
+            for key, value in topic_stats.items():
+                stats[key] = stats.get(key, 0) + value
+            if args.no_pdf:
+                print("Topic {0:}: {1:}.tex in {2:.2f} s".format(topic, filepath, tex_time), file=sys.stderr)
+            else:
+                compiles[compilers.submit(compile_tex, filepath)] = (topic, filepath, tex_time)
+        for future in as_completed(compiles):
+            topic, filepath, tex_time = compiles[future]
+            try:
+                pdf_time = future.result()
+            except (RuntimeError, subprocess.CalledProcessError) as e:
+                failed += 1
+                print("Topic {0:}: {1:}.tex in {2:.2f} s, {3:}".format(topic, filepath, tex_time, e), file=sys.stderr)
+                continue
+            print("Topic {0:}: {1:}.pdf in {2:.2f} s (tex {3:.2f} s, pdf {4:.2f} s)".format(
+                topic, filepath, tex_time + pdf_time, tex_time, pdf_time), file=sys.stderr)
+
+    print("{0:} topics in {1:.2f} s (seed {2:}){3:}".format(
+        args.topics, perf_counter() - start, seed, ", {0:} failed".format(failed) if failed else ""), file=sys.stderr)
+    return [entry for topic in sorted(exported) for entry in exported[topic]], failed, stats
+
+
 def getargs():
     """ Command line arguments """
     parser = argparse.ArgumentParser(description="Basic methods for RTS schedulability and WCRT analysis.")
@@ -610,27 +951,61 @@ def getargs():
     parser.add_argument("--pdf", type=str, help="Name of the output PDF file(s). If topic is greater than one, it's appended to the filename.")
     parser.add_argument("--topics", type=int, default=1, help="Number of topics.")
     parser.add_argument("--actions", type=str, nargs="*", choices=actions, default=actions)
+    parser.add_argument("--trace", type=str, help="Export the iteration traces of the analyses to this json file.")
+    parser.add_argument("--no-pdf", action="store_true", default=False, help="Do not compile the PDF (the pipeline still writes the .tex sources).")
+    parser.add_argument("--pipeline", action="store_true", default=False,
+                        help="Build the topics in parallel and compile them concurrently, without dumping the LaTeX to stdout.")
+    parser.add_argument("--jobs", type=int, help="Processes building .tex sources in pipeline mode (all CPUs by default).")
+    # explicit, as a ThreadPoolExecutor would otherwise run min(32, CPUs + 4) of them
+    parser.add_argument("--latex-jobs", type=int, default=os.cpu_count(),
+                        help="LaTeX compilers running at once in pipeline mode (all CPUs by default).")
+    parser.add_argument("--seed", type=int, help="Seed for the generated RTS, every topic gets its own stream.")
+    parser.add_argument("--backend", choices=["pylatex", "stream"], default="pylatex",
+                        help="Build the pylatex document tree, or stream the LaTeX straight to the .tex file "
+                             "(constant memory, no stdout dump).")
+    parser.add_argument("--cache", type=str, nargs="?", const=default_path(),
+                        help="Reuse the results stored in this result cache file and store the new ones "
+                             "(~/.cache/rts-basic-methods/results.sqlite when no file is given). Off by default.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES >> 20,
+                        help="Size bound of the result cache in MiB, least recently used results are evicted.")
     return parser.parse_args()
 
 
 def main():
     args = getargs()
 
+    exported, failed = [], 0
     with args.file as file:
         rts_in_file = json.load(file)
+        base = args.pdf if args.pdf else os.path.splitext(file.name)[0]
+
+    if args.pipeline:
+        exported, failed, stats = pipeline(rts_in_file, args, base)
+    else:
+        cache = None if args.cache is None else ResultCache(args.cache, args.cache_size << 20)
         for topic in range(1, args.topics + 1, 1):
-            rts_to_evaluate = []
-            filepath = "{0:}-{1:}".format(args.pdf if args.pdf else os.path.splitext(file.name)[0], topic)
-            for rts in [rts_in_file[i] for i in mix_range(args.rts)] if args.rts else rts_in_file:
-                if type(rts) is list:
-                    for task in rts:
-                        if "d" not in task:
-                            task["d"] = task["t"]
-                if type(rts) is dict:
-                    rts = generate_rts(rts)
-                wcrt(rts)
-                rts_to_evaluate.append(rts)
-            generate_pdf(rts_to_evaluate, args.actions, filepath, topic=topic)
+            if args.seed is not None:
+                seed_topic(args.seed, topic)
+            filepath = "{0:}-{1:}".format(base, topic)
+            rts_to_evaluate = topic_rts(rts_in_file, mix_range(args.rts) if args.rts else None)
+            traces = trace_all(rts_to_evaluate, args.actions, cache) if args.trace or cache is not None else None
+            if args.trace:
+                exported.extend({"topic": topic, "key": k, "rts": rts, "traces": rts_traces}
+                                for k, rts, rts_traces in zip(string.ascii_lowercase, rts_to_evaluate, traces))
+            if not args.no_pdf:
+                generate_pdf(rts_to_evaluate, args.actions, filepath, topic=topic, traces=traces, backend=args.backend)
+        if cache is not None:
+            cache.close()
+            stats = cache.stats()
+
+    if args.trace:
+        with open(args.trace, "w") as fh:
+            json.dump(exported, fh)
+    if args.cache is not None:
+        print("Cache: {0:} hits, {1:} misses, {2:} evictions".format(
+            stats.get("hits", 0), stats.get("misses", 0), stats.get("evictions", 0)), file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
@@ -1,97 +1,428 @@
 import argparse
+import json
 import sys
-from functools import reduce
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+from contextlib import nullcontext
+from fractions import Fraction
+from functools import cached_property, reduce
+from itertools import islice
 from math import ceil, gcd
-from simso.generator import task_generator
 from tabulate import tabulate
-from files import get_from_file
+from batch import rta_wcrt_many
+from cache import DEFAULT_MAX_BYTES, ResultCache, default_path, rts_key
+from files import RtsFormatError, default_ids, get_from_file
+from generator import generate
+from instrument import Stats
+from output import FORMATS, WRITERS, record
+from ranges import mix_range
+from taskset import TaskSet, WcrtBound, as_taskset
+
+# Iteration trace events, appended to the optional sink of the WCRT engines:
+#   (TASK, i, t0)                       the analysis of task i starts from t0
+#   (ITER, i, t, terms, w, verdict)     one iteration from t to w, terms are the ceilings of the other tasks at t
+#   (END, i, r, schedulable)            result of task i
+TASK, ITER, END = "task", "iter", "end"
+FIXED, NEXT, MISS = "fixed", "next", "miss"
+
+
+def verdict(t, w, d=None):
+    """ Verdict of an iteration from t to w, for a task with deadline d """
+    return MISS if d is not None and w > d else FIXED if t == w else NEXT
 
 
 def lcm(rts):
     """ Real-time system hiperperiod (l.c.m) """
-    return reduce(lambda x, y: (x * y) // gcd(x, y), [task["T"] for task in rts], 1)
+    return reduce(lambda x, y: (x * y) // gcd(x, y), as_taskset(rts).t, 1)
 
 
 def uf(rts):
     """ Real-time system utilization factor """
-    return sum([float(task["C"]) / float(task["T"]) for task in rts])
+    rts = as_taskset(rts)
+    return sum([c / t for c, t in zip(rts.c, rts.t)])
 
 
 def round_robin(rts):
     """ Evaluate schedulability of the round robin scheduling algorithm """
-    min_d = float("inf")
-    sum_c = 0
-    for task in rts:
-        if task["D"] < min_d:
-            min_d = task["D"]
-        sum_c = sum_c + task["C"]
+    rts = as_taskset(rts)
+    min_d = min(rts.d, default=float("inf"))
+    sum_c = sum(rts.c)
     return [min_d >= sum_c, min_d, sum_c]
 
 
-def liu_bound(rts):
+def liu_bound(rts, u=None):
     """ Evaluate schedulability using the Liu & Layland bound """
     bound = len(rts) * (pow(2, 1.0 / float(len(rts))) - 1)
-    return [bound, uf(rts) <= bound]
+    return [bound, (uf(rts) if u is None else u) <= bound]
 
 
 def bini_bound(rts):
     """ Evaluate schedulability using the hyperbolic bound """
-    bound = reduce(lambda a, b: a*b, [float(task["C"]) / float(task["T"]) + 1 for task in rts])
+    rts = as_taskset(rts)
+    bound = reduce(lambda a, b: a*b, [c / t + 1 for c, t in zip(rts.c, rts.t)])
     return [bound, bound <= 2.0]
 
 
-def joseph_wcrt(rts):
-    """ Evaluate schedulability using the Joseph & Pandya exact schedulability test """
-    wcrt = [0] * len(rts)
+def busy_period(rts):
+    """ Length of the synchronous busy period, for utilization factors up to 1 """
+    c, tp, _ = as_taskset(rts).columns()
+    w = sum(c)
+    while True:
+        w_next = sum([-(-w // tj) * cj for cj, tj in zip(c, tp)])
+        if w_next == w:
+            return w
+        w = w_next
+
+
+def demand(c, tp, d, t):
+    """ Processor demand h(t) of the jobs released from 0 with absolute deadline up to t """
+    return sum([((t - di) // ti + 1) * ci for ci, ti, di in zip(c, tp, d) if di <= t])
+
+
+def last_deadline(tp, d, t):
+    """ Latest absolute deadline before t, None if there is none """
+    return max([(t - di - 1) // ti * ti + di for ti, di in zip(tp, d) if di < t], default=None)
+
+
+def edf_qpa(rts, u=None, counters=None):
+    """
+    Exact EDF schedulability test with Quick Processor-demand Analysis (Zhang & Burns).
+    The deadlines before the busy period or the La bound are walked backwards,
+    jumping to h(t) whenever the demand is below t.
+    Without constrained deadlines it is the utilization test.
+    :param u: utilization factor, computed when not given
+    :param counters: optional Counters of the processor demand evaluations (as iterations) and their terms
+    :return: schedulable
+    """
+    rts = as_taskset(rts)
+    c, tp, d = rts.columns()
+    if u is None:
+        u = uf(rts)
+    if all([di >= ti for ti, di in zip(tp, d)]):
+        return u <= 1
+
+    u = sum([Fraction(ci, ti) for ci, ti in zip(c, tp)])
+    if u > 1:
+        return False
+    bound = busy_period(rts)
+    if u < 1:
+        la = sum([(ti - di) * Fraction(ci, ti) for ci, ti, di in zip(c, tp, d)]) / (1 - u)
+        bound = min(bound, max(max(d), ceil(la)))
+
+    d_min = min(d)
+    t = last_deadline(tp, d, bound)
+    while t is not None:
+        h = demand(c, tp, d, t)
+        if counters is not None:
+            counters.iterations += 1
+            counters.ceilings += len(c)
+        if h > t:
+            return False
+        if h <= d_min:
+            break
+        t = h if h < t else last_deadline(tp, d, t)
+    return True
+
+
+class InterferenceIndex:
+    """
+    Higher priority tasks grouped by period, with the summed C of each period.
+    The workload of the group of a period is ceil(t / T) * sum(C), so each
+    evaluation is O(distinct periods) instead of O(tasks). Tasks are added as
+    the analysed priority level goes down.
+    """
+    __slots__ = ("pairs", "position")
+
+    def __init__(self):
+        self.pairs = []  # (summed C, T) of every distinct period
+        self.position = {}  # period -> index in pairs
+
+    def add(self, c, t):
+        """ Add a task to the higher priority tasks """
+        position = self.position.get(t)
+        if position is None:
+            self.position[t] = len(self.pairs)
+            self.pairs.append((c, t))
+        else:
+            self.pairs[position] = (self.pairs[position][0] + c, t)
+
+    def workload(self, t):
+        """ Workload of the tasks released in [0, t) """
+        return sum([-(-t // tj) * cj for cj, tj in self.pairs])
+
+    def __len__(self):
+        return len(self.pairs)
+
+
+def joseph_wcrt(rts, sink=None, counters=None):
+    """
+    Evaluate schedulability using the Joseph & Pandya exact schedulability test
+    :param sink: optional list where the iteration trace is appended
+    :param counters: optional Counters of the iterations and ceilings evaluated
+    """
+    c, tp, d = as_taskset(rts).columns()
+    wcrt = [0] * len(c)
     schedulable = True
-    wcrt[0] = rts[0]["C"]  # task 0 wcet
-    for i, task in enumerate(rts[1:], 1):
+    wcrt[0] = c[0]  # task 0 wcet
+    if sink is not None:
+        sink.extend([(TASK, 0, c[0]), (END, 0, c[0], True)])
+    hp = []
+    for i in range(1, len(c)):
+        hp.append((c[i-1], tp[i-1]))
         t = 0
+        if sink is not None:
+            sink.append((TASK, i, t))
         while schedulable:
-            w = task["C"] + sum([ceil(float(t) / float(taskp["T"]))*taskp["C"] for taskp in rts[:i]])
+            w = c[i] + sum([-(-t // tj) * cj for cj, tj in hp])
+            if counters is not None:
+                counters.iterations += 1
+                counters.ceilings += len(hp)
+            if sink is not None:
+                sink.append((ITER, i, t, tuple([-(-t // tj) for _, tj in hp]), w, verdict(t, w, d[i])))
             if t == w:
                 break
             t = w
-            if t > task["D"]:
+            if t > d[i]:
                 schedulable = False
         wcrt[i] = t
+        if sink is not None:
+            sink.append((END, i, t, schedulable))
         if not schedulable:
             break
     return [schedulable, wcrt]
 
 
-def rta_wcrt(rts):
-    """ Calcula el WCRT de cada tarea del str y evalua la planificabilidad """
-    wcrt = [0] * len(rts)
+def rta_wcrt(rts, sink=None, counters=None):
+    """
+    Calcula el WCRT de cada tarea del str y evalua la planificabilidad
+    :param sink: optional list where the iteration trace is appended
+    :param counters: optional Counters of the iterations and ceilings evaluated
+    """
+    c, t, d = as_taskset(rts).columns()
+    wcrt = [0] * len(c)
     schedulable = True
-    wcrt[0] = rts[0]["C"]  # task 0 wcet
-    for i, task in enumerate(rts[1:], 1):
-        r = wcrt[i-1] + task["C"]
+    wcrt[0] = c[0]  # task 0 wcet
+    if sink is not None:
+        sink.extend([(TASK, 0, c[0]), (END, 0, c[0], True)])
+    hp = []  # the trace keeps the ceiling of every task
+    index = InterferenceIndex()
+    for i in range(1, len(c)):
+        index.add(c[i-1], t[i-1])
+        if sink is not None:
+            hp.append((c[i-1], t[i-1]))
+        r = wcrt[i-1] + c[i]
+        if sink is not None:
+            sink.append((TASK, i, r))
         while schedulable:
-            w = task["C"] + sum([ceil(float(r) / float(taskp["T"]))*taskp["C"] for taskp in rts[:i]])
+            w = c[i] + index.workload(r)
+            if counters is not None:
+                counters.iterations += 1
+                counters.ceilings += len(index)
+            if sink is not None:
+                sink.append((ITER, i, r, tuple([-(-r // tj) for _, tj in hp]), w, verdict(r, w, d[i])))
             if r == w:
                 break
             r = w
-            if r > task["D"]:
+            if r > d[i]:
                 schedulable = False
         wcrt[i] = r
+        if sink is not None:
+            sink.append((END, i, r, schedulable))
         if not schedulable:
             break
     return [schedulable, wcrt]
 
 
-def wcrt(rts):
+def _rta_task(ci, di, hp, r, counters=None):
+    """
+    RTA fixed point of one task, exactly as rta_wcrt iterates it
+    :param ci: task wcet
+    :param di: task deadline
+    :param hp: (C, T) pairs of the higher priority tasks
+    :param r: initial value
+    :param counters: optional Counters of the iterations and ceilings evaluated
+    :return: schedulable and the last value of the iteration
+    """
+    while True:
+        w = ci + sum([-(-r // tj) * cj for cj, tj in hp])
+        if counters is not None:
+            counters.iterations += 1
+            counters.ceilings += len(hp)
+        if r == w:
+            return True, r
+        r = w
+        if r > di:
+            return False, r
+
+
+def _incremental_wcrt(rts, skip, counters=None):
+    """
+    RTA keeping, for every higher priority task j, its accumulated interference
+    A_j and its next release boundary B_j. Each pass updates t as soon as the
+    interference of a task grows (Gauss-Seidel), and with skip the ceiling of
+    task j is not evaluated while t <= B_j, as its interference cannot change.
+    When a task misses its deadline it is evaluated again with the rta_wcrt
+    iteration, so the results are identical to rta_wcrt.
+    :param counters: optional Counters of the passes and ceilings evaluated
+    """
+    c, tp, d = as_taskset(rts).columns()
+    n = len(c)
+    wcrt = [0] * n
+    a = list(c)
+    b = list(tp)
+    wcrt[0] = c[0]  # task 0 wcet
+
+    t = c[0]
+    for i in range(1, n):
+        di = d[i]
+        order = range(i - 1, -1, -1) if skip else range(i)
+        t_mas = t + c[i]
+        missed = False
+        while True:
+            t = t_mas
+            if counters is not None:
+                counters.iterations += 1
+            for j in order:
+                if skip and t_mas <= b[j]:
+                    continue
+                if counters is not None:
+                    counters.ceilings += 1
+                tmp = -(-t_mas // tp[j])
+                t_mas += tmp * c[j] - a[j]
+                a[j] = tmp * c[j]
+                b[j] = tmp * tp[j]
+            if t_mas > di:
+                missed = True
+                break
+            if t == t_mas:
+                break
+
+        if missed:
+            hp = list(zip(c[:i], tp[:i]))
+            schedulable, wcrt[i] = _rta_task(c[i], di, hp, wcrt[i-1] + c[i], counters)
+            if not schedulable:
+                return [False, wcrt]
+            # the rta_wcrt seed was already a fixed point beyond the deadline
+            t = wcrt[i]
+            for j in range(i):
+                tmp = -(-t // tp[j])
+                a[j], b[j] = tmp * c[j], tmp * tp[j]
+            continue
+        wcrt[i] = t
+    return [True, wcrt]
+
+
+# relative margin of the float bounds of accelerated_wcrt, far above their rounding errors
+BOUND_MARGIN = 1e-4
+
+
+def accelerated_wcrt(rts, upper_bound=False, counters=None):
+    """
+    RTA seeding task i with the largest of three lower bounds of its WCRT: the
+    rta_wcrt seed R_{i-1} + C_i, C_i + sum(C_j) (the first iteration from 0)
+    and C_i / (1 - U_{i-1}), as every fixed point R satisfies R >= C_i + U_{i-1} R.
+    The fixed points are those of rta_wcrt, and a task that misses its
+    deadline is iterated again from the rta_wcrt seed, so the results are
+    identical.
+    With upper_bound, a task whose response time upper bound
+    (C_i + sum(C_j (1 - U_j))) / (1 - U_{i-1}) (Bini et al.) is within its
+    deadline is not iterated, and the bound is reported as a WcrtBound instead
+    of its WCRT. The verdict and the WCRT of every iterated task are still
+    those of rta_wcrt. The bounds are evaluated in floating point, loosened by
+    BOUND_MARGIN.
+    :param counters: optional Counters of the iterations and ceilings evaluated
+    :return: schedulable and wcrt (WcrtBound for the tasks not iterated)
+    """
+    c, t, d = as_taskset(rts).columns()
+    wcrt = [0] * len(c)
+    wcrt[0] = c[0]  # task 0 wcet
+    index = InterferenceIndex()
+    u = cu = 0.0  # sum(U_j) and sum(C_j U_j) of the higher priority tasks
+    sum_c = 0
+    for i in range(1, len(c)):
+        index.add(c[i-1], t[i-1])
+        u += c[i-1] / t[i-1]
+        cu += c[i-1] * c[i-1] / t[i-1]
+        sum_c += c[i-1]
+        slack = 1.0 - u
+        seed_u = 0
+        if slack > BOUND_MARGIN:
+            seed_u = int(c[i] / slack * (1 - BOUND_MARGIN))
+            bound = (c[i] + sum_c - cu) / slack * (1 + BOUND_MARGIN)
+            if upper_bound and bound <= d[i]:
+                wcrt[i] = WcrtBound(ceil(bound))
+                continue
+
+        seed = None if isinstance(wcrt[i-1], WcrtBound) else wcrt[i-1] + c[i]
+        r = max(seed or 0, c[i] + sum_c, seed_u)
+        while True:
+            w = c[i] + index.workload(r)
+            if counters is not None:
+                counters.iterations += 1
+                counters.ceilings += len(index)
+            if r == w:
+                break
+            r = w
+            if r > d[i]:
+                break
+        # r only stays at the rta_wcrt seed when the seed is a fixed point, and then
+        # rta_wcrt takes it even beyond the deadline
+        schedulable = r <= d[i] or r == seed
+        if not schedulable:
+            if seed is None:
+                # the WCRT of a bounded task is the least fixed point of its level, below its bound
+                hp = list(zip(c[:i-1], t[:i-1]))
+                _, prev = _rta_task(c[i-1], wcrt[i-1], hp, sum_c, counters)
+                seed = prev + c[i]
+            schedulable, r = _rta_task(c[i], d[i], index.pairs, seed, counters)
+        wcrt[i] = r
+        if not schedulable:
+            return [False, wcrt]
+    return [True, wcrt]
+
+
+def bounded_wcrt(rts, counters=None):
+    """ Accelerated RTA that does not iterate the tasks whose upper bound meets their deadline (rta-ub) """
+    return accelerated_wcrt(rts, upper_bound=True, counters=counters)
+
+
+def rta2_wcrt(rts, counters=None):
+    """ RTA updating t after each higher priority task (RTA2) """
+    return _incremental_wcrt(rts, skip=False, counters=counters)
+
+
+def rta3_wcrt(rts, counters=None):
+    """ RTA skipping the ceilings of tasks whose next release is beyond t (RTA3) """
+    return _incremental_wcrt(rts, skip=True, counters=counters)
+
+
+ENGINES = {"joseph": joseph_wcrt, "rta": rta_wcrt, "rta2": rta2_wcrt, "rta3": rta3_wcrt, "accel": accelerated_wcrt,
+           "rta-ub": bounded_wcrt}
+DEFAULT_ENGINE = "rta3"
+# version of the results of analyze, bump it when they change to invalidate the cached ones
+CACHE_VERSION = 3
+
+
+def wcrt(rts, rta=None):
     """ Calcula wcrt y planificabilidad con todos los metodos implementados """
-    return {'joseph': joseph_wcrt(rts), 'rta': rta_wcrt(rts)}
+    return {'joseph': joseph_wcrt(rts), 'rta': rta_wcrt(rts) if rta is None else rta}
 
 
-def first_free_slot(rts):
-    """ Calcula primer instante que contiene un slot libre por subsistema """
-    free = [0] * len(rts)
-    for i, task in enumerate(rts, 0):
+def first_free_slot(rts, counters=None):
+    """
+    Calcula primer instante que contiene un slot libre por subsistema
+    :param counters: optional Counters of the iterations and ceilings evaluated
+    """
+    c, tp, _ = as_taskset(rts).columns()
+    free = [0] * len(c)
+    index = InterferenceIndex()
+    for i in range(len(c)):
+        index.add(c[i], tp[i])
         t = 0
         while True:
-            w = 1 + sum([ceil(float(t) / float(taskp["T"]))*taskp["C"] for taskp in rts[:i+1]])
+            w = 1 + index.workload(t)
+            if counters is not None:
+                counters.iterations += 1
+                counters.ceilings += len(index)
             if t == w:
                 break
             t = w
@@ -99,132 +430,638 @@ def first_free_slot(rts):
     return free
 
 
-def calculate_k(rts):
-    """ Calcula el K de cada tarea (maximo retraso en el instante critico) """
-    ks = [0] * len(rts)
-    ks[0] = rts[0]["T"] - rts[0]["C"]
+def calculate_k_linear(rts):
+    """
+    Calcula el K de cada tarea (maximo retraso en el instante critico)
+    raising k one unit at a time. Reference for calculate_k.
+    """
+    c, tp, d = as_taskset(rts).columns()
+    ks = [0] * len(c)
+    ks[0] = tp[0] - c[0]
 
-    for i, task in enumerate(rts[1:], 1):
+    hp = []
+    for i in range(1, len(c)):
+        hp.append((c[i-1], tp[i-1]))
         t = 0
         k = 1
-        while t <= task["D"]:
-            w = k + task["C"] + sum([ceil(float(t) / float(taskp["T"]))*taskp["C"] for taskp in rts[:i]])
+        while t <= d[i]:
+            w = k + c[i] + sum([-(-t // tj) * cj for cj, tj in hp])
             if t == w:
                 k += 1
             t = w
         ks[i] = k - 1
     return ks
 
-def calculate_y(rts):
+
+def _k_fixed_point(workload, k, t, d, counters=None):
+    """
+    Least fixed point of t = k + workload(t), iterating from a lower bound of it
+    :return: the fixed point, or None as soon as the iteration exceeds d
+    """
+    while t <= d:
+        w = k + workload(t)
+        if counters is not None:
+            counters.iterations += 1
+        if t == w:
+            return t
+        t = w
+    return None
+
+
+def _max_k(workload, d, k_max, counters=None):
+    """
+    Largest k whose fixed point t = k + workload(t) is within d. The fixed point
+    grows with k, so k is searched doubling it and then bisecting, and the fixed
+    point of the largest feasible k found so far seeds the next probes.
+    :param workload: workload of the task and its higher priority tasks at t
+    :param d: task deadline
+    :param k_max: upper bound of k
+    :param counters: optional Counters of the fixed point iterations
+    :return: k (0 when no delay is feasible)
+    """
+    lo, t_lo, hi = 0, 0, k_max + 1
+    k = 1
+    while k < hi:
+        t = _k_fixed_point(workload, k, t_lo, d, counters)
+        if t is None:
+            hi = k
+            break
+        lo, t_lo = k, t
+        k *= 2
+    while hi - lo > 1:
+        k = (lo + hi) // 2
+        t = _k_fixed_point(workload, k, t_lo, d, counters)
+        if t is None:
+            hi = k
+        else:
+            lo, t_lo = k, t
+    return lo
+
+
+def calculate_k(rts, counters=None):
+    """
+    Calcula el K de cada tarea (maximo retraso en el instante critico)
+    :param counters: optional Counters of the iterations and ceilings evaluated
+    """
+    c, tp, d = as_taskset(rts).columns()
+    ks = [0] * len(c)
+    ks[0] = tp[0] - c[0]
+
+    index = InterferenceIndex()
+    for i in range(1, len(c)):
+        index.add(c[i-1], tp[i-1])
+
+        def workload(t, ci=c[i]):
+            if counters is not None:
+                counters.ceilings += len(index)
+            return ci + index.workload(t)
+
+        # the fixed point is at least k + C_i
+        ks[i] = _max_k(workload, d[i], d[i] - c[i], counters)
+    return ks
+
+
+def calculate_y(rts, wcrt=None):
     """ Calcula los tiempos de promoción de cada tarea para Dual Priority """
-    wcrt = rta_wcrt(rts)[1]
-    y = []
-    for i, task in enumerate(zip(rts, wcrt), 1):
-        y.append(task[0]["D"] - task[1])
-    return y
+    rts = as_taskset(rts)
+    if wcrt is None:
+        wcrt = ENGINES[DEFAULT_ENGINE](rts)[1]
+    return [d - r for d, r in zip(rts.d, wcrt)]
 
 
-def calculate_ps_bound(rts):
-    u = uf(rts)
+def calculate_ps_bound(rts, u=None):
+    rts = as_taskset(rts)
+    if u is None:
+        u = uf(rts)
     bound = (len(rts)+1) * (pow(2, 1.0 / float(len(rts)+1)) - 1)
-    return [((bound - u) * task["T"], task["T"]) for task in rts]
+    return [((bound - u) * t, t) for t in rts.t]
 
 
-def calculate_ds_bound(rts):
-    p = pow((uf(rts) / len(rts)) + 1, len(rts))
+def calculate_ds_bound(rts, u=None):
+    rts = as_taskset(rts)
+    if u is None:
+        u = uf(rts)
+    p = pow((u / len(rts)) + 1, len(rts))
     uds = (2 - p) / ((2 * p) - 1)
-    return [(uds * task["T"], task["T"]) for task in rts]
+    return [(uds * t, t) for t in rts.t]
 
 
-def calculate_ds_k(rts):
-    """ Calculate DS capacity for each priority level. """
+def calculate_ds_k(rts, ks=None, counters=None):
+    """
+    Calculate DS capacity for each priority level.
+    :param counters: optional Counters of the ceilings evaluated
+    """
     def f(k, t, tds):
         return float(k) / (float(ceil(float(t) / float(tds))))
-    ks = calculate_k(rts)
+    rts = as_taskset(rts)
+    if ks is None:
+        ks = calculate_k(rts)
+    if counters is not None:
+        counters.ceilings += len(ks) * len(rts)
     cds_list = []
-    for tds in [task["T"] for task in rts]:
-        cds_list.append((min([f(k, task["T"], tds) for k, task in zip(ks, rts)]), tds))
+    for tds in rts.t:
+        cds_list.append((min([f(k, t, tds) for k, t in zip(ks, rts.t)]), tds))
     return cds_list
 
 
-def mix_range(s):
-    r = []
-    for i in s.split(','):
-        if '-' not in i:
-            r.append(int(i))
+def _fits_lowest(ci, ti, di, interference):
+    """
+    RTA of a task placed below all the other unassigned tasks
+    :param interference: workload at t of all the unassigned tasks, the task included
+    :return: whether the task meets its deadline
+    """
+    # C_i plus every C_j is the first iteration from 0
+    r = interference(1)
+    while r <= di:
+        # the own term of the task is taken out of the shared interference
+        w = ci + interference(r) - -(-r // ti) * ci
+        if r == w:
+            return True
+        r = w
+    return False
+
+
+def audsley(rts):
+    """
+    Audsley's optimal priority assignment. From the lowest priority level up,
+    the first unassigned task (largest deadline first) that meets its deadline
+    below all the other unassigned tasks takes the level.
+    The workload of the unassigned tasks at each t is computed once per level
+    and shared by all the candidates, whose own term is subtracted.
+    :return: feasible, priority order (task indices, highest first) or None and number of RTA evaluations
+    """
+    c, tp, d = as_taskset(rts).columns()
+    unassigned = sorted(range(len(c)), key=lambda i: (d[i], tp[i]))
+    order = []
+    evaluations = 0
+    while unassigned:
+        hp = [(c[j], tp[j]) for j in unassigned]
+        cache = {}
+
+        def interference(t, hp=hp, cache=cache):
+            if t not in cache:
+                cache[t] = sum([-(-t // tj) * cj for cj, tj in hp])
+            return cache[t]
+
+        for i in reversed(unassigned):
+            evaluations += 1
+            if _fits_lowest(c[i], tp[i], d[i], interference):
+                break
         else:
-            l, h = map(int, i.split('-'))
-            r += range(l, h+1)
-    return r
+            return [False, None, evaluations]
+        unassigned.remove(i)
+        order.append(i)
+    return [True, order[::-1], evaluations]
+
+
+PRIORITIES = ["given", "rm", "dm", "opa"]
+
+
+def priority_order(rts, priority):
+    """
+    Priority order of a rts
+    :param priority: given (the input order), rm (shorter period first), dm (shorter deadline first)
+                     or opa (Audsley, dm when there is no feasible assignment)
+    :return: task indices from the highest priority and the audsley result (None unless opa)
+    """
+    rts = as_taskset(rts)
+    opa = None
+    if priority == "opa":
+        opa = audsley(rts)
+        if opa[0]:
+            return opa[1], opa
+    if priority == "rm":
+        return sorted(range(len(rts)), key=rts.t.__getitem__), opa
+    if priority in ("dm", "opa"):
+        return sorted(range(len(rts)), key=rts.d.__getitem__), opa
+    return list(range(len(rts))), opa
+
+
+def prioritize(rts, priority):
+    """
+    Reorder a rts by priority, keeping the task numbers
+    :return: reordered TaskSet and the audsley result (None unless opa)
+    """
+    rts = as_taskset(rts)
+    order, opa = priority_order(rts, priority)
+    c, tp, d = rts.columns()
+    nro = list(rts.nro)
+    return TaskSet([c[i] for i in order], [tp[i] for i in order], [d[i] for i in order],
+                   [nro[i] for i in order]), opa
+
+
+# analyses of AnalysisContext and the ones each of them needs
+DEPENDENCIES = {
+    "h": [],
+    "uf": [],
+    "liu": ["uf"],
+    "bini": [],
+    "joseph": [],
+    "rta": [],
+    "wcrt": ["joseph", "rta"],
+    "edf": ["uf"],
+    "free": ["rta"],
+    "k": [],
+    "y": ["rta"],
+    "rr": [],
+    "ps_bound": ["uf", "liu"],
+    "ds_bound": ["uf", "bini"],
+    "ds_k": ["k"],
+}
+# reported analyses (the actions of solver) and their names in the results
+ACTIONS = {"h": "h", "uf": "uf", "liu": "liu", "bini": "bini", "wcrt": "wcrt", "edf": "edf", "free": "free",
+           "k": "k", "y": "y", "rr": "rr", "ps_bound": "ps (bound)", "ds_bound": "ds (bound)", "ds_k": "ds (k)"}
+
+
+def requirements(actions):
+    """
+    Analyses needed by the actions, each one after the ones it depends on
+    :param actions: analysis names
+    :return: list of analysis names
+    """
+    order = []
+
+    def visit(node):
+        if node not in order:
+            for dependency in DEPENDENCIES[node]:
+                visit(dependency)
+            order.append(node)
+
+    for action in actions:
+        visit(action)
+    return order
+
+
+class AnalysisContext:
+    """
+    Per-rts analysis context. Every derived quantity is computed the first time
+    it is needed and then served from the context to every later consumer.
+    """
+
+    def __init__(self, rts, rta=None, engine=DEFAULT_ENGINE, stats=None):
+        """
+        :param rts: rts to analyse
+        :param rta: optional rta_wcrt result already computed (e.g. by the batch engine)
+        :param engine: WCRT engine used for the RM analysis
+        :param stats: optional Stats where the instrumented analyses are recorded
+        """
+        self.rts = as_taskset(rts)
+        self.engine = engine
+        self.stats = stats
+        if rta is not None:
+            self.rta = rta
+
+    def measure(self, name):
+        """ Counters of an analysis timed into stats, None without stats """
+        return nullcontext() if self.stats is None else self.stats.measure(name)
+
+    @cached_property
+    def h(self):
+        return lcm(self.rts)
+
+    @cached_property
+    def uf(self):
+        return uf(self.rts)
+
+    @cached_property
+    def liu(self):
+        return liu_bound(self.rts, u=self.uf)
+
+    @cached_property
+    def bini(self):
+        return bini_bound(self.rts)
+
+    @cached_property
+    def joseph(self):
+        with self.measure("joseph") as counters:
+            return joseph_wcrt(self.rts, counters=counters)
+
+    @cached_property
+    def rta(self):
+        with self.measure(self.engine) as counters:
+            return ENGINES[self.engine](self.rts, counters=counters)
+
+    @cached_property
+    def wcrt(self):
+        return {'joseph': self.joseph, 'rta': self.rta}
+
+    @cached_property
+    def edf(self):
+        with self.measure("edf") as counters:
+            return edf_qpa(self.rts, u=self.uf, counters=counters)
+
+    @cached_property
+    def free(self):
+        if not self.rta[0]:
+            return "No planificable"
+        # the busy period never ends at full utilization, checked exactly as uf may round it below 1
+        if sum([Fraction(c, t) for c, t in zip(self.rts.c, self.rts.t)]) >= 1:
+            return "No aplica"
+        with self.measure("free") as counters:
+            return first_free_slot(self.rts, counters=counters)
+
+    @cached_property
+    def k(self):
+        with self.measure("k") as counters:
+            return calculate_k(self.rts, counters=counters)
+
+    @cached_property
+    def y(self):
+        # with WcrtBound upper bounds (rta-ub) the promotion times are lower bounds, still safe
+        return calculate_y(self.rts, wcrt=self.rta[1])
+
+    @cached_property
+    def rr(self):
+        return round_robin(self.rts)
+
+    @cached_property
+    def ps_bound(self):
+        return calculate_ps_bound(self.rts, u=self.uf) if self.liu[1] else "No aplica"
+
+    @cached_property
+    def ds_bound(self):
+        return calculate_ds_bound(self.rts, u=self.uf) if self.bini[1] else "No aplica"
+
+    @cached_property
+    def ds_k(self):
+        ks = self.k
+        with self.measure("ds (k)") as counters:
+            return calculate_ds_k(self.rts, ks=ks, counters=counters)
+
+    def results(self, actions=None):
+        """
+        List of (name, result) pairs reported by solver. Only the requested
+        actions and the analyses they depend on are computed.
+        :param actions: actions to report, all of them by default
+        """
+        actions = ACTIONS if actions is None else [action for action in ACTIONS if action in actions]
+        for node in requirements(actions):
+            getattr(self, node)
+        return [(ACTIONS[action], getattr(self, action)) for action in actions]
 
 
 def generate_rts(param):
+    """ Generate a rts schedulable by RM from the ntask, uf, mint and maxt params """
+    rts_list, _ = generate(1, param["ntask"], param["uf"], param["mint"], param["maxt"], batch=param.get("batch", 64))
+    return rts_list[0]
+
+
+def chunks(iterable, size):
+    """
+    Split an iterable into lists of at most size elements. When the iterable
+    raises, the elements read before are yielded before the error.
+    """
+    iterator = iter(iterable)
     while True:
-        u = task_generator.gen_randfixedsum(1, param["ntask"], param["uf"])
-        t = task_generator.gen_periods_uniform(param["ntask"], 1, param["mint"], param["maxt"], round_to_int=True)
-        rts = []
-        for taskset in iter(task_generator.gen_tasksets(u, t)):
-            for task in taskset:
-                c, t = task
-                rts.append({"C": ceil(c), "T": int(t), "D": int(t)})
-        rts = sorted(rts, key=lambda k: k['t'])
-        if wcrt(rts)[0]:
-            return rts
+        chunk = []
+        try:
+            for item in islice(iterator, size):
+                chunk.append(item)
+        except Exception:
+            if chunk:
+                yield chunk
+            raise
+        if not chunk:
+            return
+        yield chunk
+
+
+def rts_ids(file, spec):
+    """
+    Ids of the --rts option
+    :param file: rts file
+    :param spec: ids (e.g. 0,3-5), all, or None for the default_ids of the file
+    :return: list of rts ids, None for all the rts in the file
+    """
+    if spec is None:
+        return default_ids(file)
+    return None if spec == "all" else mix_range(spec)
+
+
+def analyze(chunk, engine=DEFAULT_ENGINE, priority="given", instrument=False, actions=None):
+    """
+    Analyse a chunk of rts. With the rta engine, their RTA is evaluated in
+    lockstep by the batch engine, unless the analyses are instrumented, as
+    then every rts is analysed on its own. The other engines always analyse
+    every rts on its own.
+    :param chunk: list of rts
+    :param engine: WCRT engine name
+    :param priority: priority assignment applied before the analysis
+    :param instrument: record the Stats of the analyses
+    :param actions: actions to report, all of them by default
+    :return: results list of each rts (the cached ones for rts with "results"), or the exception raised while
+             analysing it, and the Stats with instrument
+    """
+    cached = chunk
+    chunk = [rts for rts in chunk if "results" not in rts]
+    tasks = []
+    for rts in chunk:
+        try:
+            tasks.append(prioritize(rts["ptasks"], priority))
+        except Exception as e:
+            tasks.append(e)
+
+    stats = Stats() if instrument else None
+    rta_results = [None] * len(chunk)
+    if (engine == "rta" and len(chunk) > 1 and not instrument
+            and "rta" in requirements(ACTIONS if actions is None else actions)):
+        try:
+            rta_results = rta_wcrt_many([rts for rts, _ in tasks])
+        except Exception:
+            # let every rts fail (or not) on its own
+            pass
+
+    results = []
+    for prioritized, rta_result in zip(tasks, rta_results):
+        if isinstance(prioritized, Exception):
+            results.append(prioritized)
+            continue
+        rts, opa = prioritized
+        try:
+            context = AnalysisContext(rts, rta=rta_result, engine=engine, stats=stats).results(actions)
+            if opa is not None:
+                feasible, order, evaluations = opa
+                context.insert(0, ("opa", [feasible, list(rts.nro) if feasible else None, evaluations]))
+            results.append(context)
+        except Exception as e:
+            results.append(e)
+    results = iter(results)
+    results = [rts["results"] if "results" in rts else next(results) for rts in cached]
+    return (results, stats) if instrument else results
+
+
+def lookup(chunks, cache, analysis):
+    """
+    Look every rts up in the cache. Cached rts get their "results", the others
+    the "key" under which analyze results are stored.
+    :param chunks: iterable of lists of rts
+    :param analysis: analysis name
+    :return: chunks
+    """
+    for chunk in chunks:
+        for rts in chunk:
+            key = rts_key(rts["ptasks"], analysis, CACHE_VERSION)
+            results = cache.get(key)
+            if results is None:
+                rts["key"] = key
+            else:
+                rts["results"] = results
+        yield chunk
+
+
+def analyze_parallel(chunks, jobs, max_pending, ordered=True, engine=DEFAULT_ENGINE, priority="given",
+                     instrument=False, actions=None):
+    """
+    Analyse chunks of rts in a pool of processes
+    :param chunks: iterable of lists of rts
+    :param jobs: number of worker processes
+    :param max_pending: maximum number of chunks submitted and not yet reported
+    :param ordered: report chunks in input order, otherwise as soon as they are done
+    :param engine: WCRT engine name
+    :param priority: priority assignment applied before the analysis
+    :param instrument: record the Stats of the analyses
+    :param actions: actions to report, all of them by default
+    :return: (chunk, analyze(chunk)) pairs
+    :raises: the error of chunks, once the chunks read before it are reported
+    """
+    chunks = iter(chunks)
+    pending = {}
+    error = None
+    with ProcessPoolExecutor(max_workers=jobs) as executor:
+        while True:
+            try:
+                for chunk in islice(chunks, max_pending - len(pending)):
+                    pending[executor.submit(analyze, chunk, engine, priority, instrument, actions)] = chunk
+            except Exception as e:
+                # report the chunks already submitted before the input error
+                error, chunks = e, iter(())
+            if not pending:
+                if error is not None:
+                    raise error
+                return
+            if ordered:
+                done = [next(iter(pending))]
+            else:
+                done, _ = wait(pending, return_when=FIRST_COMPLETED)
+            for future in done:
+                yield pending.pop(future), future.result()
 
 
 def getargs():
     """ Command line arguments """
     parser = argparse.ArgumentParser(description="Basic methods for RTS schedulability and WCRT analysis.")
     parser.add_argument("file", type=argparse.FileType('r'), default=sys.stdin, help="JSON file with RTS or RTS params.")
-    parser.add_argument("--rts", type=str, default="0", help="RTS to evaluate")
-    parser.add_argument("--table", action="store_true", default=False)
+    parser.add_argument("--rts", type=str,
+                        help="RTS to evaluate, e.g. 0,3-5, or all for every RTS in the file (by default the first one "
+                             "of json and xml files, every RTS of txt and rtsb files and of stdin)")
+    parser.add_argument("--table", dest="format", action="store_const", const="table", help="Same as --format table.")
+    parser.add_argument("--format", choices=FORMATS, default="text",
+                        help="text (key and value lines), table (grid), or one record per RTS with typed fields: "
+                             "jsonl or csv (lists as json).")
+    parser.add_argument("--actions", type=str, nargs="*", choices=ACTIONS, default=list(ACTIONS),
+                        help="Results to report, only they and the analyses they need are computed (all by default).")
     parser.add_argument("--print-rts", action="store_true", default=False)
     parser.add_argument("--only-print-rts", action="store_true", default=False)
+    parser.add_argument("--batch", type=int, default=256, help="Number of RTS analysed together, with the rta engine their RTA is evaluated "
+                             "in lockstep.")
+    parser.add_argument("--engine", choices=ENGINES.keys(), default=DEFAULT_ENGINE,
+                        help="WCRT engine for the RM analysis. rta, rta2, rta3 and accel give identical results, "
+                             "with rta whole batches are evaluated in lockstep. rta-ub gives the same verdict, "
+                             "but reports an upper bound (<=R) instead of the WCRT of the tasks whose bound meets "
+                             "their deadline.")
+    parser.add_argument("--priority", choices=PRIORITIES, default="given",
+                        help="Priority assignment: the given order, rm, dm or opa (Audsley). opa also reports the "
+                             "number of RTA evaluations it needed.")
+    parser.add_argument("--cache", type=str, nargs="?", const=default_path(),
+                        help="Reuse the results stored in this result cache file and store the new ones "
+                             "(~/.cache/rts-basic-methods/results.sqlite when no file is given). Off by default.")
+    parser.add_argument("--cache-size", type=int, default=DEFAULT_MAX_BYTES >> 20,
+                        help="Size bound of the result cache in MiB, least recently used results are evicted.")
+    parser.add_argument("--stats", action="store_true", default=False,
+                        help="Print the iterations, ceilings and microseconds of every analysis on stderr "
+                             "(totals and percentiles per rts). Every rts is then analysed on its own, and the "
+                             "result cache is not used (the cached rts would not be measured).")
+    parser.add_argument("--stats-json", type=str,
+                        help="Dump the --stats summary to this json file. Like --stats, it turns the result cache "
+                             "off.")
+    parser.add_argument("--jobs", type=int, default=1, help="Number of worker processes.")
+    parser.add_argument("--max-pending", type=int, help="Maximum number of chunks in flight (default: 2 * jobs).")
+    parser.add_argument("--ordered", dest="ordered", action="store_true", default=True,
+                        help="Print results in input order (default).")
+    parser.add_argument("--unordered", dest="ordered", action="store_false",
+                        help="Print results as soon as their chunk is done.")
     return parser.parse_args()
 
 
 def main():
     args = getargs()
+    failed = 0
+    instrument = args.stats or args.stats_json is not None
+    stats = Stats()
+
+    # cached rts would not be measured, so instrumented runs analyse every rts
+    cache = None if args.cache is None or args.only_print_rts or instrument else ResultCache(args.cache, args.cache_size << 20)
+    writer = WRITERS[args.format](sys.stdout) if args.format in WRITERS and not args.only_print_rts else None
 
     with args.file as file:
-        #rts_in_file = json.load(file)
-        #for rts in [rts_in_file[i] for i in mix_range(args.rts)] if args.rts else rts_in_file:
-        for rts in get_from_file(file, mix_range(args.rts)):
-            ptasks = rts["ptasks"]
+        rts_chunks = chunks(get_from_file(file, rts_ids(file, args.rts)), args.batch)
+        if cache is not None:
+            rts_chunks = lookup(rts_chunks, cache, "solver:{0:}:{1:}:{2:}".format(
+                args.engine, args.priority, ",".join([action for action in ACTIONS if action in args.actions])))
+        if args.only_print_rts:
+            analyzed = ((chunk, [None] * len(chunk)) for chunk in rts_chunks)
+        elif args.jobs > 1:
+            analyzed = analyze_parallel(rts_chunks, args.jobs, args.max_pending or 2 * args.jobs, args.ordered,
+                                        args.engine, args.priority, instrument, args.actions)
+        else:
+            analyzed = ((chunk, analyze(chunk, args.engine, args.priority, instrument, args.actions)) for chunk in rts_chunks)
 
-            if args.print_rts or args.only_print_rts:
-                column_names = ptasks[0].keys()
-                print(tabulate(ptasks, headers="keys", tablefmt="simple"))
+        try:
+            for chunk, chunk_results in analyzed:
+                if instrument and not args.only_print_rts:
+                    chunk_results, chunk_stats = chunk_results
+                    stats.merge(chunk_stats)
+                for rts, results in zip(chunk, chunk_results):
+                    if (args.print_rts and writer is None) or args.only_print_rts:
+                        print(tabulate(rts["ptasks"], headers="keys", tablefmt="simple"))
 
-            if args.only_print_rts:
-                continue
+                    if args.only_print_rts:
+                        continue
 
-            rm_schedulable = rta_wcrt(ptasks)[0]
-
-            liu_bound_result = liu_bound(ptasks)
-            bini_bound_result = bini_bound(ptasks)
-
-            results = [
-                ("h", lcm(ptasks)),
-                ("uf", uf(ptasks)),
-                ("liu", liu_bound_result),
-                ("bini", bini_bound_result),
-                ("wcrt", wcrt(ptasks)),
-                ("edf", (uf(ptasks) <= 1)),
-                ("free", first_free_slot(ptasks) if rm_schedulable else "No planificable"),
-                ("k", calculate_k(ptasks)),
-                ("y", calculate_y(ptasks)),
-                ("rr", round_robin(ptasks)),
-                ("ps (bound)", calculate_ps_bound(ptasks) if liu_bound_result[1] else "No aplica"),
-                ("ds (bound)", calculate_ds_bound(ptasks) if bini_bound_result[1] else "No aplica"),
-                ("ds (k)", calculate_ds_k(ptasks))
-            ]
-            if args.table:
-                print(tabulate(results, tablefmt="grid"))
-            else:
-                for result in results:
-                    key, value = result
-                    print(f"{key}\t{value}")
+                    if isinstance(results, Exception):
+                        failed += 1
+                        print("RTS {0:}: {1:}: {2:}".format(rts["id"], type(results).__name__, results),
+                              file=sys.stderr)
+                        continue
+
+                    if cache is not None and "key" in rts:
+                        cache.put(rts["key"], results)
+
+                    if writer is not None:
+                        writer.write(record(rts, results, tasks=args.print_rts))
+                    elif args.format == "table":
+                        print(tabulate(results, tablefmt="grid"))
+                    else:
+                        for result in results:
+                            key, value = result
+                            print(f"{key}\t{value}")
+        except (RtsFormatError, IndexError) as e:
+            # a malformed element or an id not in the file, the rts read before are already reported
+            failed += 1
+            print("{0:}: {1:}".format(file.name, e), file=sys.stderr)
+
+    if writer is not None:
+        writer.close()
+    if args.stats:
+        print(tabulate(stats.rows(), headers=Stats.headers(), floatfmt=".1f"), file=sys.stderr)
+    if args.stats_json:
+        with open(args.stats_json, "w") as fh:
+            json.dump(stats.summary(), fh, indent=2)
+    if cache is not None:
+        cache.close()
+        print("Cache: {hits:} hits, {misses:} misses, {evictions:} evictions".format(**cache.stats()), file=sys.stderr)
+    if failed:
+        sys.exit(1)
 
 
 if __name__ == '__main__':
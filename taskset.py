@@ -0,0 +1,114 @@
+from array import array
+
+
+class TaskSet:
+    """
+    Periodic task set stored as a single int64 buffer holding the C, T and D
+    columns one after the other (struct of arrays). Tasks are kept in priority
+    order. Indexing or iterating a TaskSet yields task dicts, so code written
+    for lists of {"C", "T", "D", "nro"} dicts keeps working.
+    """
+    __slots__ = ("_data", "_n", "_nro")
+
+    def __init__(self, c, t, d=None, nro=None):
+        self._n = len(c)
+        self._data = array("q", c)
+        self._data.extend(t)
+        self._data.extend(t if d is None else d)
+        if nro is not None and list(nro) == list(range(1, self._n + 1)):
+            nro = None
+        self._nro = None if nro is None else array("q", nro)
+
+    @classmethod
+    def from_buffer(cls, buffer, n, nro=None):
+        """
+        Wrap a buffer with the C, T and D columns of n tasks without copying it
+        :param buffer: int64 buffer (array, memoryview or mmap slice) of 3 * n items
+        :param n: number of tasks
+        :param nro: optional task numbers
+        :return: task set
+        """
+        rts = cls.__new__(cls)
+        rts._n = n
+        rts._data = memoryview(buffer).cast("B").cast("q")
+        rts._nro = None if nro is None else array("q", nro)
+        return rts
+
+    @classmethod
+    def from_dicts(cls, tasks):
+        """ Build a task set from a list of task dicts """
+        return cls([task["C"] for task in tasks], [task["T"] for task in tasks],
+                   [task.get("D", task["T"]) for task in tasks],
+                   [task.get("nro", nro) for nro, task in enumerate(tasks, 1)])
+
+    @property
+    def c(self):
+        """ Worst case execution times """
+        return memoryview(self._data)[:self._n]
+
+    @property
+    def t(self):
+        """ Periods """
+        return memoryview(self._data)[self._n:2 * self._n]
+
+    @property
+    def d(self):
+        """ Relative deadlines """
+        return memoryview(self._data)[2 * self._n:3 * self._n]
+
+    def columns(self):
+        """ C, T and D columns as lists, for fast scalar access in analysis loops """
+        return self.c.tolist(), self.t.tolist(), self.d.tolist()
+
+    @property
+    def nro(self):
+        """ Task numbers """
+        return range(1, self._n + 1) if self._nro is None else self._nro
+
+    def __len__(self):
+        return self._n
+
+    def __getitem__(self, key):
+        if isinstance(key, slice):
+            return TaskSet(self.c[key], self.t[key], self.d[key], self.nro[key])
+        if key < 0:
+            key += self._n
+        if not 0 <= key < self._n:
+            raise IndexError("task index out of range")
+        return {"nro": self.nro[key], "C": self._data[key], "T": self._data[self._n + key],
+                "D": self._data[2 * self._n + key]}
+
+    def __iter__(self):
+        for nro, c, t, d in zip(self.nro, self.c, self.t, self.d):
+            yield {"nro": nro, "C": c, "T": t, "D": d}
+
+    def __eq__(self, other):
+        if not isinstance(other, TaskSet):
+            return NotImplemented
+        return (self._n == other._n and self._data.tolist() == other._data.tolist()
+                and list(self.nro) == list(other.nro))
+
+    def __reduce__(self):
+        return TaskSet, (self.c.tolist(), self.t.tolist(), self.d.tolist(), list(self.nro))
+
+    def __repr__(self):
+        return "TaskSet({0:})".format(list(zip(self.c, self.t, self.d)))
+
+
+def as_taskset(rts):
+    """
+    Adapter for the analyses: return rts as a TaskSet
+    :param rts: TaskSet or list of task dicts
+    :return: TaskSet
+    """
+    return rts if isinstance(rts, TaskSet) else TaskSet.from_dicts(rts)
+
+
+class WcrtBound(int):
+    """
+    Upper bound of the WCRT of a task, reported by solver.bounded_wcrt instead
+    of the WCRT of the tasks that it does not iterate. The task meets its deadline.
+    """
+
+    def __repr__(self):
+        return "<={0:}".format(int(self))
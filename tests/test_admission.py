@@ -0,0 +1,101 @@
+import time
+import numpy as np
+import pytest
+from admission import Analyzer, next_releases
+
+
+def least_fixed_points(c, t, d):
+    """ WCRT of every task by plain RTA from R = sum(C), None when a task misses its deadline """
+    wcrt = []
+    for i in range(len(c)):
+        r = sum(c[:i + 1])
+        while r <= d[i]:
+            w = c[i] + sum([-(-r // t[j]) * c[j] for j in range(i)])
+            if w == r:
+                break
+            r = w
+        if r > d[i]:
+            return None
+        wcrt.append(r)
+    return wcrt
+
+
+@pytest.mark.parametrize("shared", [False, True])
+def test_random_changes_match_rta(shared):
+    rng = np.random.default_rng(7)
+
+    def period():
+        return int(rng.choice([10, 20, 40, 50, 100, 200])) if shared else int(rng.integers(5, 300))
+
+    for _ in range(100):
+        n = int(rng.integers(1, 12))
+        while True:
+            t = sorted([period() for _ in range(n)])
+            c = [int(rng.integers(1, max(2, ti // (2 * n)))) for ti in t]
+            if least_fixed_points(c, t, t) is not None:
+                break
+        analyzer = Analyzer([{"C": ci, "T": ti, "D": ti} for ci, ti in zip(c, t)])
+
+        for _ in range(30):
+            before = list(analyzer.c), list(analyzer.t), list(analyzer.d)
+            c, t, d = (list(column) for column in before)
+            nro = list(analyzer.nro)
+            op = int(rng.integers(0, 3))
+            if op == 0 or not nro:
+                tt = period()
+                cc = int(rng.integers(1, max(2, tt // 4)))
+                dd = int(rng.integers(cc, tt + 1))
+                level = int(rng.integers(0, len(nro) + 1))
+                admitted = analyzer.add_task(cc, tt, dd, level=level) is not None
+                c[level:level], t[level:level], d[level:level] = [cc], [tt], [dd]
+            elif op == 1:
+                k = int(rng.integers(0, len(nro)))
+                analyzer.remove_task(nro[k])
+                admitted = True
+                del c[k], t[k], d[k]
+            else:
+                k = int(rng.integers(0, len(nro)))
+                cc = max(1, c[k] + int(rng.integers(-2, 4)))
+                tt = max(cc, t[k] + int(rng.integers(-10, 10)))
+                dd = int(rng.integers(cc, tt + 1))
+                admitted = analyzer.update_task(nro[k], cc, tt, dd)
+                c[k], t[k], d[k] = cc, tt, dd
+
+            expected = least_fixed_points(c, t, d)
+            assert admitted == (expected is not None)
+            if admitted:
+                assert list(analyzer.wcrt) == expected
+            else:
+                # a rejected change leaves the rts as it was
+                assert (list(analyzer.c), list(analyzer.t), list(analyzer.d)) == before
+            releases = next_releases(analyzer.t, analyzer.wcrt, np.arange(len(analyzer)))
+            assert np.all(analyzer.releases <= releases) and np.all(analyzer.releases >= analyzer.wcrt)
+
+
+def test_unknown_task():
+    analyzer = Analyzer([{"C": 1, "T": 4, "D": 4}])
+    with pytest.raises(KeyError):
+        analyzer.remove_task(12345)
+
+
+def test_removal_latency():
+    # removing a task from a rts of 200 costs about as much as adding it back, a fraction of a full analysis
+    rng = np.random.default_rng(3)
+    t = np.sort(rng.integers(10, 10000, 200))
+    c = np.maximum(1, (0.7 / 200 * t * rng.uniform(0.5, 1.5, 200)).astype(int))
+    rts = [{"C": int(ci), "T": int(ti), "D": int(ti)} for ci, ti in zip(c, t)]
+    start = time.perf_counter()
+    analyzer = Analyzer(rts)
+    full = time.perf_counter() - start
+
+    removals, additions = [], []
+    for k in rng.choice(len(rts), 20, replace=False):
+        nro = analyzer.nro[k]
+        start = time.perf_counter()
+        analyzer.remove_task(nro)
+        removals.append(time.perf_counter() - start)
+        start = time.perf_counter()
+        analyzer.add_task(rts[k]["C"], rts[k]["T"], nro=nro)
+        additions.append(time.perf_counter() - start)
+    assert np.median(removals) < 2 * np.median(additions)
+    assert np.median(removals) < full / 2
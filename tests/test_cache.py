@@ -0,0 +1,35 @@
+from cache import ResultCache
+
+
+def stored(cache):
+    """ Running total and actual sum of the sizes, and the cached keys """
+    total = cache.db.execute("SELECT bytes FROM total").fetchone()[0]
+    actual = cache.db.execute("SELECT COALESCE(SUM(size), 0) FROM results").fetchone()[0]
+    keys = {key for key, in cache.db.execute("SELECT key FROM results")}
+    return total, actual, keys
+
+
+def test_total_and_lru_eviction(tmp_path):
+    keys = [bytes([i]) for i in range(20)]
+    with ResultCache(str(tmp_path / "results.sqlite"), max_bytes=1000) as cache:
+        for key in keys:
+            cache.put(key, b"x" * 100)
+        # a replaced value changes the total by the difference
+        cache.put(keys[1], b"x" * 10)
+        # the first key becomes the most recently used
+        assert cache.get(keys[0]) == b"x" * 100
+        total, actual, _ = stored(cache)
+        assert total == actual > 1000
+
+        cache.flush()
+        total, actual, kept = stored(cache)
+        assert total == actual <= 1000
+        evicted = set(keys) - kept
+        assert cache.evictions == len(evicted)
+        # the least recently used ones, the second key was stored again and the first one read after the others
+        used = keys[2:] + keys[1::-1]
+        assert evicted == set(used[:len(evicted)])
+        assert cache.get(used[0]) is None
+
+    with ResultCache(str(tmp_path / "results.sqlite"), max_bytes=1000) as cache:
+        assert stored(cache) == (total, actual, kept)
@@ -0,0 +1,130 @@
+import io
+import json
+import pytest
+import rtsb
+from files import default_ids, get_from_file, load_index
+from rtsb import RtsbReader, RtsbWriter, convert
+
+XML = """<?xml version="1.0"?>
+<set>
+<S count="1"><i C="1" T="4" D="4"/><i C="2" T="6" D="6"/></S>
+<S count="2"/>
+<S count="3"></S>
+<S count="4" ><i C="3" T="12" D="12"/></S>
+</set>
+"""
+
+
+def tasks(rts):
+    return [(task["C"], task["T"], task["D"]) for task in rts["ptasks"]]
+
+
+def test_xml_self_closing_and_empty_sets(tmp_path):
+    path = tmp_path / "sets.xml"
+    path.write_text(XML)
+    with open(path) as fh:
+        sets = list(get_from_file(fh, [4, 2, 3, 1]))
+    assert [rts["id"] for rts in sets] == [4, 2, 3, 1]
+    assert [tasks(rts) for rts in sets] == [[(3, 12, 12)], [], [], [(1, 4, 4), (2, 6, 6)]]
+
+
+def test_xml_index_is_not_sorted(tmp_path):
+    path = tmp_path / "sets.xml"
+    path.write_text(XML.replace('count="1"', 'count="9"'))
+    with load_index(str(path), ".xml") as index:
+        assert index.layout == "unsorted"
+        assert len(index) == 4
+    with open(path) as fh:
+        assert [rts["id"] for rts in get_from_file(fh, [9, 4])] == [9, 4]
+
+
+@pytest.mark.parametrize("suffix", [".json", ".txt"])
+def test_dense_index_from_sidecar(tmp_path, suffix):
+    sets = [[(i + 1, 10 * (i + 1), 10 * (i + 1))] * (i % 3 + 1) for i in range(50)]
+    path = tmp_path / ("sets" + suffix)
+    if suffix == ".json":
+        path.write_text(json.dumps([[{"C": c, "T": t, "D": d} for c, t, d in rts] for rts in sets]))
+        ids = list(range(50))
+    else:
+        path.write_text("".join("{0:}\n".format(len(rts)) + "".join("{0:} {1:} {2:}\n".format(*task) for task in rts)
+                                for rts in sets))
+        ids = list(range(1, 51))
+
+    for _ in range(2):  # built by the first call, memory mapped by the second
+        with load_index(str(path), suffix) as index:
+            assert index.layout == "dense"
+            assert list(index.ids) == ids
+        with open(path) as fh:
+            found = list(get_from_file(fh, [ids[49], ids[0], ids[17]]))
+        assert [tasks(rts) for rts in found] == [sets[49], sets[0], sets[17]]
+
+    with open(path) as fh, pytest.raises(IndexError):
+        list(get_from_file(fh, [ids[-1] + 1]))
+
+
+def test_default_ids(tmp_path):
+    for suffix, expected in [(".json", [0]), (".txt", None), (".rtsb", None)]:
+        path = tmp_path / ("sets" + suffix)
+        path.write_text("")
+        with open(path) as fh:
+            assert default_ids(fh) == expected
+
+    # the first set of a xml file whose counts do not include 0
+    path = tmp_path / "sets.xml"
+    path.write_text(XML.replace('count="1"', 'count="5"').replace('count="2"', 'count="3"')
+                    .replace('count="3"></S>', 'count="9"></S>'))
+    with open(path) as fh:
+        assert default_ids(fh) == [5]
+    with open(path) as fh:
+        assert [tasks(rts) for rts in get_from_file(fh, default_ids(fh))] == [[(1, 4, 4), (2, 6, 6)]]
+
+
+def test_stream_missing_id():
+    stream = io.StringIO("1\n1 4 4\n1\n2 5 5\n")
+    stream.name = "<stdin>"
+    assert [rts["id"] for rts in get_from_file(stream, [2], ".txt")] == [2]
+    stream.seek(0)
+    with pytest.raises(IndexError):
+        list(get_from_file(stream, [0], ".txt"))
+
+
+@pytest.mark.parametrize("swap", [False, True])
+def test_rtsb_round_trip(tmp_path, monkeypatch, swap):
+    # with swap the file is written and read as a big-endian host does
+    monkeypatch.setattr(rtsb, "SWAP", swap)
+    sets = [[(1, 4, 4), (2, 6, 5)], [(3, 12, 12)]]
+    path = tmp_path / "sets.rtsb"
+    with RtsbWriter(str(path)) as writer:
+        for rts_id, rts in enumerate(sets, 1):
+            writer.write(rts_id, [{"C": c, "T": t, "D": d} for c, t, d in rts])
+    with open(path) as fh:
+        assert [tasks(rts) for rts in get_from_file(fh)] == sets
+    with RtsbReader(str(path)) as reader:
+        rts = reader.rts(reader.position(2))
+    # the rts read keep the mapping alive after the reader is closed
+    assert tasks(rts) == sets[1]
+
+
+def test_rtsb_convert_warns_about_aperiodic_tasks(tmp_path, capsys):
+    src = tmp_path / "sets.json"
+    src.write_text(json.dumps([[{"C": 1, "T": 4}], {"periodic": [{"C": 1, "T": 5}], "aperiodic": [{"C": 2}]}]))
+    with open(src) as fh:
+        assert convert(fh, str(tmp_path / "sets.rtsb")) == 2
+    assert "1 rts" in capsys.readouterr().err
+
+
+def test_rtsb_convert_skips_elements_and_leaves_no_partial_file(tmp_path, capsys):
+    src = tmp_path / "sets.json"
+    src.write_text(json.dumps([[{"C": 1, "T": 4}], {"ntask": 4, "uf": 0.8}, [{"C": 2, "T": 6}]]))
+    dst = tmp_path / "sets.rtsb"
+    with open(src) as fh:
+        assert convert(fh, str(dst)) == 2
+    assert "Element 1" in capsys.readouterr().err
+    with open(dst) as fh:
+        assert [(rts["id"], tasks(rts)) for rts in get_from_file(fh)] == [(0, [(1, 4, 4)]), (2, [(2, 6, 6)])]
+
+    src = tmp_path / "bad.txt"
+    src.write_text("1\n1 4 4\n1\n1 x\n")
+    with open(src) as fh, pytest.raises(ValueError):
+        convert(fh, str(tmp_path / "bad.rtsb"))
+    assert sorted(path.name for path in tmp_path.iterdir()) == ["bad.txt", "sets.json", "sets.rtsb"]
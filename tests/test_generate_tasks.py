@@ -0,0 +1,19 @@
+import os
+import subprocess
+import sys
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+@pytest.mark.parametrize("extension", ["txt", "json", "rtsb"])
+def test_output_does_not_depend_on_the_jobs(tmp_path, extension):
+    outputs = []
+    for jobs in (1, 2):
+        path = tmp_path / "jobs{0:}.{1:}".format(jobs, extension)
+        # several shards of every (n, uf), more than the shards in flight
+        subprocess.run([sys.executable, os.path.join(ROOT, "generate_tasks.py"), "--n", "3,5", "--max-uf", ".5:.8:.3",
+                        "--set", "50", "--shard-size", "7", "--schedulable", "--seed", "11", "--jobs", str(jobs),
+                        "--max-pending", "2", "--output", str(path)], check=True, cwd=ROOT)
+        outputs.append(path.read_bytes())
+    assert outputs[0] and outputs[0] == outputs[1]
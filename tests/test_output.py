@@ -0,0 +1,54 @@
+import csv
+import io
+import json
+import pytest
+from output import CsvWriter, JsonlWriter, RecordWriter, record
+from solver import AnalysisContext
+from taskset import TaskSet
+
+# U > ln 2 and the Bini bound fails, so ps (bound) and ds (bound) do not apply
+RTS = {"id": 7, "ptasks": TaskSet([2, 1, 1], [4, 5, 8])}
+
+
+def write(writer_class, rows):
+    fh = io.StringIO()
+    writer = writer_class(fh, block=2)
+    for row in rows:
+        writer.write(row)
+    writer.close()
+    return fh.getvalue()
+
+
+def test_record_writer_is_abstract():
+    with pytest.raises(TypeError):
+        RecordWriter(io.StringIO())
+
+
+def test_csv_encoding():
+    row = record(RTS, AnalysisContext(RTS["ptasks"]).results(["liu", "wcrt", "ps_bound"]))
+    assert row["ps"] is None
+    rows = list(csv.DictReader(io.StringIO(write(CsvWriter, [row]))))
+    assert len(rows) == 1
+    assert rows[0]["id"] == "7"
+    assert rows[0]["liu_schedulable"] == "false"
+    assert rows[0]["rta_schedulable"] == "true"
+    assert rows[0]["ps"] == CsvWriter.NOT_APPLICABLE
+    assert json.loads(rows[0]["rta_wcrt"]) == [2, 3, 4]
+
+
+def test_jsonl_keeps_types():
+    row = record(RTS, AnalysisContext(RTS["ptasks"]).results(["liu", "ps_bound"]))
+    lines = write(JsonlWriter, [row, row, row]).splitlines()
+    assert len(lines) == 3
+    assert json.loads(lines[0]) == {"id": 7, "liu_bound": row["liu_bound"], "liu_schedulable": False, "ps": None}
+
+
+def test_free_status_keeps_the_reason():
+    unschedulable = TaskSet([3, 3], [4, 5])
+    full = TaskSet([2, 2], [4, 4])
+    rows = [record({"id": i, "ptasks": rts}, AnalysisContext(rts).results(["free"]))
+            for i, rts in enumerate([RTS["ptasks"], unschedulable, full])]
+    assert [row["free_status"] for row in rows] == ["ok", "No planificable", "No aplica"]
+    assert rows[0]["free"] and rows[1]["free"] is None and rows[2]["free"] is None
+    rows = list(csv.DictReader(io.StringIO(write(CsvWriter, rows))))
+    assert [row["free_status"] for row in rows] == ["ok", "No planificable", "No aplica"]
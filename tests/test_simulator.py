@@ -0,0 +1,25 @@
+import numpy as np
+from simulator import fixed_priority_wcrt, max_response, simulate
+from solver import rta_wcrt
+from taskset import TaskSet
+
+PERIODS = [4, 5, 6, 8, 10, 12, 15, 20, 24, 30, 40, 60]  # hyperperiods up to 120
+
+
+def test_simulated_worst_response_is_the_rta_wcrt():
+    rng = np.random.default_rng(17)
+    checked = 0
+    for _ in range(500):
+        n = int(rng.integers(1, 7))
+        t = [int(ti) for ti in rng.choice(PERIODS, n)]
+        c = [int(rng.integers(1, max(2, ti // n + 1))) for ti in t]
+        d = [int(rng.integers(ci, ti + 1)) for ci, ti in zip(c, t)]
+        rts = TaskSet(c, t, d)
+        schedulable, wcrt = rta_wcrt(rts)
+        if not schedulable or any([r > di for r, di in zip(wcrt, d)]):
+            continue
+        # the synchronous release is the critical instant, every job ends within the hyperperiod
+        assert max_response(simulate(rts, "fp"), n).tolist() == wcrt
+        assert fixed_priority_wcrt(rts, "fp") == wcrt
+        checked += 1
+    assert checked > 100
@@ -0,0 +1,120 @@
+from fractions import Fraction
+from math import lcm
+import numpy as np
+import pytest
+import solver
+from solver import (accelerated_wcrt, analyze, analyze_parallel, audsley, bounded_wcrt, calculate_k, calculate_k_linear,
+                    chunks, demand, edf_qpa, prioritize, rta2_wcrt, rta3_wcrt, rta_wcrt)
+from taskset import TaskSet, WcrtBound
+
+PERIODS = [4, 5, 6, 8, 10, 12, 15, 20, 24, 30, 40, 60]  # hyperperiods up to 120
+
+
+def random_rts(rng, count=1000):
+    """ Rts of 1 to 7 tasks in RM order, with constrained deadlines and some of them not schedulable """
+    for _ in range(count):
+        n = int(rng.integers(1, 8))
+        t = sorted([int(ti) for ti in rng.choice(PERIODS, n)])
+        c = [int(rng.integers(1, max(2, ti // n + 1))) for ti in t]
+        d = [int(rng.integers(ci, ti + 1)) for ci, ti in zip(c, t)]
+        yield TaskSet(c, t, d)
+
+
+def failing(n):
+    yield from range(n)
+    raise ValueError("malformed")
+
+
+def test_chunks_yield_the_elements_read_before_an_error():
+    split = chunks(failing(5), 2)
+    assert [next(split), next(split), next(split)] == [[0, 1], [2, 3], [4]]
+    with pytest.raises(ValueError):
+        next(split)
+
+
+def test_analyze_parallel_reports_pending_chunks_before_an_error():
+    rts = {"id": 1, "ptasks": TaskSet([1, 2], [4, 6])}
+
+    def failing_chunks():
+        for _ in range(3):
+            yield [dict(rts)]
+        raise ValueError("malformed")
+
+    reported = []
+    with pytest.raises(ValueError):
+        for chunk, results in analyze_parallel(failing_chunks(), 2, 4, actions=["wcrt", "edf"]):
+            reported.append(results)
+    assert len(reported) == 3
+    for results in reported:
+        assert results == [[("wcrt", {"joseph": [True, [1, 3]], "rta": [True, [1, 3]]}), ("edf", True)]]
+
+
+@pytest.mark.parametrize("engine", ["rta", "rta3", "accel"])
+def test_only_the_rta_engine_is_batched(monkeypatch, engine):
+    batched = []
+    monkeypatch.setattr(solver, "rta_wcrt_many", lambda rts_list: batched.append(len(rts_list)) or
+                        [rta_wcrt(rts) for rts in rts_list])
+    chunk = [{"id": i, "ptasks": TaskSet([1, 2], [4, 6 + i])} for i in range(3)]
+    results = analyze(chunk, engine, actions=["wcrt"])
+    assert batched == ([3] if engine == "rta" else [])
+    assert results == analyze(chunk, "joseph", actions=["wcrt"])
+
+
+def test_incremental_engines_match_rta():
+    for rts in random_rts(np.random.default_rng(11)):
+        expected = rta_wcrt(rts)
+        assert rta2_wcrt(rts) == expected
+        assert rta3_wcrt(rts) == expected
+        assert accelerated_wcrt(rts) == expected
+
+
+def test_upper_bound_exit_keeps_the_rta_verdict():
+    for rts in random_rts(np.random.default_rng(24), 5000):
+        schedulable, expected = rta_wcrt(rts)
+        bounded = bounded_wcrt(rts)
+        assert bounded[0] == schedulable
+        for r, wcrt in zip(bounded[1], expected):
+            assert r >= wcrt if isinstance(r, WcrtBound) else r == wcrt
+
+
+def test_k_matches_linear_search():
+    for rts in random_rts(np.random.default_rng(15)):
+        if rta_wcrt(rts)[0]:
+            assert calculate_k(rts) == calculate_k_linear(rts)
+
+
+def test_qpa_matches_demand_at_every_instant():
+    for rts in random_rts(np.random.default_rng(16)):
+        c, t, d = rts.columns()
+        # every instant up to the hyperperiod plus the longest deadline
+        u = sum([Fraction(ci, ti) for ci, ti in zip(c, t)])
+        expected = u <= 1 and all([demand(c, t, d, x) <= x for x in range(1, lcm(*t) + max(d) + 1)])
+        assert edf_qpa(rts) == expected
+
+
+def test_opa_finds_an_order_rm_and_dm_miss():
+    # the task with the shorter period and deadline has to go below the other one
+    rts = TaskSet([2, 6], [12, 6], [12, 11])
+    assert not rta_wcrt(prioritize(rts, "rm")[0])[0]
+    assert not rta_wcrt(prioritize(rts, "dm")[0])[0]
+    feasible, order, _ = audsley(rts)
+    assert feasible and order == [0, 1]
+    ordered, opa = prioritize(rts, "opa")
+    assert list(ordered.nro) == [1, 2] and opa[:2] == [True, [0, 1]]
+    assert rta_wcrt(ordered) == [True, [2, 8]]
+
+
+def test_opa_reports_unschedulable_rts():
+    for rts in random_rts(np.random.default_rng(18), 300):
+        feasible, order, evaluations = audsley(rts)
+        # dm is optimal with constrained deadlines (rta_wcrt does not check the deadline of a task whose first
+        # estimate is its WCRT, so every WCRT is checked here)
+        ordered = prioritize(rts, "dm")[0]
+        schedulable, wcrt = rta_wcrt(ordered)
+        assert feasible == (schedulable and all([r <= di for r, di in zip(wcrt, ordered.d)]))
+        if feasible:
+            assert rta_wcrt(prioritize(rts, "opa")[0])[0]
+        else:
+            assert order is None and evaluations > 0
+    ordered, opa = prioritize(TaskSet([3, 3], [4, 4]), "opa")
+    assert opa[:2] == [False, None] and list(ordered.nro) == [1, 2]
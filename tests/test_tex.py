@@ -0,0 +1,16 @@
+import pytest
+
+pytest.importorskip("pylatex")
+pytest.importorskip("simso")
+
+from bench_wcrt import load_solver_tex
+
+
+def test_stream_backend_writes_the_pylatex_source(tmp_path):
+    tex = load_solver_tex()
+    rts_list = tex.topic_rts([[{"c": 1, "t": 4}, {"c": 2, "t": 10}, {"c": 3, "t": 20}],
+                              [{"c": 2, "t": 5, "d": 4}, {"c": 3, "t": 7}]])
+    for backend in ("pylatex", "stream"):
+        tex.write_tex(str(tmp_path / backend), rts_list, tex.actions, backend=backend)
+    assert (tmp_path / "stream.tex").read_text(encoding="utf-8") == \
+        (tmp_path / "pylatex.tex").read_text(encoding="utf-8")